@@ -0,0 +1,205 @@
+#!/usr/bin python3
+
+""" Approximate Site Matching Module """
+
+"""
+Program:        approx_match
+File:           approx_match.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       Find cleavage sites within k mismatches (Hamming) or k edits (edit distance) in one pass.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+Bit-parallel matchers: each pattern position is one bit of a Python integer, so every text
+character updates all pattern positions with a few integer operations.
+
+hamming_sites uses shift-and with one state vector per allowed mismatch (Wu-Manber):
+D[0] is exact shift-and, D[j] also allows a substitution from D[j - 1].
+
+edit_sites uses Myers' bit-vector algorithm, which keeps the column of the edit distance
+table as vertical +1/-1 delta vectors and the score of the last pattern row; substitutions,
+insertions and deletions are counted. Myers' algorithm gives end positions; the start of each
+site is found with a small dynamic programming alignment of the text just before the end.
+Runs of neighbouring end positions (the same site with extra edits at its end) are reported
+once, at the best distance.
+
+Both read the text once, left to right, and only 'A', 'C', 'G', 'T' (either case) match;
+'N' and other characters always count as mismatches. Sites are (start, end, distance), with
+start and end counting from 0 and end exclusive, as seq_module.enz_cut.
+
+Usage:
+======
+approx_match        SITE K [hamming|edit]
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+"""
+#*****************************************************************************
+# Import libraries
+
+import sys
+
+#*****************************************************************************
+
+def pattern_masks(pattern):
+    """Return {character: bit mask of pattern positions holding it}, both cases"""
+
+    masks = {}
+    for i, base in enumerate(pattern.upper()):
+        for char in (base, base.lower()):
+            masks[char] = masks.get(char, 0) | (1 << i)
+    return masks
+
+#*****************************************************************************
+
+def hamming_sites(text, pattern, k):
+    """Return sites in text matching pattern with at most k mismatches.
+    Input           text                sequence
+                    pattern             site (A, C, G, T)
+                    k                   mismatches allowed
+
+    Output          sites               list of (start, end, mismatches)
+    """
+    m = len(pattern)
+    if m == 0 or k < 0:
+        return []
+    k = min(k, m)
+    masks = pattern_masks(pattern)
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    states = [0] * (k + 1)
+
+    sites = []
+    for i, char in enumerate(text):
+        eq = masks.get(char, 0)
+        previous = 0                            # D[j - 1] before this character
+        for j in range(k + 1):
+            old = states[j]
+            new = ((old << 1) | 1) & eq
+            if j:
+                new |= (previous << 1) | 1
+            states[j] = new & full
+            previous = old
+        if states[k] & last and i + 1 >= m:
+            for j in range(k + 1):
+                if states[j] & last:
+                    sites.append((i + 1 - m, i + 1, j))
+                    break
+    return sites
+
+#*****************************************************************************
+
+def site_start(text, pattern, end, k):
+    """Return (start, distance) of best alignment of pattern ending at end (shortest if tied)"""
+
+    m = len(pattern)
+    window = text[max(end - m - k, 0):end][::-1].upper()
+    reverse = pattern.upper()[::-1]
+    ## previous[i] = distance of reversed pattern prefix to window[:i] (the i bases before end)
+    previous = list(range(len(window) + 1))
+    for p in range(1, m + 1):
+        row = [p] + [0] * len(window)
+        for i in range(1, len(window) + 1):
+            cost = 0 if reverse[p - 1] == window[i - 1] and window[i - 1] in 'ACGT' else 1
+            row[i] = min(previous[i - 1] + cost, previous[i] + 1, row[i - 1] + 1)
+        previous = row
+    best = min(range(len(previous)), key=lambda i: (previous[i], i))
+    return end - best, previous[best]
+
+#*****************************************************************************
+
+def edit_sites(text, pattern, k):
+    """Return sites in text matching pattern with edit distance at most k.
+    Input           text                sequence
+                    pattern             site (A, C, G, T)
+                    k                   edits allowed (substitutions, insertions, deletions)
+
+    Output          sites               list of (start, end, distance)
+    """
+    m = len(pattern)
+    if m == 0 or k < 0:
+        return []
+    masks = pattern_masks(pattern)
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv = full
+    mv = 0
+    score = m
+
+    ends = []
+    for i, char in enumerate(text):
+        eq = masks.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = (ph << 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+        if score <= k:
+            ends.append((i + 1, score))
+
+    ## keep best end of each run of neighbouring ends
+    sites = []
+    run = []
+    for end, score in ends + [(None, None)]:
+        if run and (end is None or end != run[-1][0] + 1):
+            best_end, best = min(run, key=lambda e: (e[1], e[0]))
+            start, distance = site_start(text, pattern, best_end, k)
+            sites.append((start, best_end, min(distance, best)))
+            run = []
+        if end is not None:
+            run.append((end, score))
+    return sites
+
+#*****************************************************************************
+
+def find_sites(text, pattern, k, distance='hamming'):
+    """Return approximate sites using 'hamming' or 'edit' distance"""
+
+    if distance == 'hamming':
+        return hamming_sites(text, pattern, k)
+    if distance == 'edit':
+        return edit_sites(text, pattern, k)
+    raise ValueError('distance must be hamming or edit')
+
+#*****************************************************************************
+
+def scan_sequences(rows, pattern, k, distance='hamming'):
+    """Yield (accession, sites) for every sequence in rows, eg. seq_query.seq_stream()"""
+
+    for acc, seq in rows:
+        sites = find_sites(seq, pattern, k, distance)
+        if sites:
+            yield acc, sites
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    from data_access import seq_query
+
+    site = sys.argv[1] if len(sys.argv) > 1 else 'GAATTC'
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    distance = sys.argv[3] if len(sys.argv) > 3 else 'hamming'
+
+    total = 0
+    for acc, sites in scan_sequences(seq_query.seq_stream(), site, k, distance):
+        total += len(sites)
+        print(acc, len(sites), sites[:5])
+    print(total, 'sites within', k, distance)
@@ -0,0 +1,258 @@
+#!/usr/bin python3
+
+""" Cytogenetic Band Module """
+
+"""
+Program:        band_module
+File:           band_module.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       Parse cytogenetic band locations and index genes by chromosomal position.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+Gene locations are stored as band strings such as '8q24.3', '8p11.2' or '8q22.3-q24.1'.
+parse_band turns a band string into ordered numeric intervals along the chromosome, running
+from the end of the p arm (pter) through the centromere to the end of the q arm (qter).
+Positions are integers: the band digits are read as a decimal (q24.3 = 2.43) and scaled by
+10000, with p arm positions negative. A band covers all of its sub-bands, so q24 covers
+q24.1 to q24.3 and p23 covers p23.3 (distal) to p23.1 (proximal).
+
+BandIndex is an interval tree (sorted array with subtree maximum end) over all genes in a
+catalog, answering region overlap queries in O(log n + k) and listing genes in position order.
+
+Usage:
+======
+band_module         REGION
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+"""
+#*****************************************************************************
+# Import libraries
+
+import re
+import sys
+from bisect import bisect_left
+
+#*****************************************************************************
+
+## scale for band positions: region digit plus four sub-band digits
+BAND_DIGITS = 5
+ARM_LENGTH  = 10 ** BAND_DIGITS
+
+band_re     = re.compile(r'^(?P<chrom>\d+|[XY])?(?P<arm>pter|qter|cen|p|q)?(?P<band>\d+(?:\.\d+)?)?$')
+trans_re    = re.compile(r'^t\(([^)]*)\)\(([^)]*)\)$')
+
+#*****************************************************************************
+
+def bandInterval(arm, band):
+    """Return position interval covered by a single band on one arm.
+    Input           arm                 'p', 'q', 'pter', 'qter', 'cen' or None (whole chromosome)
+                    band                band digits, eg. '24.3' (None for whole arm)
+
+    Output          (start, end)        half-open integer interval
+    """
+    if arm == 'pter':
+        return (-ARM_LENGTH, -ARM_LENGTH + 1)
+    if arm == 'qter':
+        return (ARM_LENGTH - 1, ARM_LENGTH)
+    if arm == 'cen':
+        return (-1, 1)
+    if arm is None:
+        return (-ARM_LENGTH, ARM_LENGTH)
+    if band is None:
+        if arm == 'p':
+            return (-ARM_LENGTH, 0)
+        return (0, ARM_LENGTH)
+
+    digits = band.replace('.', '')[:BAND_DIGITS]
+    value = int(digits.ljust(BAND_DIGITS, '0'))
+    width = 10 ** (BAND_DIGITS - len(digits))
+    if arm == 'p':
+        return (-(value + width), -value)
+    return (value, value + width)
+
+#*****************************************************************************
+
+def parse_band(location, chrom=None):
+    """Return list of (chromosome, start, end) intervals for a band location string.
+    Ranges ('8q22.3-q24.1') cover everything from one band to the other, either way round.
+    Text after ';' is ignored, and translocations ('t(8;14)(q24;q32)') give one interval per
+    chromosome. Unparseable locations return an empty list.
+    Input           location            band string from genbank table, eg. '8q24.3'
+                    chrom               chromosome to assume when location has none (eg. 'q22')
+
+    Output          intervals           list of (chromosome, start, end)
+    """
+    if not location:
+        return []
+    location = location.strip().replace(' ', '')
+
+    ## translocation: t(8;14)(q24;q32)
+    m = trans_re.match(location)
+    if m:
+        intervals = []
+        for part_chrom, part_band in zip(m.group(1).split(';'), m.group(2).split(';')):
+            intervals.extend(parse_band(part_chrom + part_band))
+        return intervals
+    location = location.split(';')[0]
+
+    ## '8.p21.1' -> '8p21.1'
+    location = re.sub(r'^(\d+)\.(?=[pq])', r'\1', location)
+
+    parts = location.split('-')
+    if len(parts) > 2:
+        return []
+    first = band_re.match(parts[0])
+    if first is None or not (first.group('arm') or first.group('chrom')):
+        return []
+    chrom = first.group('chrom') or chrom
+    if chrom is None:
+        return []
+    arm = first.group('arm')
+    start, end = bandInterval(arm, first.group('band'))
+
+    if len(parts) == 2:
+        ## '8p22-21.2': second band has no arm, so read digits as band not chromosome
+        if re.match(r'^\d+(\.\d+)?$', parts[1]):
+            parts[1] = (arm or '') + parts[1]
+        second = band_re.match(parts[1])
+        if second is None or (second.group('chrom') and second.group('chrom') != chrom):
+            return []
+        second_arm = second.group('arm') or arm
+        s2, e2 = bandInterval(second_arm, second.group('band'))
+        start = min(start, s2)
+        end = max(end, e2)
+
+    return [(chrom, start, end)]
+
+#*****************************************************************************
+
+class BandIndex:
+    """ Interval tree over gene locations for region queries and positional ordering"""
+
+    def __init__(self, records, chrom='8'):
+        """ Build index from gene records (objects with acc and location attributes).
+        Input           records             iterable of gene records (eg. GeneCatalog)
+                        chrom               chromosome assumed for locations without one
+        """
+        entries = {}
+        self.unplaced = []
+        for record in records:
+            intervals = parse_band(record.location, chrom)
+            if not intervals:
+                self.unplaced.append(record)
+            for interval in intervals:
+                entries.setdefault(interval[0], []).append((interval[1], interval[2], record.acc, record))
+
+        self._trees = {}
+        for c, items in entries.items():
+            items.sort(key=lambda x: (x[0], x[1], x[2]))
+            starts  = [x[0] for x in items]
+            ends    = [x[1] for x in items]
+            genes   = [x[3] for x in items]
+            max_end = list(ends)
+            self._build(max_end, 0, len(items))
+            self._trees[c] = (starts, ends, genes, max_end)
+
+    # *************************************************************************
+
+    def _build(self, max_end, lo, hi):
+        """ Fill max_end so that max_end[mid] is the largest end in implicit subtree [lo, hi)"""
+        if lo >= hi:
+            return -ARM_LENGTH - 1
+        mid = (lo + hi) // 2
+        left = self._build(max_end, lo, mid)
+        right = self._build(max_end, mid + 1, hi)
+        max_end[mid] = max(max_end[mid], left, right)
+        return max_end[mid]
+
+    # *************************************************************************
+
+    def _search(self, tree, lo, hi, qstart, qend, found):
+        """ Collect indexes of intervals in implicit subtree [lo, hi) overlapping [qstart, qend)"""
+        starts, ends, genes, max_end = tree
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if max_end[mid] <= qstart:
+                return
+            self._search(tree, lo, mid, qstart, qend, found)
+            if starts[mid] >= qend:
+                ## every interval to the right starts later still
+                return
+            if ends[mid] > qstart:
+                found.append(mid)
+            lo = mid + 1
+
+    # *************************************************************************
+
+    def overlapping(self, region, chrom='8'):
+        """ Return genes whose location overlaps region, in chromosomal position order.
+        Input           region              band string, eg. '8q22-q24'
+                        chrom               chromosome assumed when region has none
+
+        Output          genes               list of gene records
+        """
+        genes = []
+        seen = set()
+        for c, qstart, qend in parse_band(region, chrom):
+            tree = self._trees.get(c)
+            if tree is None:
+                continue
+            found = []
+            self._search(tree, 0, len(tree[0]), qstart, qend, found)
+            for i in found:
+                gene = tree[2][i]
+                if gene.acc not in seen:
+                    seen.add(gene.acc)
+                    genes.append(gene)
+        return genes
+
+    # *************************************************************************
+
+    def starting_between(self, start, end, chrom='8'):
+        """ Return genes whose interval starts in [start, end), using binary search.
+        Input           start, end          positions as returned by parse_band
+                        chrom               chromosome
+
+        Output          genes               list of gene records in position order
+        """
+        tree = self._trees.get(chrom)
+        if tree is None:
+            return []
+        lo = bisect_left(tree[0], start)
+        hi = bisect_left(tree[0], end)
+        return tree[2][lo:hi]
+
+    # *************************************************************************
+
+    def in_order(self, chrom='8'):
+        """ Return all placed genes on chromosome sorted by position (pter to qter)"""
+        tree = self._trees.get(chrom)
+        if tree is None:
+            return []
+        return list(tree[2])
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    import gene_module
+
+    region = '8q22-q24'
+    if len(sys.argv) > 1:
+        region = sys.argv[1]
+
+    index = BandIndex(gene_module.GeneCatalog.from_query())
+    for gene in index.overlapping(region):
+        print(gene.acc, gene.genid, gene.location)
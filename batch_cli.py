@@ -0,0 +1,312 @@
+#!/usr/bin python3
+
+""" Batch Analysis Command """
+
+"""
+Program:        batch_cli
+File:           batch_cli.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       Run selected sequence analyses for a list of genes and write one json record per gene.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+Reads accession numbers (one per line, '#' comments allowed) from a file or stdin and runs
+the selected analyses for each gene:
+    coding          coding sequence (as seq_module.codingSeq)
+    translation     codons and amino acid sequence (seq_module.translate)
+    annotation      sequence with exon boundaries marked (seq_module.annotateSeq)
+    enzymes         restriction enzyme sites, Good/Bad (seq_module.getEnzyme)
+    enzyme_sites    enzyme cuts placed against the exons (seq_module.getEnzymeSites)
+    codon_usage     codon usage ratio and percent (codon_usage.getCodonusage)
+The exons, codon start and strand of every gene are read once into an exon_table.ExonTable,
+which each worker process receives when it starts. Accessions are read in chunks; a worker
+fetches the sequences of a whole chunk with one query, assembles their coding sequences in
+one coding_batch.CodingBuffer (codons are counted and translated from the buffer) and runs
+the other analyses on the genomic strings, so no gene needs a query of its own. Output is NDJSON (one line per gene, in input order) on stdout or --out; genes that
+fail have an 'error' field instead of results.
+
+Genes with the same sequence and coding information as a gene analysed earlier by the same
+process (duplicates.input_key) reuse its results; each worker keeps the last REUSE_SIZE.
+
+Memory is bounded: at most --pending chunks are being worked on at once and the input is not
+read ahead of them, so a list of any length is processed with about (pending + 1) * chunk
+genes in memory. Progress goes to stderr, ending with a json line of throughput statistics.
+
+Usage:
+======
+batch_cli       [FILE|-] [--analyses NAME ...] [--workers N] [--chunk N] [--pending N] [--out FILE]
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+V1.1           19.10.26         Results reused for duplicate genes
+V1.2           19.10.26         Exons from one exon table per run; strand aware coding sequence
+V1.3           19.10.26         Coding sequences of a chunk assembled in one coding buffer
+"""
+#*****************************************************************************
+# Import libraries
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from collections import OrderedDict, deque
+
+import codon_usage
+import duplicates
+import exon_table
+import seq_module
+import enzyme_batch
+from coding_batch import CodingBuffer
+from progress import Progress
+from data_access import config_db
+from data_access import connection
+from data_access import seq_query
+
+#*****************************************************************************
+
+ANALYSES            = ('coding', 'translation', 'annotation', 'enzymes', 'enzyme_sites', 'codon_usage')
+DEFAULT_ANALYSES    = ('coding', 'translation', 'enzymes', 'codon_usage')
+
+## results kept per process for reuse by genes with identical inputs
+REUSE_SIZE          = 256
+_recent             = OrderedDict()
+
+## exon table of the run (set in each worker by init_worker)
+TABLE               = None
+
+#*****************************************************************************
+
+def init_worker(config, table):
+    """Worker process initializer: database settings and exon table of the run"""
+
+    global TABLE
+    enzyme_batch.init_worker(config)
+    TABLE = table
+
+#*****************************************************************************
+
+def read_accessions(handle):
+    """Yield accession numbers from open file, skipping blank lines and '#' comments"""
+
+    for line in handle:
+        acc = line.split('#', 1)[0].strip()
+        if acc:
+            yield acc
+
+#*****************************************************************************
+
+def chunked(items, size):
+    """Yield lists of up to size items, reading items only as each list is needed"""
+
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+#*****************************************************************************
+
+def analyse_gene(acc, seq, table, buffer, analyses):
+    """Return json record with selected analyses for one gene.
+    Input           acc                 accession number
+                    seq                 genomic sequence, checked (seq_module.checkInputs)
+                    table               exon_table.ExonTable holding the gene
+                    buffer              coding_batch.CodingBuffer holding the gene's coding sequence
+                    analyses            names of analyses, see ANALYSES
+
+    Output          record              {'accession': acc, analysis: result, ...}
+    """
+    record = {'accession': acc}
+    exons = table.exons(acc)
+    code_seq = buffer.text(acc)
+
+    if 'coding' in analyses:
+        record['coding'] = code_seq
+    if 'translation' in analyses:
+        codons = [code_seq[i:i + 3] for i in range(0, len(code_seq) - 2, 3)]
+        record['translation'] = {'codons': codons, 'protein': buffer.translate(acc)}
+    if 'annotation' in analyses:
+        record['annotation'] = seq_module.annotateFromSeq(seq, exons)
+    if 'enzymes' in analyses:
+        record['enzymes'] = {name: {'status': status, 'count': count, 'sites': cuts}
+                             for name, (status, (count, cuts)) in seq_module.enzymesFromSeq(seq, code_seq).items()}
+    if 'enzyme_sites' in analyses:
+        codon_start, strand = table.coding_info(acc)
+        sites = seq_module.enzymeSitesFromSeq(seq, exons, codon_start, strand)
+        record['enzyme_sites'] = {name: {'status': status, 'count': count, 'sites': cuts}
+                                  for name, (status, (count, cuts)) in sites.items()}
+    if 'codon_usage' in analyses:
+        aa_codons, usage = codon_usage.usageFromCounts(buffer.codon_counts(acc))
+        record['codon_usage'] = {codon: {'ratio': v[0], 'percent': v[1]} for codon, v in usage.items()}
+    return record
+
+#*****************************************************************************
+
+def analyse_chunk(accessions, analyses):
+    """Worker: run analyses for a chunk of genes using one sequence query (exons from the run's
+    table) and one coding buffer. Genes whose inputs match a recently analysed gene
+    (duplicates.input_key) reuse its results.
+    Output          (lines, failed, reused)     NDJSON lines in input order, number of failed
+                                                genes, number of genes that reused results
+    """
+    inputs = seq_query.gene_inputs(accessions, coding=False)
+
+    ## check inputs of genes not analysed recently, then assemble their coding sequences
+    keys = {}
+    earlier = {}
+    checked = {}
+    errors = {}
+    for acc in accessions:
+        seq = inputs[acc][0]
+        keys[acc] = key = duplicates.input_key(duplicates.seq_digest(seq), TABLE, acc)
+        if key is not None and (key, analyses) in _recent:
+            _recent.move_to_end((key, analyses))
+            earlier[acc] = _recent[(key, analyses)]
+            continue
+        try:
+            checked[acc] = seq_module.checkInputs(seq, TABLE.coding_info(acc) if acc in TABLE else None)
+        except Exception as e:
+            errors[acc] = type(e).__name__ + ': ' + str(e)
+    buffer = CodingBuffer.assemble(TABLE, checked.items())
+
+    lines = []
+    failed = reused = 0
+    for acc in accessions:
+        key = keys[acc]
+        if acc in earlier:
+            results, error = earlier[acc]
+            reused += 1
+        elif key is not None and (key, analyses) in _recent:
+            ## same inputs as a gene earlier in this chunk
+            results, error = _recent[(key, analyses)]
+            reused += 1
+        else:
+            if acc in errors:
+                record = {'accession': acc, 'error': errors[acc]}
+                error = True
+            else:
+                try:
+                    record = analyse_gene(acc, checked[acc], TABLE, buffer, analyses)
+                    error = False
+                except Exception as e:
+                    record = {'accession': acc, 'error': type(e).__name__ + ': ' + str(e)}
+                    error = True
+            results = {name: value for name, value in record.items() if name != 'accession'}
+            if key is not None:
+                _recent[(key, analyses)] = (results, error)
+                if len(_recent) > REUSE_SIZE:
+                    _recent.popitem(last=False)
+        failed += error
+        record = {'accession': acc}
+        record.update(results)
+        lines.append(json.dumps(record, separators=(',', ':')))
+    return lines, failed, reused
+
+#*****************************************************************************
+
+def run(accessions, analyses, out, workers=4, chunk=100, pending=None, total=None, progress=True):
+    """Analyse genes and write NDJSON records, keeping at most pending chunks in flight.
+    Input           accessions          iterable of accession numbers (read lazily)
+                    analyses            names of analyses, see ANALYSES
+                    out                 output file
+                    workers             worker processes (0 runs in this process)
+                    chunk               genes per bulk query / work unit
+                    pending             chunks in flight at once (default 2 * workers)
+                    total               number of accessions if known (for progress ETA)
+                    progress            print progress to stderr
+
+    Output          stats               {'genes', 'failed', 'reused', 'seconds', 'genes_per_second'}
+    """
+    global TABLE
+    analyses = tuple(analyses)
+    tracker = Progress(total) if progress else None
+    started = time.monotonic()
+    genes = failed = reused = 0
+
+    ## accessions are read lazily, so the table holds every gene with coding regions
+    table = exon_table.ExonTable.from_query()
+
+    def write(result):
+        nonlocal genes, failed, reused
+        lines, n_failed, n_reused = result
+        for line in lines:
+            out.write(line + '\n')
+        genes += len(lines)
+        failed += n_failed
+        reused += n_reused
+        if tracker:
+            tracker.update(len(lines), n_failed)
+
+    if workers < 1:
+        TABLE = table
+        for part in chunked(accessions, chunk):
+            write(analyse_chunk(part, analyses))
+    else:
+        pending = pending or 2 * workers
+        queue = deque()
+        config = dict(config_db.database_config)
+        with multiprocessing.Pool(workers, init_worker, (config, table)) as pool:
+            for part in chunked(accessions, chunk):
+                queue.append(pool.apply_async(analyse_chunk, (part, analyses)))
+                while len(queue) >= pending:
+                    write(queue.popleft().get())
+            while queue:
+                write(queue.popleft().get())
+    out.flush()
+
+    seconds = time.monotonic() - started
+    if tracker:
+        tracker.report(final=True)
+    return {'genes': genes, 'failed': failed, 'reused': reused, 'seconds': round(seconds, 3),
+            'genes_per_second': round(genes / seconds, 1) if seconds else None}
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Run analyses for a list of genes, writing NDJSON')
+    parser.add_argument('file', nargs='?', default='-', help='file of accessions (default stdin)')
+    parser.add_argument('--analyses', nargs='+', choices=ANALYSES, default=list(DEFAULT_ANALYSES))
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--chunk', type=int, default=100, help='genes per bulk query')
+    parser.add_argument('--pending', type=int, help='chunks in flight (default 2 * workers)')
+    parser.add_argument('--out', help='output file (default stdout)')
+    parser.add_argument('--sqlite', help='use local SQLite stand-in database instead of MySQL')
+    parser.add_argument('--quiet', action='store_true', help='no progress output')
+    args = parser.parse_args()
+
+    if args.sqlite:
+        connection.use_sqlite(args.sqlite)
+
+    total = None
+    if args.file == '-':
+        source = sys.stdin
+    else:
+        with open(args.file) as f:
+            total = sum(1 for acc in read_accessions(f))
+        source = open(args.file)
+
+    out = open(args.out, 'w') if args.out else sys.stdout
+    try:
+        stats = run(read_accessions(source), args.analyses, out, args.workers, args.chunk,
+                    args.pending, total, not args.quiet)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    print(json.dumps(stats), file=sys.stderr)
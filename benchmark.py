@@ -0,0 +1,346 @@
+#!/usr/bin python3
+
+""" Benchmark Suite """
+
+"""
+Program:        benchmark
+File:           benchmark.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       Time sequence, enzyme, codon usage and export functions on synthetic chromosomes.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+Runs each benchmark against SQLite stand-in databases made by synthetic_chromosome
+(1k, 10k and 100k genes by default; databases are generated on first use and reused).
+Per-gene functions are timed on a fixed sample of accessions; total_usage and the xml export
+run over the whole database. For each benchmark the throughput (items/s) and peak Python
+memory (tracemalloc, measured in a separate pass so it does not slow the timing) are reported.
+
+Results can be saved as a baseline; later runs are compared with it and any benchmark whose
+throughput drops by more than the threshold is reported as a regression (exit status 1).
+
+--import-budget checks that importing the analysis modules (seq_module, codon_usage) in a fresh
+interpreter takes less than the given number of seconds and does not load a database driver
+(exit status 1 otherwise).
+
+--instrument-check runs the batch paths (genome_freq, shard_run, CodonCounts.from_query,
+batch_cli) and gene_server endpoints on a synthetic database, once plain and once with
+instrument enabled, and reports any path that fails or gives a different result when
+instrumented (exit status 1).
+
+Usage:
+======
+benchmark       [--sizes N ...] [--sample N] [--baseline FILE] [--save-baseline] [--threshold F]
+benchmark       --import-budget SECONDS
+benchmark       --instrument-check [--db-dir DIR]
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+V1.1           19.10.26         Import time budget
+V1.2           19.10.26         Batch and server paths checked with instrumentation
+"""
+#*****************************************************************************
+# Import libraries
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from urllib.parse import urlsplit, parse_qs
+
+import seq_module
+import codon_usage
+import whole_genome_freq
+import getGenelist
+import synthetic_chromosome
+from data_access import connection
+from data_access import list_query
+
+#*****************************************************************************
+
+def per_gene(func):
+    """Return benchmark running func(acc) for every accession in sample"""
+    def run(accessions):
+        for acc in accessions:
+            func(acc)
+        return len(accessions)
+    return run
+
+#*****************************************************************************
+
+def bench_enz_cut(accessions):
+    for acc in accessions:
+        seq_module.enz_cut(acc)
+    return len(accessions)
+
+def bench_codonFreq(coding_seqs):
+    for seq in coding_seqs:
+        codon_usage.codonFreq(seq)
+    return len(coding_seqs)
+
+def bench_usageRatio(freq_tables):
+    for table in freq_tables:
+        codon_usage.usageRatio(table)
+    return len(freq_tables)
+
+def bench_total_usage(accessions):
+    whole_genome_freq.total_usage()
+    return len(whole_genome_freq.chromosome_accessions())
+
+def bench_xml_export(accessions):
+    return getGenelist.write_genelist(list_query.genbank_stream(), [(io.StringIO(), '   ')])
+
+#*****************************************************************************
+
+## name: (function, input) where input is 'sample' (accessions), 'coding' or 'freq'
+BENCHMARKS = [
+    ('getSeq',          per_gene(seq_module.getSeq),        'sample'),
+    ('codingSeq',       per_gene(seq_module.codingSeq),     'sample'),
+    ('annotateSeq',     per_gene(seq_module.annotateSeq),   'sample'),
+    ('translate',       per_gene(seq_module.translate),     'sample'),
+    ('enz_cut',         bench_enz_cut,                      'sample'),
+    ('getEnzyme',       per_gene(seq_module.getEnzyme),     'sample'),
+    ('codonFreq',       bench_codonFreq,                    'coding'),
+    ('usageRatio',      bench_usageRatio,                   'freq'),
+    ('total_usage',     bench_total_usage,                  'sample'),
+    ('xml_export',      bench_xml_export,                   'sample'),
+]
+
+#*****************************************************************************
+
+def measure(func, data):
+    """Return (items, seconds, peak bytes) for one benchmark"""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        start = time.perf_counter()
+        items = func(data)
+        seconds = time.perf_counter() - start
+
+        tracemalloc.start()
+        func(data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return items, seconds, peak
+
+#*****************************************************************************
+
+def run_size(genes, db_dir, sample, only=None):
+    """Run all benchmarks on synthetic database with given number of genes.
+    Input           genes               number of genes
+                    db_dir              directory holding synthetic databases
+                    sample              number of accessions used by per-gene benchmarks
+                    only                optional list of benchmark names to run
+
+    Output          results             {benchmark: {'items', 'seconds', 'per_second', 'peak_bytes'}}
+    """
+    path = os.path.join(db_dir, 'synthetic_%d.db' % genes)
+    if not os.path.exists(path):
+        print('generating', path, file=sys.stderr)
+        synthetic_chromosome.generate(path, genes)
+    connection.use_sqlite(path)
+
+    accessions = [row[0] for row in list_query.genbank_query()]
+    accessions = random.Random(0).sample(accessions, min(sample, len(accessions)))
+    inputs = {'sample': accessions}
+    with contextlib.redirect_stdout(io.StringIO()):
+        inputs['coding'] = [seq_module.codingSeq(acc) for acc in accessions]
+    inputs['freq'] = [codon_usage.codonFreq(seq) for seq in inputs['coding']]
+
+    results = {}
+    for name, func, data in BENCHMARKS:
+        if only and name not in only:
+            continue
+        items, seconds, peak = measure(func, inputs[data])
+        results[name] = {'items': items, 'seconds': round(seconds, 6),
+                         'per_second': round(items / seconds, 2) if seconds else None,
+                         'peak_bytes': peak}
+        print('%8d  %-14s %10d items %10.3f s %12.1f /s %10.1f KiB' %
+              (genes, name, items, seconds, results[name]['per_second'] or 0, peak / 1024))
+    return results
+
+#*****************************************************************************
+
+## modules which must import quickly and without a database driver
+IMPORT_MODULES  = ('seq_module', 'codon_usage')
+DRIVERS         = ('pymysql', 'sqlite3')
+
+def import_time(modules=IMPORT_MODULES):
+    """Import modules in a fresh interpreter (python -X importtime).
+    Output          (seconds, drivers)  cumulative import time of modules, database drivers loaded
+    """
+    code = ('import sys\n' + ''.join('import %s\n' % m for m in modules) +
+            'print(\' \'.join(d for d in %r if d in sys.modules))' % (DRIVERS,))
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=here,
+                            capture_output=True, text=True, check=True)
+    seconds = 0.0
+    for line in result.stderr.splitlines():
+        ## 'import time: self [us] | cumulative | imported package'; top level names are not indented
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() in modules and fields[2][1] != ' ':
+            seconds += int(fields[1]) / 1e6
+    return seconds, result.stdout.split()
+
+#*****************************************************************************
+
+## gene_server views requested for each checked gene
+SERVER_VIEWS = ('coding', 'translation', 'enzymes', 'codon_usage', 'similar?k=5', 'similar?k=5&approx=1')
+
+def server_responses(accessions):
+    """Return response bodies of gene_server views for accessions (matrix built afresh)"""
+    import gene_server
+
+    async def fetch():
+        server = gene_server.GeneServer(workers=2)
+        try:
+            bodies = []
+            for acc in accessions:
+                for view in SERVER_VIEWS:
+                    url = urlsplit('/genes/%s/%s' % (acc, view))
+                    bodies.append((await server.dispatch(url.path, parse_qs(url.query))).body)
+            return bodies
+        finally:
+            server.executor.shutdown()
+
+    gene_server.USAGE_MATRIX = None
+    return asyncio.run(fetch())
+
+def instrument_check(db_dir, genes=1000, sample=10):
+    """Run batch and server paths plain and instrumented on a synthetic database.
+    Output          failures            list of (path, problem); empty if instrumentation
+                                        changed nothing
+    """
+    import instrument
+    import batch_cli
+    import codon_groups
+
+    path = os.path.join(db_dir, 'synthetic_%d.db' % genes)
+    if not os.path.exists(path):
+        print('generating', path, file=sys.stderr)
+        synthetic_chromosome.generate(path, genes)
+    connection.use_sqlite(path)
+    accessions = whole_genome_freq.chromosome_accessions()
+    tmp = tempfile.mkdtemp()
+
+    def cli():
+        out = io.StringIO()
+        batch_cli.run(iter(accessions[:sample]), batch_cli.ANALYSES, out, workers=0, progress=False)
+        return out.getvalue()
+
+    checks = [
+        ('genome_freq',     lambda: whole_genome_freq.genome_freq(accessions, progress=False)),
+        ('total_usage',     whole_genome_freq.total_usage),
+        ('shard_run',       lambda: whole_genome_freq.shard_run(0, 2, os.path.join(tmp, 'shard.gz'), False)),
+        ('CodonCounts',     lambda: list(codon_groups.CodonCounts.from_query(accessions).counts)),
+        ('batch_cli',       cli),
+        ('gene_server',     lambda: server_responses(accessions[:sample])),
+    ]
+    failures = []
+    for name, func in checks:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            plain = func()
+            instrument.enable()
+            try:
+                traced = func()
+            except Exception as e:
+                failures.append((name, type(e).__name__ + ': ' + str(e)))
+                continue
+            finally:
+                instrument.disable()
+                instrument.reset()
+        if traced != plain:
+            failures.append((name, 'result differs with instrumentation'))
+    return failures
+
+#*****************************************************************************
+
+def compare(results, baseline, threshold):
+    """Return list of regressions: (size, benchmark, baseline /s, current /s)"""
+    regressions = []
+    for size, benches in results.items():
+        for name, current in benches.items():
+            before = baseline.get(size, {}).get(name)
+            if not before or not before.get('per_second') or not current['per_second']:
+                continue
+            if current['per_second'] < before['per_second'] * (1 - threshold):
+                regressions.append((size, name, before['per_second'], current['per_second']))
+    return regressions
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmark suite on synthetic chromosomes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(synthetic_chromosome.SIZES))
+    parser.add_argument('--sample', type=int, default=200, help='genes used by per-gene benchmarks')
+    parser.add_argument('--only', nargs='+', help='run only these benchmarks')
+    parser.add_argument('--db-dir', default='.', help='directory for synthetic databases')
+    parser.add_argument('--baseline', default='bench_baseline.json')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed fractional slowdown')
+    parser.add_argument('--out', help='write results as json')
+    parser.add_argument('--import-budget', type=float, metavar='SECONDS',
+                        help='only check import time of analysis modules against budget')
+    parser.add_argument('--instrument-check', action='store_true',
+                        help='only check batch and server paths give the same results instrumented')
+    args = parser.parse_args()
+
+    if args.import_budget is not None:
+        seconds, drivers = import_time()
+        print('import %s: %.1f ms (budget %.1f ms)' % (', '.join(IMPORT_MODULES), seconds * 1000,
+                                                       args.import_budget * 1000))
+        if drivers:
+            print('IMPORT loaded database driver:', ', '.join(drivers))
+        if drivers or seconds > args.import_budget:
+            exit(1)
+        exit(0)
+
+    if args.instrument_check:
+        failures = instrument_check(args.db_dir)
+        for name, problem in failures:
+            print('INSTRUMENT %s: %s' % (name, problem))
+        if failures:
+            exit(1)
+        print('instrumented batch and server paths unchanged')
+        exit(0)
+
+    results = {}
+    for genes in args.sizes:
+        results[str(genes)] = run_size(genes, args.db_dir, args.sample, args.only)
+
+    report = {'python': platform.python_version(), 'machine': platform.machine(), 'results': results}
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=1)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=1)
+        print('baseline saved to', args.baseline)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for size, name, before, now in regressions:
+            print('REGRESSION %s genes %s: %.1f/s -> %.1f/s' % (size, name, before, now))
+        if regressions:
+            exit(1)
+        print('no regressions against', args.baseline)
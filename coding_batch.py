@@ -0,0 +1,207 @@
+#!/usr/bin python3
+
+""" Coding Sequence Batch Module """
+
+"""
+Program:        coding_batch
+File:           coding_batch.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       Assemble coding sequences of many genes into one buffer and count codons/translate from it.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+seq_module.codingSeq builds each coding sequence by adding exon strings together, copying
+the growing string for every exon. CodingBuffer.assemble works out the coding length of every
+gene in a batch from the ExonTable, allocates one bytearray for all of them and copies each
+exon straight into place through memoryview slices (reverse strand exons are copied backwards
+from a complemented copy of the genomic sequence), so no per-exon strings are made.
+Gene i occupies buffer[offsets[i]:offsets[i + 1]].
+
+codon_counts and translate read codons from the buffer through strided memoryviews (every
+third base), so they work on the buffer without making a string of the coding sequence.
+Bases keep the case of the genomic sequence; counting and translation accept either case.
+
+Usage:
+======
+coding_batch        ACC [ACC ...]
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+"""
+#*****************************************************************************
+# Import libraries
+
+import sys
+from array import array
+from collections import Counter
+from itertools import product
+
+import codon_usage
+import seq_module
+
+#*****************************************************************************
+
+COMPLEMENT  = bytes.maketrans(b'ACGTNacgtn', b'TGCANtgcan')
+
+## codon (as tuple of byte values, any case) to codon string / amino acid
+CODON_KEYS  = {}
+CODON_AA    = {}
+for codon in codon_usage.codonFreq(''):
+    aa = seq_module.translateSeq(codon)[1]
+    for bases in product(*[(ord(b), ord(b.lower())) for b in codon]):
+        CODON_KEYS[bases] = codon
+        CODON_AA[bases] = aa
+
+#*****************************************************************************
+
+class CodingBuffer:
+    """ Coding sequences of many genes in one bytearray with an offset array"""
+
+    def __init__(self, accessions, buffer, offsets, missing=()):
+        self.accessions = accessions            # gene i
+        self.index      = {acc: i for i, acc in enumerate(accessions)}
+        self.buffer     = buffer
+        self.offsets    = offsets               # gene i: buffer[offsets[i]:offsets[i + 1]]
+        self.missing    = list(missing)         # accessions not in exon table
+
+    # *************************************************************************
+
+    @classmethod
+    def assemble(cls, table, sequences):
+        """ Build buffer holding coding sequences of a batch of genes.
+        Input           table               ExonTable with exons of the genes
+                        sequences           iterable of (accession, genomic sequence) rows, eg.
+                                            seq_query results
+
+        Output          coding_buffer       CodingBuffer (genes not in table are listed in .missing)
+        """
+        genes = []
+        missing = []
+        offsets = array('l', [0])
+        for row in sequences:
+            if row is None:
+                continue
+            acc, seq = row[0], row[1]
+            if acc not in table:
+                missing.append(acc)
+                continue
+            genes.append((acc, seq))
+            offsets.append(offsets[-1] + table.coding_length(acc, len(seq)))
+
+        buffer = bytearray(offsets[-1])
+        out = memoryview(buffer)
+        for i, (acc, seq) in enumerate(genes):
+            codon_start, strand = table.coding_info(acc)
+            first, last = table.bounds(acc)
+            pos = offsets[i]
+            skip = codon_start - 1
+            data = seq.encode('ascii')
+            if strand < 0:
+                data = data.translate(COMPLEMENT)
+                order = range(last - 1, first - 1, -1)
+            else:
+                order = range(first, last)
+            src = memoryview(data)
+            for j in order:
+                start, end = table.starts[j] - 1, min(table.ends[j], len(data))
+                if end <= start:
+                    continue
+                if strand < 0:
+                    piece = src[end - 1:start - 1 if start else None:-1]
+                else:
+                    piece = src[start:end]
+                if skip:
+                    cut = min(skip, len(piece))
+                    piece = piece[cut:]
+                    skip -= cut
+                out[pos:pos + len(piece)] = piece
+                pos += len(piece)
+        return cls([acc for acc, seq in genes], buffer, offsets, missing)
+
+    # *************************************************************************
+
+    def __len__(self):
+        return len(self.accessions)
+
+    def __contains__(self, acc):
+        return acc in self.index
+
+    # *************************************************************************
+
+    def view(self, acc):
+        """ Return memoryview of gene's coding sequence (no copy)"""
+
+        i = self.index[acc]
+        return memoryview(self.buffer)[self.offsets[i]:self.offsets[i + 1]]
+
+    def text(self, acc):
+        """ Return gene's coding sequence as uppercase string (as seq_module.codingSeq)"""
+
+        return bytes(self.view(acc)).decode('ascii').upper()
+
+    # *************************************************************************
+
+    def _codons(self, acc):
+        """ Return iterator of codons as tuples of byte values, read from buffer"""
+
+        view = self.view(acc)
+        end = len(view) - len(view) % 3
+        return zip(view[0:end:3], view[1:end:3], view[2:end:3])
+
+    # *************************************************************************
+
+    def codon_counts(self, acc):
+        """ Return codon frequency dictionary for gene, as codon_usage.codonFreq"""
+
+        freq = dict.fromkeys(codon_usage.codonFreq(''), 0)
+        for bases, n in Counter(self._codons(acc)).items():
+            codon = CODON_KEYS.get(bases)
+            if codon is not None:
+                freq[codon] += n
+        return freq
+
+    # *************************************************************************
+
+    def total_counts(self):
+        """ Return codon frequency dictionary summed over all genes in buffer"""
+
+        counts = Counter()
+        for acc in self.accessions:
+            counts.update(self._codons(acc))
+        freq = dict.fromkeys(codon_usage.codonFreq(''), 0)
+        for bases, n in counts.items():
+            codon = CODON_KEYS.get(bases)
+            if codon is not None:
+                freq[codon] += n
+        return freq
+
+    # *************************************************************************
+
+    def translate(self, acc):
+        """ Return amino acid sequence for gene ('x' for codons with unknown bases), as seq_module.translate"""
+
+        return ''.join([CODON_AA.get(bases, 'x') for bases in self._codons(acc)])
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    import exon_table
+    from data_access import seq_query
+
+    table = exon_table.ExonTable.from_query()
+    accessions = sys.argv[1:] or ['AB000381.1']
+    batch = CodingBuffer.assemble(table, (seq_query.seq_query(acc) for acc in accessions))
+    for acc in batch.accessions:
+        print(acc, len(batch.view(acc)), batch.translate(acc))
+    print(batch.total_counts())
@@ -0,0 +1,303 @@
+#!/usr/bin python3
+
+""" Grouped Codon Usage Module """
+
+"""
+Program:        codon_groups
+File:           codon_groups.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       Codon usage for groups of genes (band, location, gene id, product or gene lists)
+                from stored per-gene codon counts.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+CodonCounts holds the codon counts of every gene as one flat array (WIDTH = 64 counts per gene, in
+whole_genome_freq.CODONS order). It is loaded from the shard files written by
+whole_genome_freq (--shard-index/--shard-count, one shard of 1 for the whole chromosome),
+or calculated with whole_genome_freq.gene_counts (one exon table for the run, one sequence
+query per chunk of genes) and saved in the same format.
+
+Groupings are lists of (group, accession) pairs, made from the gene catalog:
+    key_members         one group per location, cytogenetic band (eg. '8q24'), or gene id
+    product_members     one group per product substring (case-insensitive)
+    list_members        named lists of accession numbers
+A gene may belong to several groups. group_totals collects the rows of each group in one
+pass over the pairs and sums them column by column (zip/sum).
+group_usage returns whole_genome_freq.usage_stats, ie. the same (SynCodons, usage_dict) as
+total_usage, for every group.
+
+Usage:
+======
+codon_groups        --counts FILE [FILE ...] [--by band|location|genid] [--product TEXT ...]
+                    [--list NAME=FILE ...]
+codon_groups        --save FILE
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+V1.1           19.10.26         Groups collected by key (1 and '1' kept apart)
+V1.2           19.10.26         Counts calculated with whole_genome_freq.gene_counts (strand aware)
+V1.3           19.10.26         Row width taken from the codon table
+"""
+#*****************************************************************************
+# Import libraries
+
+import argparse
+import gzip
+import json
+import os
+import re
+from array import array
+
+import whole_genome_freq
+from whole_genome_freq import CODONS
+
+#*****************************************************************************
+
+band_re     = re.compile(r'^(\d+|[XY])?\.?([pq])(\d+)')
+
+KEYS        = ('band', 'location', 'genid')
+
+## counts per gene, one for each codon
+WIDTH       = len(CODONS)
+
+#*****************************************************************************
+
+class CodonCounts:
+    """ Codon counts for many genes, one per codon (WIDTH) per gene in one flat array"""
+
+    def __init__(self):
+        """ Create empty table"""
+
+        self.accessions = []
+        self.index = {}
+        self.counts = array('l')
+
+    # **************************************************************************************
+
+    @classmethod
+    def from_genes(cls, genes):
+        """ Create table from {accession: list of codon counts (CODONS order)}"""
+
+        table = cls()
+        for acc, counts in genes.items():
+            table.add(acc, counts)
+        return table
+
+    # **************************************************************************************
+
+    @classmethod
+    def from_shards(cls, paths):
+        """ Create table from whole_genome_freq shard files (a gene in several files is kept once)"""
+
+        genes = {}
+        for path in paths:
+            genes.update(whole_genome_freq.read_shard(path))
+        return cls.from_genes(genes)
+
+    # **************************************************************************************
+
+    @classmethod
+    def from_query(cls, accessions=None, chunk=200):
+        """ Calculate codon counts for genes (default whole chromosome), one sequence query per
+            chunk (whole_genome_freq.gene_counts); genes without valid sequence or coding regions
+            are left out"""
+
+        if accessions is None:
+            accessions = whole_genome_freq.chromosome_accessions()
+        genes = {}
+        for group, codon_table in whole_genome_freq.gene_counts(accessions, chunk=chunk):
+            if codon_table is None:
+                continue
+            counts = [codon_table[codon] for codon in CODONS]
+            for acc in group:
+                genes[acc] = counts
+        ## genes kept in input order
+        return cls.from_genes({acc: genes[acc] for acc in accessions if acc in genes})
+
+    # **************************************************************************************
+
+    def add(self, acc, counts):
+        """ Add gene, replacing its counts if already present"""
+
+        if len(counts) != len(CODONS):
+            raise ValueError(acc + ': expected ' + str(len(CODONS)) + ' codon counts')
+        i = self.index.get(acc)
+        if i is None:
+            self.index[acc] = len(self.accessions)
+            self.accessions.append(acc)
+            self.counts.extend(counts)
+        else:
+            self.counts[i * WIDTH:(i + 1) * WIDTH] = array('l', counts)
+
+    # **************************************************************************************
+
+    def row(self, acc):
+        """ Return codon counts of gene (array, CODONS order)"""
+
+        i = self.index[acc]
+        return self.counts[i * WIDTH:(i + 1) * WIDTH]
+
+    # **************************************************************************************
+
+    def save(self, path):
+        """ Write table as a single whole_genome_freq shard file (shard 0 of 1)"""
+
+        totals = [sum(self.counts[i::WIDTH]) for i in range(WIDTH)]
+        partial = {'format': 'codon-shard', 'version': 1, 'shard': [0, 1],
+                   'codons': list(CODONS), 'totals': totals,
+                   'genes': {acc: list(self.row(acc)) for acc in self.accessions}}
+        tmp = path + '.tmp'
+        with gzip.open(tmp, 'wt') as f:
+            json.dump(partial, f, separators=(',', ':'))
+        os.replace(tmp, path)
+
+    # **************************************************************************************
+
+    def __len__(self):
+        return len(self.accessions)
+
+    def __contains__(self, acc):
+        return acc in self.index
+
+#*****************************************************************************
+
+def band_of(location):
+    """Return main cytogenetic band of location, eg. '8q24.3' -> '8q24' (None if not a band)"""
+
+    m = band_re.match(location.replace(' ', '')) if location else None
+    if m is None:
+        return None
+    return (m.group(1) or '') + m.group(2) + m.group(3)
+
+#*****************************************************************************
+
+def key_members(catalog, key='band'):
+    """Return (group, accession) pairs grouping every gene in catalog by one field.
+    Input           catalog             gene_module.GeneCatalog
+                    key                 'band', 'location', 'genid' or a function of a GeneRecord
+
+    Output          members             list of (group, accession); genes whose key is empty
+                                        (or not a band) are left out
+    """
+    if key == 'band':
+        key = lambda record: band_of(record.location)
+    elif key in KEYS:
+        field = key
+        key = lambda record: getattr(record, field)
+    members = []
+    for record in catalog:
+        group = key(record)
+        if group:
+            members.append((group, record.acc))
+    return members
+
+#*****************************************************************************
+
+def product_members(catalog, substrings):
+    """Return (substring, accession) pairs for genes whose product contains each substring
+       (case-insensitive)"""
+
+    members = []
+    for record in catalog:
+        product = (record.product or '').lower()
+        for text in substrings:
+            if text.lower() in product:
+                members.append((text, record.acc))
+    return members
+
+#*****************************************************************************
+
+def list_members(lists):
+    """Return (name, accession) pairs for {name: list of accession numbers}"""
+
+    return [(name, acc) for name, accessions in lists.items() for acc in accessions]
+
+#*****************************************************************************
+
+def group_totals(counts, members):
+    """Return summed codon counts for each group.
+    Input           counts              CodonCounts
+                    members             iterable of (group, accession); accessions not in
+                                        counts are ignored, repeated pairs counted once
+
+    Output          totals              {group: [codon counts in CODONS order]}
+    """
+    index = counts.index
+    rows = {}
+    for group, acc in members:
+        if acc in index:
+            rows.setdefault(group, set()).add(index[acc])
+    flat = counts.counts
+
+    totals = {}
+    for group, genes in rows.items():
+        totals[group] = list(map(sum, zip(*(flat[i * WIDTH:(i + 1) * WIDTH] for i in sorted(genes)))))
+    return totals
+
+#*****************************************************************************
+
+def group_usage(counts, members):
+    """Return codon usage of each group, as whole_genome_freq.total_usage.
+    Output          usage               {group: (SynCodons, usage_dict)}; groups with no codons
+                                        are left out
+    """
+    usage = {}
+    for group, totals in group_totals(counts, members).items():
+        if sum(totals):
+            usage[group] = whole_genome_freq.usage_stats(dict(zip(CODONS, totals)))
+    return usage
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Codon usage for groups of genes')
+    parser.add_argument('--counts', nargs='+', metavar='FILE', help='shard files with per-gene counts')
+    parser.add_argument('--save', metavar='FILE', help='calculate counts for every gene and save them')
+    parser.add_argument('--by', choices=KEYS, help='group by catalog field')
+    parser.add_argument('--product', nargs='+', metavar='TEXT', help='one group per product substring')
+    parser.add_argument('--list', nargs='+', metavar='NAME=FILE', help='named files of accessions')
+    parser.add_argument('--sqlite', help='use local SQLite stand-in database instead of MySQL')
+    args = parser.parse_args()
+
+    if args.sqlite:
+        from data_access import connection
+        connection.use_sqlite(args.sqlite)
+
+    if args.save:
+        CodonCounts.from_query().save(args.save)
+        exit(0)
+
+    table = CodonCounts.from_shards(args.counts) if args.counts else CodonCounts.from_query()
+    ## default grouping: cytogenetic band
+    if not (args.by or args.product or args.list):
+        args.by = 'band'
+
+    members = []
+    if args.by or args.product:
+        import gene_module
+        catalog = gene_module.GeneCatalog.from_query()
+        if args.by:
+            members += key_members(catalog, args.by)
+        if args.product:
+            members += product_members(catalog, args.product)
+    if args.list:
+        lists = {}
+        for item in args.list:
+            name, path = item.split('=', 1)
+            with open(path) as f:
+                lists[name] = [line.strip() for line in f if line.strip()]
+        members += list_members(lists)
+
+    for group, (SynCodons, usage_dict) in sorted(group_usage(table, members).items()):
+        print(json.dumps({'group': group, 'usage': usage_dict}))
@@ -0,0 +1,386 @@
+#!/usr/bin python3
+
+""" Codon Usage Similarity Module """
+
+"""
+Program:        codon_similarity
+File:           codon_similarity.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       Find genes with the most similar codon usage (cosine or Euclidean), exactly or
+                with an approximate index.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+UsageMatrix holds the codon usage of every gene as a row of WIDTH = 64 frequencies (codon
+count / all codons of the gene, whole_genome_freq.CODONS order) in one flat array, with the
+squared length of each row. Both measures come from the dot product of two rows:
+    cosine              dot / (|a| |b|)                 higher is more similar
+    euclidean           sqrt(|a|^2 + |b|^2 - 2 dot)     lower is more similar
+Queries are compared with the genes a block at a time (rows of a block are sliced out once
+and used for every query in the batch), keeping a heap of the best k for each query, so
+similar_all precomputes the neighbours of every gene in one pass over the matrix.
+
+HyperplaneIndex is an optional approximate index (random hyperplane locality sensitive
+hashing): each table gives every gene a signature of bits signs of its (centred) row against
+random hyperplanes; genes sharing a bucket with the query in any table are the candidates,
+and only they are scored exactly. In each table the query also probes the buckets one bit
+away in its probes least certain bits (projections closest to their hyperplane). If there
+are fewer candidates than k the exact search is used instead.
+
+Defaults (9 bits, 32 tables, 2 probes) keep the candidates to about a fifth of the genes.
+Measured on synthetic chromosomes (synthetic_chromosome, seed 8), 10 nearest genes by cosine,
+200 queries; recall is the share of the exact 10 found, time per query:
+    genes       bits/tables/probes      recall      scored      approx      exact
+    2,000       9/32/2                  0.60        20%         2.5 ms      9.2 ms
+    10,000      9/32/2                  0.71        20%         8.4 ms      31.5 ms
+    10,000      6/12/all 6              0.97        73%         32.3 ms     44.0 ms
+    10,000      8/32/2                  0.87        34%         13.8 ms     31.5 ms
+Synthetic genes have random sequences, so their usage vectors are more alike than real
+genes' and these recall figures are a lower bound. Building the index for 10,000 genes takes
+about 9 s (gene_server builds it at start-up).
+
+update and remove change one gene in place (the index is kept in step), so the matrix does
+not need rebuilding when genes change. Counts come from codon_groups.CodonCounts.
+
+Usage:
+======
+codon_similarity    [ACC] [--counts FILE ...] [--k N] [--metric cosine|euclidean] [--approx]
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+V1.1           19.10.26         Index defaults of 6 bits and 12 tables
+V1.2           19.10.26         Probes limited to the least certain bits; defaults for few candidates
+V1.3           19.10.26         Row width taken from the codon table
+"""
+#*****************************************************************************
+# Import libraries
+
+import argparse
+import heapq
+import json
+import math
+import operator
+import random
+from array import array
+
+from whole_genome_freq import CODONS
+
+#*****************************************************************************
+
+METRICS     = ('cosine', 'euclidean')
+
+## usage frequencies per gene, one for each codon
+WIDTH       = len(CODONS)
+
+## dot product of two rows (math.sumprod from Python 3.12)
+dot = getattr(math, 'sumprod', None) or (lambda a, b: sum(map(operator.mul, a, b)))
+
+#*****************************************************************************
+
+class UsageMatrix:
+    """ Codon usage frequencies of many genes, one per codon (WIDTH) per gene in one flat array"""
+
+    def __init__(self):
+        """ Create empty matrix"""
+
+        self.accessions = []
+        self.index = {}
+        self.rows = array('d')
+        self.squares = array('d')
+        self.lsh = None
+
+    # **************************************************************************************
+
+    @classmethod
+    def from_counts(cls, counts):
+        """ Create matrix from codon_groups.CodonCounts (genes with no codons are left out)"""
+
+        matrix = cls()
+        for acc in counts.accessions:
+            matrix.update(acc, counts.row(acc))
+        return matrix
+
+    # **************************************************************************************
+
+    def update(self, acc, counts):
+        """ Add or replace gene from its codon counts (CODONS order).
+            Output      added       False if gene has no codons (it is removed instead)"""
+
+        total = sum(counts)
+        if not total:
+            self.remove(acc)
+            return False
+        row = array('d', [count / total for count in counts])
+        i = self.index.get(acc)
+        if i is None:
+            self.index[acc] = i = len(self.accessions)
+            self.accessions.append(acc)
+            self.rows.extend(row)
+            self.squares.append(dot(row, row))
+        else:
+            self.rows[i * WIDTH:(i + 1) * WIDTH] = row
+            self.squares[i] = dot(row, row)
+        if self.lsh is not None:
+            self.lsh.add(acc, row)
+        return True
+
+    # **************************************************************************************
+
+    def remove(self, acc):
+        """ Remove gene (last gene moves into its place)"""
+
+        i = self.index.pop(acc, None)
+        if i is None:
+            return
+        if self.lsh is not None:
+            self.lsh.remove(acc)
+        last = len(self.accessions) - 1
+        if i != last:
+            moved = self.accessions[last]
+            self.accessions[i] = moved
+            self.index[moved] = i
+            self.rows[i * WIDTH:(i + 1) * WIDTH] = self.rows[last * WIDTH:]
+            self.squares[i] = self.squares[last]
+        self.accessions.pop()
+        del self.rows[last * WIDTH:]
+        self.squares.pop()
+
+    # **************************************************************************************
+
+    def vector(self, acc):
+        """ Return usage frequencies of gene (array, CODONS order)"""
+
+        i = self.index[acc]
+        return self.rows[i * WIDTH:(i + 1) * WIDTH]
+
+    # **************************************************************************************
+
+    def build_index(self, bits=9, tables=32, probes=2, seed=8):
+        """ Build approximate index over current genes; kept up to date by update and remove"""
+
+        self.lsh = HyperplaneIndex(self, bits, tables, probes, seed)
+        return self.lsh
+
+    # **************************************************************************************
+
+    def nearest(self, queries, k=10, metric='cosine', candidates=None, block=256):
+        """ Return the k most similar genes for each query.
+        Input           queries             list of (accession or None, usage vector); a query
+                                            gene is not returned as its own neighbour
+                        k                   neighbours per query
+                        metric              'cosine' or 'euclidean'
+                        candidates          row numbers to score (default every gene)
+                        block               genes scored per block
+
+        Output          neighbours          list (one per query) of [(accession, score), ...],
+                                            most similar first
+        """
+        if metric not in METRICS:
+            raise ValueError('metric must be cosine or euclidean')
+        cosine = metric == 'cosine'
+        rows, squares = self.rows, self.squares
+        if candidates is None:
+            candidates = range(len(self.accessions))
+        candidates = list(candidates)
+
+        ## heaps hold (similarity, row), similarity = cosine or -distance^2
+        heaps = [[] for _ in queries]
+        query_squares = [dot(vector, vector) for _, vector in queries]
+        skip = [self.index.get(acc) for acc, _ in queries]
+        for start in range(0, len(candidates), block):
+            part = candidates[start:start + block]
+            part_rows = [rows[i * WIDTH:(i + 1) * WIDTH] for i in part]
+            for q, (_, vector) in enumerate(queries):
+                heap, q_square = heaps[q], query_squares[q]
+                for i, row in zip(part, part_rows):
+                    if i == skip[q]:
+                        continue
+                    product = dot(vector, row)
+                    if cosine:
+                        norms = math.sqrt(q_square * squares[i])
+                        score = product / norms if norms else 0.0
+                    else:
+                        score = 2 * product - q_square - squares[i]
+                    if len(heap) < k:
+                        heapq.heappush(heap, (score, i))
+                    elif score > heap[0][0]:
+                        heapq.heapreplace(heap, (score, i))
+
+        neighbours = []
+        for heap in heaps:
+            best = sorted(heap, reverse=True)
+            if cosine:
+                neighbours.append([(self.accessions[i], score) for score, i in best])
+            else:
+                neighbours.append([(self.accessions[i], math.sqrt(max(-score, 0.0))) for score, i in best])
+        return neighbours
+
+    # **************************************************************************************
+
+    def similar(self, acc, k=10, metric='cosine', approx=False):
+        """ Return [(accession, score), ...] of the k genes with codon usage most like acc's.
+            approx uses the index (built on first use) instead of scoring every gene."""
+
+        vector = self.vector(acc)
+        candidates = None
+        if approx:
+            if self.lsh is None:
+                self.build_index()
+            found = self.lsh.candidates(vector)
+            found.discard(self.index[acc])
+            if len(found) >= k:
+                candidates = sorted(found)
+        return self.nearest([(acc, vector)], k, metric, candidates)[0]
+
+    # **************************************************************************************
+
+    def similar_all(self, k=10, metric='cosine', batch=256):
+        """ Yield (accession, [(accession, score), ...]) for every gene, scoring a batch of
+            genes against each block of the matrix"""
+
+        for start in range(0, len(self.accessions), batch):
+            part = self.accessions[start:start + batch]
+            queries = [(acc, self.vector(acc)) for acc in part]
+            for acc, found in zip(part, self.nearest(queries, k, metric)):
+                yield acc, found
+
+    # **************************************************************************************
+
+    def __len__(self):
+        return len(self.accessions)
+
+    def __contains__(self, acc):
+        return acc in self.index
+
+#*****************************************************************************
+
+class HyperplaneIndex:
+    """ Random hyperplane hash tables over UsageMatrix rows (approximate cosine neighbours)"""
+
+    def __init__(self, matrix, bits=9, tables=32, probes=2, seed=8):
+        """ Create index and add every gene of matrix.
+        Input           matrix              UsageMatrix
+                        bits                hyperplanes (signature bits) per table
+                        tables              number of hash tables
+                        probes              least certain bits flipped per table when querying
+                        seed                random seed, so every process builds the same index
+        """
+        self.matrix = matrix
+        self.probes = probes
+        rng = random.Random(seed)
+        self.planes = [[array('d', [rng.gauss(0.0, 1.0) for _ in range(WIDTH)]) for _ in range(bits)]
+                       for _ in range(tables)]
+        ## centre rows on the mean usage: frequencies are all positive, so uncentred rows
+        ## would nearly all fall on the same side of every hyperplane
+        n = len(matrix) or 1
+        self.centre = array('d', [sum(matrix.rows[c::WIDTH]) / n for c in range(WIDTH)])
+        self.buckets = [{} for _ in range(tables)]
+        self.signatures = {}
+        for acc in matrix.accessions:
+            self.add(acc, matrix.vector(acc))
+
+    # **************************************************************************************
+
+    def project(self, planes, centred):
+        """ Return bucket key of centred vector in one table and its bits ordered from least
+            to most certain (smallest projection onto the hyperplane first)"""
+
+        key = 0
+        margins = []
+        for bit, plane in enumerate(reversed(planes)):
+            d = dot(plane, centred)
+            if d >= 0.0:
+                key |= 1 << bit
+            margins.append((abs(d), bit))
+        margins.sort()
+        return key, [bit for margin, bit in margins]
+
+    # **************************************************************************************
+
+    def signature(self, vector):
+        """ Return tuple of bucket keys (one int per table) for usage vector"""
+
+        centred = array('d', map(operator.sub, vector, self.centre))
+        return tuple(self.project(planes, centred)[0] for planes in self.planes)
+
+    # **************************************************************************************
+
+    def add(self, acc, vector):
+        """ Add gene or move it to the buckets of its new usage"""
+
+        self.remove(acc)
+        keys = self.signature(vector)
+        self.signatures[acc] = keys
+        for buckets, key in zip(self.buckets, keys):
+            buckets.setdefault(key, set()).add(acc)
+
+    # **************************************************************************************
+
+    def remove(self, acc):
+        """ Remove gene from index (no error if absent)"""
+
+        keys = self.signatures.pop(acc, None)
+        if keys is None:
+            return
+        for buckets, key in zip(self.buckets, keys):
+            members = buckets.get(key)
+            members.discard(acc)
+            if not members:
+                del buckets[key]
+
+    # **************************************************************************************
+
+    def candidates(self, vector, probes=None):
+        """ Return set of matrix row numbers sharing a bucket with vector in any table, or in a
+            bucket one bit away in one of the probes least certain bits (default self.probes)"""
+
+        if probes is None:
+            probes = self.probes
+        index = self.matrix.index
+        centred = array('d', map(operator.sub, vector, self.centre))
+        found = set()
+        for planes, buckets in zip(self.planes, self.buckets):
+            key, order = self.project(planes, centred)
+            for probe_key in [key] + [key ^ (1 << bit) for bit in order[:probes]]:
+                for acc in buckets.get(probe_key, ()):
+                    found.add(index[acc])
+        return found
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Genes with similar codon usage')
+    parser.add_argument('accession', nargs='?', default='AB000381.1')
+    parser.add_argument('--counts', nargs='+', metavar='FILE', help='codon count shard files (default calculate)')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--metric', choices=METRICS, default='cosine')
+    parser.add_argument('--approx', action='store_true', help='use approximate index')
+    parser.add_argument('--all', action='store_true', help='neighbours of every gene (NDJSON)')
+    parser.add_argument('--sqlite', help='use local SQLite stand-in database instead of MySQL')
+    args = parser.parse_args()
+
+    if args.sqlite:
+        from data_access import connection
+        connection.use_sqlite(args.sqlite)
+
+    from codon_groups import CodonCounts
+    counts = CodonCounts.from_shards(args.counts) if args.counts else CodonCounts.from_query()
+    matrix = UsageMatrix.from_counts(counts)
+
+    if args.all:
+        for acc, found in matrix.similar_all(args.k, args.metric):
+            print(json.dumps({'accession': acc, 'similar': [[a, round(s, 4)] for a, s in found]}))
+    else:
+        for acc, score in matrix.similar(args.accession, args.k, args.metric, args.approx):
+            print(acc, round(score, 4))
@@ -22,6 +22,8 @@ ______________________________________________________________________________
 Description:
 ============
 This program will calculate codon usage frequency, percentage, and ratio of codon usage preference for a particular sequence.
+codonFreq, usageRatio, codonPercent and usageFromSeq work on coding sequence strings and need no database;
+usageFromCounts does the same from a codon frequency dictionary (eg. coding_batch.CodingBuffer.codon_counts).
 
 
 Usage:
@@ -34,6 +36,8 @@ Revision History:
 V1.0           22.03.18         Original                                By: JJS
 V1.1           18.04.18         Renamed (from 'Codon_Usage_module')         JJS
 V1.2           22.04.18         Fixed bugs with uppercase and zero division JJS
+V1.3           19.10.26         usageFromSeq for caller-supplied sequences
+V1.4           19.10.26         usageFromCounts for codon counts already made
                                 
 """
 #**********************************************************************************
@@ -175,6 +179,26 @@ def getCodonusage(acc):
 
     26.04.18                Original                                By: JJS
 
+    """
+    return usageFromSeq(seq_module.codingSeq(acc))
+
+#**********************************************************************************
+
+def usageFromSeq(code_seq):
+    """Return codon usage ratio and percentage for a coding sequence string.
+    Input                   code_seq                                Coding sequence
+    Output                  (usage_dict, aa_dict)                   amino acid:codon dict
+                                                                    codon usage(ratio, percent)
+    """
+    return usageFromCounts(codonFreq(code_seq))
+
+#**********************************************************************************
+
+def usageFromCounts(codon_freq):
+    """Return codon usage ratio and percentage for codon frequencies of a coding sequence.
+    Input                   codon_freq                              Codon frequency dict, as codonFreq
+    Output                  (usage_dict, aa_dict)                   amino acid:codon dict
+                                                                    codon usage(ratio, percent)
     """
     SynCodons = {
         'C': ['TGT', 'TGC'],
@@ -199,11 +223,6 @@ def getCodonusage(acc):
         'Y': ['TAT', 'TAC'],
         '_': ['TAG', 'TGA', 'TAA']}
 
-    code_seq = seq_module.codingSeq(acc)
-
-    ## calculate raw frequencies of codon usage
-    codon_freq = codonFreq(code_seq)
-
     ## find each amino acid codon usage ratio
     ratio = usageRatio(codon_freq)
 
@@ -0,0 +1,222 @@
+#!/usr/bin python3
+
+""" Sequence Composition Module """
+
+"""
+Program:        composition
+File:           composition.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       GC content and CpG observed/expected ratio in sliding windows, and CpG island calling.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+The sequence is divided into blocks of step bases. For each block the C, G, N and CG
+dinucleotide counts are taken with str.count (a CG starting on the last base of a block
+belongs to that block) and added into cumulative-sum arrays, one entry per block. A CG
+spanning a block boundary is also marked at that boundary, so a window ending there leaves
+it out: a CG is counted only when both of its bases are in the window. The counts
+for any window made of whole blocks are then a difference of two array entries, so every
+window costs the same however long it is, and memory grows with the number of windows, not
+with the sequence length.
+
+For a window of L bases (N not counted):
+    GC fraction         (C + G) / L
+    CpG obs/exp         CG * L / (C * G)            (Gardiner-Garden and Frommer)
+
+CpG islands are runs of overlapping windows passing all thresholds (by default length >= 200,
+GC >= 0.5, obs/exp >= 0.6), merged into one region and kept if the whole region passes too.
+batch_islands reads every sequence through seq_query.seq_stream, one gene at a time.
+
+Usage:
+======
+composition     [ACC] [--all] [--window N] [--step N] [--min-length N]
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+V1.1           19.10.26         Window length and island length kept separate
+V1.2           19.10.26         CpG counted only with both bases in the window; no windows for ''
+"""
+#*****************************************************************************
+# Import libraries
+
+import argparse
+import json
+from array import array
+
+#*****************************************************************************
+
+## CpG island thresholds (Gardiner-Garden and Frommer 1987)
+MIN_LENGTH  = 200
+MIN_GC      = 0.5
+MIN_OE      = 0.6
+
+#*****************************************************************************
+
+def block_sums(seq, step=10):
+    """Return cumulative C, G, CG and N counts at block boundaries.
+    Input           seq                 sequence (either case)
+                    step                block size
+
+    Output          sums                {'C', 'G', 'CG', 'N', 'EDGE': array}; entry i counts bases
+                                        in seq[:i * step] (last block may be shorter); EDGE entry i
+                                        is 1 if a CG spans the boundary at i * step, not a sum
+    """
+    seq = seq.upper()
+    sums = {name: array('l', [0]) for name in ('C', 'G', 'CG', 'N', 'EDGE')}
+    c = g = cg = n = 0
+    for start in range(0, len(seq), step):
+        block = seq[start:start + step]
+        c += block.count('C')
+        g += block.count('G')
+        n += block.count('N')
+        cg += seq[start:start + step + 1].count('CG')
+        sums['C'].append(c)
+        sums['G'].append(g)
+        sums['CG'].append(cg)
+        sums['N'].append(n)
+        sums['EDGE'].append(seq[start + step - 1:start + step + 1] == 'CG')
+    return sums
+
+#*****************************************************************************
+
+def region_stats(sums, first, last, length):
+    """Return (gc fraction, CpG obs/exp) for blocks first..last - 1 covering length bases"""
+
+    c = sums['C'][last] - sums['C'][first]
+    g = sums['G'][last] - sums['G'][first]
+    ## a CG whose G is past the last block is not in the region
+    cg = sums['CG'][last] - sums['CG'][first] - sums['EDGE'][last]
+    bases = length - (sums['N'][last] - sums['N'][first])
+    if bases <= 0:
+        return 0.0, 0.0
+    gc = (c + g) / bases
+    oe = cg * bases / (c * g) if c and g else 0.0
+    return gc, oe
+
+#*****************************************************************************
+
+def windows(seq, window=200, step=10, sums=None):
+    """Return GC fraction and CpG obs/exp for windows moving step bases at a time.
+    Input           seq                 sequence
+                    window              window length (rounded up to a multiple of step)
+                    step                distance between window starts
+
+    Output          (starts, gc, oe)    arrays, one entry per window (none for an empty sequence)
+    """
+    if sums is None:
+        sums = block_sums(seq, step)
+    blocks = -(-window // step)
+    starts, gc_values, oe_values = array('l'), array('d'), array('d')
+    total = len(sums['C']) - 1
+    if not total:
+        return starts, gc_values, oe_values
+    for first in range(0, max(total - blocks, 0) + 1):
+        last = min(first + blocks, total)
+        start = first * step
+        gc, oe = region_stats(sums, first, last, min(last * step, len(seq)) - start)
+        starts.append(start)
+        gc_values.append(gc)
+        oe_values.append(oe)
+    return starts, gc_values, oe_values
+
+#*****************************************************************************
+
+def cpg_islands(seq, min_length=MIN_LENGTH, min_gc=MIN_GC, min_oe=MIN_OE, step=10, sums=None):
+    """Return CpG islands in sequence.
+    Input           seq                 sequence
+                    min_length          shortest island (also the window length)
+                    min_gc              lowest GC fraction
+                    min_oe              lowest CpG obs/exp ratio
+                    step                block size / window step
+
+    Output          islands             list of (start, end, gc, oe), start and end counting from 0,
+                                        end exclusive
+    """
+    if sums is None:
+        sums = block_sums(seq, step)
+    if len(seq) < min_length:
+        return []
+    blocks = -(-min_length // step)
+    total = len(sums['C']) - 1
+
+    ## runs of passing windows, as block ranges
+    runs = []
+    for first in range(0, max(total - blocks, 0) + 1):
+        last = min(first + blocks, total)
+        gc, oe = region_stats(sums, first, last, min(last * step, len(seq)) - first * step)
+        if gc >= min_gc and oe >= min_oe:
+            if runs and first <= runs[-1][1]:
+                runs[-1][1] = last
+            else:
+                runs.append([first, last])
+
+    islands = []
+    for first, last in runs:
+        start, end = first * step, min(last * step, len(seq))
+        gc, oe = region_stats(sums, first, last, end - start)
+        if end - start >= min_length and gc >= min_gc and oe >= min_oe:
+            islands.append((start, end, round(gc, 3), round(oe, 3)))
+    return islands
+
+#*****************************************************************************
+
+def gene_composition(acc, window=200, step=10, min_length=MIN_LENGTH):
+    """Return composition of a gene's genomic sequence.
+    Input           acc                 accession number
+                    window              length of reported windows
+                    step                distance between window starts
+                    min_length          shortest CpG island
+
+    Output          composition         {'accession', 'length', 'gc', 'oe', 'islands',
+                                         'windows': {'start', 'gc', 'oe'}}
+    """
+    import seq_module
+    seq = seq_module.getSeq(acc)[1]
+    sums = block_sums(seq, step)
+    gc, oe = region_stats(sums, 0, len(sums['C']) - 1, len(seq))
+    starts, gc_values, oe_values = windows(seq, window, step, sums)
+    return {'accession': acc, 'length': len(seq), 'gc': round(gc, 3), 'oe': round(oe, 3),
+            'islands': cpg_islands(seq, min_length, step=step, sums=sums),
+            'windows': {'start': list(starts), 'gc': [round(v, 3) for v in gc_values],
+                        'oe': [round(v, 3) for v in oe_values]}}
+
+#*****************************************************************************
+
+def batch_islands(rows, min_length=MIN_LENGTH, min_gc=MIN_GC, min_oe=MIN_OE, step=10):
+    """Yield {'accession', 'length', 'gc', 'oe', 'islands'} for every sequence in rows,
+       eg. seq_query.seq_stream(); only one sequence is held at a time."""
+
+    for acc, seq in rows:
+        sums = block_sums(seq, step)
+        gc, oe = region_stats(sums, 0, len(sums['C']) - 1, len(seq))
+        yield {'accession': acc, 'length': len(seq), 'gc': round(gc, 3), 'oe': round(oe, 3),
+               'islands': cpg_islands(seq, min_length, min_gc, min_oe, step, sums)}
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='GC content and CpG islands')
+    parser.add_argument('accession', nargs='?', default='AB000381.1')
+    parser.add_argument('--all', action='store_true', help='CpG islands for every gene (NDJSON)')
+    parser.add_argument('--window', type=int, default=200, help='length of reported windows')
+    parser.add_argument('--step', type=int, default=10)
+    parser.add_argument('--min-length', type=int, default=MIN_LENGTH, help='shortest CpG island')
+    args = parser.parse_args()
+
+    if args.all:
+        from data_access import seq_query
+        for record in batch_islands(seq_query.seq_stream(), args.min_length, step=args.step):
+            print(json.dumps(record))
+    else:
+        print(json.dumps(gene_composition(args.accession, args.window, args.step, args.min_length)))
@@ -32,24 +32,15 @@ Revision History:
 =================
 
 v1.0                      07.05.18          Original                                        By:Jennifer J. Stiens
+v1.1                      19.10.26          Per-thread connection from connection module
+v1.2                      19.10.26          Query for all coding regions
+v1.3                      19.10.26          Bulk coding region query
 
 """
 # *****************************************************************************
 # Import libraries
 
-import pymysql
-from data_access import config_db
-
-# *****************************************************************************
-
-# Connect to MySQL Database
-cnx = pymysql.connect(host=config_db.database_config['dbhost'],
-                      port=config_db.database_config['port'],
-                      user=config_db.database_config['dbuser'],
-                      passwd=config_db.database_config['dbpass'],
-                      db=config_db.database_config['dbname'])
-cursor = cnx.cursor(pymysql.cursors.DictCursor)
-
+from data_access import connection
 
 # *****************************************************************************
 
@@ -59,6 +50,7 @@ def coding_query(acc):
         Output          coding_info         (accession number, codon start, exon boundaries)
         """
 
+    cnx = connection.get_connection()
     with cnx.cursor() as cursor:
         # Read a single record
         query = "SELECT accession,  codon_start, positions FROM coding_regions WHERE accession = %s;"
@@ -67,6 +59,42 @@ def coding_query(acc):
 
     return coding_regions
 
+# *****************************************************************************
+
+def all_coding_query():
+    """ Return coding information for every gene in one query.
+        Output          coding_info         list of (accession number, codon start, exon boundaries)
+        """
+
+    cnx = connection.get_connection()
+    with cnx.cursor() as cursor:
+        query = "SELECT accession, codon_start, positions FROM coding_regions ORDER BY accession;"
+        cursor.execute(query)
+        coding_regions = cursor.fetchall()
+
+    return list(coding_regions)
+
+# *****************************************************************************
+
+def coding_bulk_query(accessions):
+    """ Return coding information for many genes in one query.
+        Input           accessions          list of accession numbers
+        Output          coding_info         list of (accession number, codon start, exon boundaries);
+                                            genes not found are left out
+        """
+
+    accessions = list(accessions)
+    if not accessions:
+        return []
+    cnx = connection.get_connection()
+    with cnx.cursor() as cursor:
+        query = ("SELECT accession, codon_start, positions FROM coding_regions WHERE accession IN (" +
+                 ', '.join(['%s'] * len(accessions)) + ");")
+        cursor.execute(query, accessions)
+        coding_regions = cursor.fetchall()
+
+    return list(coding_regions)
+
 
 # *****************************************************************************
 ## main
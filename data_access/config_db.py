@@ -11,5 +11,8 @@ database_config = {
     'dbhost' :'Jennifer-J-Stienss-MacBook-Pro.local',
     'dbuser' : 'root',
     'dbpass' : 'password',
-    'port'   : 3306
+    'port'   : 3306,
+    ## 'sqlite' uses a local SQLite stand-in database (sqlite_path) instead of MySQL
+    'engine' : 'mysql',
+    'sqlite_path' : 'chromosome8.db'
     }
\ No newline at end of file
@@ -0,0 +1,240 @@
+#!/usr/bin python3
+
+""" Data Access program for database connections """
+"""
+Program:        connection
+File:           connection.py
+
+Version:    1.0
+Date:       19.10.26
+Function:   Open database connections for the query programs (MySQL, or a local SQLite stand-in)
+
+Course:     MSc Bioinformatics, Birkbeck University of London
+            Biocomputing2 Coursework Assignment
+
+_____________________________________________________________________________
+
+Description:
+============
+Connections are opened on first use and kept one per thread, so a pool of worker threads
+(eg. the web service) shares a fixed set of connections and no connection is used by two
+threads at once. Settings come from config_db; setting engine to 'sqlite' uses a local SQLite
+file with the same tables (genbank, sequence, coding_regions) for testing without MySQL.
+The SQLite stand-in accepts the same '%s' query parameters and provides the CRC32, SHA1 and
+CONCAT_WS functions used by the queries.
+pymysql and sqlite3 are only imported when the first connection is opened, so importing the
+query programs (and the analysis modules using them) is fast and works without either.
+
+Usage:
+======
+
+connection
+
+Revision History:
+=================
+
+v1.0                      19.10.26          Original
+v1.1                      19.10.26          Database drivers imported on first connection
+v1.2                      19.10.26          SHA1 function for SQLite stand-in
+v1.3                      19.10.26          Missing table errors recognised for either driver
+
+"""
+#*****************************************************************************
+# Import libraries
+
+import hashlib
+import sys
+import threading
+import zlib
+
+from data_access import config_db
+
+#*****************************************************************************
+
+## tables used by the query programs (SQLite stand-in)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS genbank (
+    accession   VARCHAR(20) PRIMARY KEY,
+    gene        TEXT,
+    product     TEXT,
+    location    TEXT);
+CREATE TABLE IF NOT EXISTS sequence (
+    accession   VARCHAR(20) PRIMARY KEY,
+    sequence    TEXT);
+CREATE TABLE IF NOT EXISTS coding_regions (
+    accession   VARCHAR(20) PRIMARY KEY,
+    codon_start INTEGER,
+    positions   TEXT);
+"""
+
+local = threading.local()
+generation = 0
+
+#*****************************************************************************
+
+class SqliteCursor:
+    """ Cursor for SQLite stand-in behaving like a pymysql cursor"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def execute(self, query, args=None):
+        self._cursor.execute(query.replace('%s', '?'), tuple(args) if args else ())
+        return self._cursor.rowcount
+
+    def executemany(self, query, args):
+        self._cursor.executemany(query.replace('%s', '?'), args)
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+#*****************************************************************************
+
+class SqliteConnection:
+    """ Connection to SQLite stand-in database behaving like a pymysql connection"""
+
+    def __init__(self, path):
+        import sqlite3
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.create_function('CRC32', 1, crc32, deterministic=True)
+        self._db.create_function('SHA1', 1, sha1, deterministic=True)
+        self._db.create_function('CONCAT_WS', -1, concat_ws, deterministic=True)
+
+    def cursor(self, cursorclass=None):
+        return SqliteCursor(self._db.cursor())
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def close(self):
+        self._db.close()
+
+#*****************************************************************************
+
+def crc32(value):
+    """ MySQL CRC32() for SQLite stand-in"""
+    if value is None:
+        return None
+    return zlib.crc32(str(value).encode('utf-8'))
+
+def sha1(value):
+    """ MySQL SHA1() for SQLite stand-in (lowercase hex digest)"""
+    if value is None:
+        return None
+    return hashlib.sha1(str(value).encode('utf-8')).hexdigest()
+
+def concat_ws(sep, *values):
+    """ MySQL CONCAT_WS() for SQLite stand-in (NULL values are skipped)"""
+    return sep.join(str(v) for v in values if v is not None)
+
+#*****************************************************************************
+
+def connect():
+    """ Open a new connection using settings in config_db.
+        Output          cnx             pymysql connection, or SqliteConnection if engine is 'sqlite'
+        """
+    config = config_db.database_config
+    if config.get('engine', 'mysql') == 'sqlite':
+        return SqliteConnection(config['sqlite_path'])
+    import pymysql
+    return pymysql.connect(host=config['dbhost'],
+                           port=config['port'],
+                           user=config['dbuser'],
+                           passwd=config['dbpass'],
+                           db=config['dbname'])
+
+#*****************************************************************************
+
+def get_connection():
+    """ Return connection for the current thread, opening it on first use"""
+    cnx = getattr(local, 'cnx', None)
+    if cnx is None or getattr(local, 'generation', None) != generation:
+        cnx = connect()
+        local.cnx = cnx
+        local.generation = generation
+    return cnx
+
+#*****************************************************************************
+
+def stream_cursor(cnx):
+    """ Return unbuffered cursor for reading large results row by row"""
+    if isinstance(cnx, SqliteConnection):
+        return cnx.cursor()
+    import pymysql.cursors
+    return cnx.cursor(pymysql.cursors.SSCursor)
+
+#*****************************************************************************
+
+def missing_table(error):
+    """ Return True if error is the database driver's 'table does not exist' error
+        (MySQL error 1146, SQLite 'no such table'); other errors, eg. a lost connection or
+        missing privileges, are not"""
+    sqlite3 = sys.modules.get('sqlite3')
+    if sqlite3 is not None and isinstance(error, sqlite3.OperationalError):
+        return str(error).startswith('no such table')
+    pymysql = sys.modules.get('pymysql')
+    if pymysql is not None and isinstance(error, pymysql.err.ProgrammingError):
+        return bool(error.args) and error.args[0] == 1146
+    return False
+
+#*****************************************************************************
+
+def use_sqlite(path):
+    """ Switch all query programs to SQLite stand-in database at path.
+        Connections already opened by other threads are replaced on their next query.
+        """
+    global generation
+    config_db.database_config['engine'] = 'sqlite'
+    config_db.database_config['sqlite_path'] = path
+    generation += 1
+
+#*****************************************************************************
+
+def reset():
+    """ Forget connections (eg. in a child process after fork), so new ones are opened on next query"""
+    global generation
+    generation += 1
+
+#*****************************************************************************
+
+def create_sqlite(path):
+    """ Create SQLite stand-in database with empty genbank, sequence and coding_regions tables.
+        Output          cnx             SqliteConnection to the new database
+        """
+    cnx = SqliteConnection(path)
+    cnx._db.executescript(SQLITE_SCHEMA)
+    cnx.commit()
+    return cnx
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    cnx = get_connection()
+    with cnx.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM genbank;")
+        print(cursor.fetchone())
@@ -0,0 +1,115 @@
+#!/usr/bin python3
+
+""" Data Access program for stored restriction enzyme results """
+"""
+Program:        enzyme_query
+File:           enzyme_query.py
+
+Version:    1.0
+Date:       19.10.26
+Function:   Store and read precomputed restriction enzyme results for each gene and enzyme
+
+Course:     MSc Bioinformatics, Birkbeck University of London
+            Biocomputing2 Coursework Assignment
+
+_____________________________________________________________________________
+
+Description:
+============
+Query program for the enzyme_sites table written by enzyme_batch. There is one row per gene
+and enzyme (including enzymes that do not cut, with cut_count 0), so the website can list
+the enzymes safe for a gene with a single query. sites holds the cut positions as json:
+[[start, end, region, exon, cds offset], ...] as returned by seq_module.getEnzymeSites.
+
+Usage:
+======
+
+enzyme_query       ACC
+
+Revision History:
+=================
+
+v1.0                      19.10.26          Original
+v1.1                      19.10.26          Only a missing table means no results; repeats saved once
+
+"""
+#*****************************************************************************
+# Import libraries
+
+from data_access import connection
+
+#*****************************************************************************
+
+ENZYME_SCHEMA = """CREATE TABLE IF NOT EXISTS enzyme_sites (
+    accession   VARCHAR(20) NOT NULL,
+    enzyme      VARCHAR(40) NOT NULL,
+    status      VARCHAR(4) NOT NULL,
+    cut_count   INTEGER NOT NULL,
+    sites       TEXT,
+    PRIMARY KEY (accession, enzyme));"""
+
+#*****************************************************************************
+
+def create_enzyme_table():
+    """ Create enzyme_sites table if it does not exist"""
+
+    cnx = connection.get_connection()
+    with cnx.cursor() as cursor:
+        cursor.execute(ENZYME_SCHEMA)
+    cnx.commit()
+
+#*****************************************************************************
+
+def save_enzyme_results(accessions, rows):
+    """ Replace stored results for genes.
+        Input           accessions      accession numbers whose previous results are removed
+                        rows            list of (accession, enzyme, status, cut count, sites json);
+                                        for a gene and enzyme listed twice the last row is kept
+        """
+
+    accessions = list(dict.fromkeys(accessions))
+    rows = list({(row[0], row[1]): row for row in rows}.values())
+    cnx = connection.get_connection()
+    with cnx.cursor() as cursor:
+        if accessions:
+            query = ("DELETE FROM enzyme_sites WHERE accession IN (" +
+                     ', '.join(['%s'] * len(accessions)) + ");")
+            cursor.execute(query, accessions)
+        if rows:
+            query = "INSERT INTO enzyme_sites VALUES (%s, %s, %s, %s, %s);"
+            cursor.executemany(query, rows)
+    cnx.commit()
+
+#*****************************************************************************
+
+def enzyme_results_query(acc):
+    """ Return stored results for specified gene.
+        Input           acc             accession number
+        Output          results         list of (enzyme, status, cut count, sites json); empty if
+                                        the gene has not been analysed (or the table does not exist)
+        """
+
+    cnx = connection.get_connection()
+    with cnx.cursor() as cursor:
+        query = "SELECT enzyme, status, cut_count, sites FROM enzyme_sites WHERE accession = %s ORDER BY enzyme;"
+        try:
+            cursor.execute(query, (acc, ))
+        except Exception as e:
+            if not connection.missing_table(e):
+                raise
+            ## table not created yet: nothing stored
+            cnx.rollback()
+            return []
+        results = cursor.fetchall()
+
+    return list(results)
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    gene = 'AB000381.1'
+
+    for row in enzyme_results_query(gene):
+        print(row)
@@ -33,25 +33,21 @@ Revision History:
 =================
 
 v1.1                     07.05.18           Original         By:Jennifer J. Stiens
+v1.2                     19.10.26           Streaming genbank query
+v1.3                     19.10.26           Table fingerprint
+v1.4                     19.10.26           Per-thread connection from connection module
+v1.5                     19.10.26           NULL columns counted in fingerprint
                                             
 """
 
 #*****************************************************************************
 # Import libraries
-import pymysql
-from data_access import config_db
+from data_access import connection
 
 #*****************************************************************************
 
-# Connect to MySQL Database
-cnx = pymysql.connect(host=config_db.database_config['dbhost'],
-                        port=config_db.database_config['port'],
-                        user=config_db.database_config['dbuser'],
-                        passwd=config_db.database_config['dbpass'],
-                        db=config_db.database_config['dbname'])
-cursor = cnx.cursor(pymysql.cursors.DictCursor)
-
 def genbank_query():
+    cnx = connection.get_connection()
     with cnx.cursor() as  cursor:
         query = "SELECT accession, gene, product, location FROM genbank;"
         cursor.execute(query)
@@ -60,6 +56,42 @@ def genbank_query():
 
 #*****************************************************************************
 
+def genbank_stream(batch=1000):
+    """ Yield genbank rows one at a time without holding the whole table in memory.
+        Uses an unbuffered server-side cursor; rows are ordered by accession.
+        Input           batch           number of rows fetched per round trip
+        Output          row             (accession number, gene, product, location)
+        """
+    cnx = connection.get_connection()
+    with connection.stream_cursor(cnx) as cursor:
+        query = "SELECT accession, gene, product, location FROM genbank ORDER BY accession;"
+        cursor.execute(query)
+        rows = cursor.fetchmany(batch)
+        while rows:
+            for row in rows:
+                yield row
+            rows = cursor.fetchmany(batch)
+
+#*****************************************************************************
+
+def genbank_fingerprint():
+    """ Return fingerprint of genbank table contents, computed on the server.
+        Checksum is the sum of CRC32 of each row, so it does not depend on row order.
+        Output          (count, checksum)   number of rows, content checksum
+        """
+    cnx = connection.get_connection()
+    with cnx.cursor() as cursor:
+        ## CONCAT_WS skips NULLs, so a NULL column is replaced by '\0' first; otherwise
+        ## ('a', NULL, 'b') and ('a', 'b', NULL) would give the same checksum
+        query = "SELECT COUNT(*), COALESCE(SUM(CRC32(CONCAT_WS('|', COALESCE(accession, '\\0'), " \
+                "COALESCE(gene, '\\0'), COALESCE(product, '\\0'), COALESCE(location, '\\0')))), 0) " \
+                "FROM genbank;"
+        cursor.execute(query)
+        count, checksum = cursor.fetchone()
+    return int(count), int(checksum)
+
+#*****************************************************************************
+
 ###     main    ###
 
 if __name__ == "__main__":
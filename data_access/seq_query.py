@@ -32,23 +32,19 @@ Revision History:
 =================
 
 v1.0                      07.05.18          Original                    By:Jennifer J. Stiens
+v1.1                      19.10.26          Per-thread connection from connection module
+v1.2                      19.10.26          Sequence window query
+v1.3                      19.10.26          Bulk sequence query
+v1.4                      19.10.26          Streaming sequence query
+v1.5                      19.10.26          Sequence and coding information for a chunk of genes
+v1.6                      19.10.26          Sequence digests computed by the server
                                           
 """
 #*****************************************************************************
 # Import libraries
 
-import pymysql
-from data_access import config_db
-
-#*****************************************************************************
-
-# Connect to MySQL Database
-cnx = pymysql.connect(host=config_db.database_config['dbhost'],
-                        port=config_db.database_config['port'],
-                        user=config_db.database_config['dbuser'],
-                        passwd=config_db.database_config['dbpass'],
-                        db=config_db.database_config['dbname'])
-cursor = cnx.cursor(pymysql.cursors.DictCursor)
+from data_access import connection
+from data_access import coding_query
 
 #*****************************************************************************
 
@@ -58,6 +54,7 @@ def seq_query(acc):
         Output          sequence        (accession number, sequence)
         """
 
+    cnx = connection.get_connection()
     with cnx.cursor() as cursor:
         # Read a single record
         query = "SELECT accession, sequence FROM sequence WHERE accession = %s;"
@@ -66,6 +63,102 @@ def seq_query(acc):
 
     return sequence
 
+#*****************************************************************************
+
+def seq_range_query(acc, start, length):
+    """ Return part of the sequence for specified gene; only the window is sent by the server.
+        Input           acc             accession number
+                        start           first base (1 = first base of sequence)
+                        length          number of bases
+        Output          sequence        (accession number, sequence window, full sequence length)
+        """
+
+    cnx = connection.get_connection()
+    with cnx.cursor() as cursor:
+        query = "SELECT accession, SUBSTRING(sequence, %s, %s), LENGTH(sequence) FROM sequence WHERE accession = %s;"
+        cursor.execute(query, (start, length, acc))
+        sequence = cursor.fetchone()
+
+    return sequence
+
+#*****************************************************************************
+
+def seq_bulk_query(accessions):
+    """ Return sequence entries for many genes in one query.
+        Input           accessions      list of accession numbers
+        Output          sequences       list of (accession number, sequence); genes not found are left out
+        """
+
+    accessions = list(accessions)
+    if not accessions:
+        return []
+    cnx = connection.get_connection()
+    with cnx.cursor() as cursor:
+        query = ("SELECT accession, sequence FROM sequence WHERE accession IN (" +
+                 ', '.join(['%s'] * len(accessions)) + ");")
+        cursor.execute(query, accessions)
+        sequences = cursor.fetchall()
+
+    return list(sequences)
+
+#*****************************************************************************
+
+def seq_digest_query(accessions):
+    """ Return sha1 digest of the stored sequence of many genes in one query; the sequences
+        themselves are not sent by the server.
+        Input           accessions      list of accession numbers
+        Output          digests         list of (accession number, sha1 hex digest); genes not found are left out
+        """
+
+    accessions = list(accessions)
+    if not accessions:
+        return []
+    cnx = connection.get_connection()
+    with cnx.cursor() as cursor:
+        query = ("SELECT accession, SHA1(sequence) FROM sequence WHERE accession IN (" +
+                 ', '.join(['%s'] * len(accessions)) + ");")
+        cursor.execute(query, accessions)
+        digests = cursor.fetchall()
+
+    return list(digests)
+
+#*****************************************************************************
+
+def gene_inputs(accessions, coding=True):
+    """ Return genomic sequence and coding information for a chunk of genes, one query each.
+        Input           accessions      list of accession numbers
+                        coding          also query coding information (False if the caller
+                                        already has it, eg. in an ExonTable)
+        Output          inputs          {accession: (sequence, (accession, codon start, positions))},
+                                        for every accession; None for anything not found
+        """
+
+    accessions = list(accessions)
+    seqs = dict(seq_bulk_query(accessions))
+    code_info = {}
+    if coding:
+        code_info = {row[0]: row for row in coding_query.coding_bulk_query(accessions)}
+
+    return {acc: (seqs.get(acc), code_info.get(acc)) for acc in accessions}
+
+#*****************************************************************************
+
+def seq_stream(batch=100):
+    """ Yield every sequence entry one at a time without holding the whole table in memory.
+        Uses an unbuffered server-side cursor; rows are ordered by accession.
+        Input           batch           number of rows fetched per round trip
+        Output          row             (accession number, sequence)
+        """
+    cnx = connection.get_connection()
+    with connection.stream_cursor(cnx) as cursor:
+        query = "SELECT accession, sequence FROM sequence ORDER BY accession;"
+        cursor.execute(query)
+        rows = cursor.fetchmany(batch)
+        while rows:
+            for row in rows:
+                yield row
+            rows = cursor.fetchmany(batch)
+
 #*****************************************************************************
 ## main
 
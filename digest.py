@@ -0,0 +1,217 @@
+#!/usr/bin python3
+
+""" Restriction Digest Module """
+
+"""
+Program:        digest
+File:           digest.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       Fragment sizes for single and multiple enzyme digests, and enzyme pairs suitable for cloning a gene.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+The genomic sequence of a gene is searched once for every enzyme (seq_module.enz_cut), giving
+a sorted array of cut positions per enzyme (the position inside the recognition site where
+the enzyme cuts, see CUT_OFFSETS). Fragment sizes for any combination of enzymes are found by
+a k-way merge (heapq.merge) of the sorted cut arrays, without searching the sequence again.
+
+For cloning, an enzyme pair (or a single enzyme, used on both sides) is useful if none of its
+cuts fall between the first and last exon, so the whole coding region stays on one fragment
+(the insert). The cuts nearest to the coding region on each side are found for every enzyme
+once by binary search, so the insert size of every pair is known without digesting; pairs
+are ranked by how close the insert is to the wanted size range, and only the best are digested
+in full. batch_digest does this for every gene in a batch.
+
+Usage:
+======
+digest          [ACC ...] [--min SIZE] [--max SIZE] [--top N]
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+"""
+#*****************************************************************************
+# Import libraries
+
+import argparse
+import heapq
+import json
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import combinations_with_replacement
+
+import seq_module
+
+#*****************************************************************************
+
+## position of cut within recognition site (eg. EcoRI G^AATTC); custom sites are cut at their start
+CUT_OFFSETS = {'EcoRI': 1, 'BamHI': 1, 'BsuMI': 1, 'HindIII': 1, 'EcoRV': 3, 'Sma1': 3}
+
+#*****************************************************************************
+
+def cut_positions(seq, enzyme=None):
+    """Search sequence once for every enzyme and return sorted cut positions.
+    Input           seq                 genomic sequence
+                    enzyme              optional custom cleavage site
+
+    Output          cuts                {enzyme: array of cut positions}; a cut at p separates
+                                        bases seq[:p] and seq[p:]
+    """
+    cuts = {}
+    for name, (count, sites) in seq_module.enz_cut(None, seq, enzyme).items():
+        offset = CUT_OFFSETS.get(name, 0)
+        cuts[name] = array('l', [start + offset for start, end in sites])
+    return cuts
+
+#*****************************************************************************
+
+def merge_cuts(*cut_arrays):
+    """Return sorted list of distinct cut positions from several sorted cut arrays (k-way merge)"""
+
+    merged = []
+    for position in heapq.merge(*cut_arrays):
+        if not merged or merged[-1] != position:
+            merged.append(position)
+    return merged
+
+#*****************************************************************************
+
+def fragments(length, *cut_arrays):
+    """Return fragment sizes, in sequence order, for a digest with one or more enzymes.
+    Input           length              sequence length
+                    cut_arrays          sorted cut positions of each enzyme
+
+    Output          sizes               list of fragment lengths
+    """
+    sizes = []
+    last = 0
+    for position in merge_cuts(*cut_arrays):
+        if 0 < position < length:
+            sizes.append(position - last)
+            last = position
+    sizes.append(length - last)
+    return sizes
+
+#*****************************************************************************
+
+def flanking_cuts(cuts, region_start, region_end, length):
+    """Return nearest cuts either side of region, or None if a cut falls inside it.
+    Input           cuts                sorted cut positions of one enzyme
+                    region_start        first base of region (counting from 0)
+                    region_end          end of region (exclusive)
+                    length              sequence length
+
+    Output          (left, right)       left cut (0 if none) and right cut (length if none)
+    """
+    i = bisect_right(cuts, region_start)
+    if i < len(cuts) and cuts[i] < region_end:
+        return None
+    left = cuts[i - 1] if i else 0
+    j = bisect_left(cuts, region_end)
+    right = cuts[j] if j < len(cuts) else length
+    return left, right
+
+#*****************************************************************************
+
+def rank_pairs(length, cuts, region, size_range=None, top=10):
+    """Return enzyme pairs leaving the region on one fragment, best first.
+    Input           length              sequence length
+                    cuts                {enzyme: sorted cut positions}, from cut_positions
+                    region              (start, end) of coding region, counting from 0, end exclusive
+                    size_range          (min, max) wanted insert size, or None for smallest insert
+                    top                 number of pairs returned (digested in full)
+
+    Output          pairs               list of {'enzymes', 'insert', 'in_range', 'fragments'}
+    """
+    flanks = {}
+    for name, positions in cuts.items():
+        flank = flanking_cuts(positions, region[0], region[1], length)
+        if flank is not None:
+            flanks[name] = flank
+
+    candidates = []
+    for a, b in combinations_with_replacement(sorted(flanks), 2):
+        ## insert runs from the nearer left cut to the nearer right cut of the two enzymes
+        left = max(flanks[a][0], flanks[b][0])
+        right = min(flanks[a][1], flanks[b][1])
+        if left == 0 and right == length:
+            continue                            # neither enzyme cuts
+        insert = right - left
+        if size_range is None:
+            candidates.append((0, insert, a, b))
+        else:
+            low, high = size_range
+            distance = 0 if low <= insert <= high else min(abs(insert - low), abs(insert - high))
+            candidates.append((distance, insert, a, b))
+
+    pairs = []
+    for distance, insert, a, b in heapq.nsmallest(top, candidates):
+        enzymes = (a,) if a == b else (a, b)
+        pairs.append({'enzymes': enzymes, 'insert': insert, 'in_range': distance == 0,
+                      'fragments': fragments(length, *[cuts[name] for name in enzymes])})
+    return pairs
+
+#*****************************************************************************
+
+def coding_region(exons):
+    """Return (start, end) of region from first to last exon, counting from 0, end exclusive"""
+
+    return min(start for start, end in exons) - 1, max(end for start, end in exons)
+
+#*****************************************************************************
+
+def batch_digest(table, sequences, size_range=None, top=10, enzyme=None):
+    """Rank cloning enzyme pairs for every gene in a batch.
+    Input           table               ExonTable with exons of the genes
+                    sequences           iterable of (accession, genomic sequence) rows
+                    size_range          (min, max) wanted insert size
+                    top                 pairs kept per gene
+                    enzyme              optional custom cleavage site
+
+    Output          results             {acc: list of pairs, see rank_pairs}; genes without exons are skipped
+    """
+    results = {}
+    for row in sequences:
+        if row is None or row[0] not in table:
+            continue
+        acc, seq = row[0], row[1].upper()
+        exons = table.exons(acc)
+        if not exons:
+            continue
+        cuts = cut_positions(seq, enzyme)
+        results[acc] = rank_pairs(len(seq), cuts, coding_region(exons), size_range, top)
+    return results
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    import exon_table
+    from data_access import seq_query
+
+    parser = argparse.ArgumentParser(description='Rank restriction enzyme pairs for cloning genes')
+    parser.add_argument('accessions', nargs='*', default=['AB000381.1'])
+    parser.add_argument('--min', type=int, help='smallest wanted insert')
+    parser.add_argument('--max', type=int, help='largest wanted insert')
+    parser.add_argument('--top', type=int, default=5)
+    parser.add_argument('--site', help='custom cleavage site')
+    args = parser.parse_args()
+
+    size_range = None
+    if args.min is not None or args.max is not None:
+        size_range = (args.min or 0, args.max or sys.maxsize)
+
+    table = exon_table.ExonTable.from_query()
+    rows = (seq_query.seq_query(acc) for acc in args.accessions)
+    for acc, pairs in batch_digest(table, rows, size_range, args.top, args.site).items():
+        print(json.dumps({'accession': acc, 'pairs': pairs}))
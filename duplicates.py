@@ -0,0 +1,161 @@
+#!/usr/bin python3
+
+""" Duplicate Gene Record Module """
+
+"""
+Program:        duplicates
+File:           duplicates.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       Find gene records with identical sequence and coding information, so each
+                distinct input is analysed once.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+Every analysis (coding sequence, translation, enzymes, codon usage) depends only on the
+genomic sequence, the codon start, the strand and the exons of a gene. input_key hashes the
+sha1 of the stored sequence (seq_digest, no normalising) with the gene's exon table entry
+into one content key; records with the same key give the same results.
+
+group_accessions asks the database for the sha1 of the sequences a chunk at a time
+(seq_query.seq_digest_query, SQL SHA1() computed by the server), so no sequence is sent just
+to be hashed, and returns the accessions grouped by key in input order (the
+first accession of each group is its representative). Genes without a sequence or coding
+regions are never grouped. Batch jobs (whole_genome_freq, enzyme_batch) analyse only the
+representatives and copy their results to the rest of the group; batch_cli reuses results
+within a chunk and across chunks handled by the same worker.
+
+Usage:
+======
+duplicates          [ACC ...] [--chunk N] [--sqlite FILE]
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+V1.1           19.10.26         Coding information from the run's exon table
+V1.2           19.10.26         Sequence digests computed by the database server
+"""
+#*****************************************************************************
+# Import libraries
+
+import argparse
+import hashlib
+import json
+
+#*****************************************************************************
+
+def seq_digest(seq):
+    """Return sha1 hex digest of stored sequence (None if not found), as SQL SHA1(sequence)"""
+
+    if seq is None:
+        return None
+    return hashlib.sha1(seq.encode('utf-8')).hexdigest()
+
+#*****************************************************************************
+
+def input_key(digest, table, acc):
+    """Return content key of a gene's analysis inputs.
+    Input           digest              seq_digest of genomic sequence (None if not found)
+                    table               exon_table.ExonTable holding the gene
+                    acc                 accession number
+
+    Output          key                 hex digest, or None if sequence or coding regions are missing
+    """
+    if digest is None or acc not in table:
+        return None
+    key = hashlib.sha1(digest.encode('ascii'))
+    key.update(repr((table.coding_info(acc), table.exons(acc))).encode('ascii'))
+    return key.hexdigest()
+
+#*****************************************************************************
+
+def input_keys(accessions, table, chunk=500):
+    """Yield (accession, key) for genes, one sequence digest query per chunk"""
+
+    from data_access import seq_query
+
+    accessions = list(accessions)
+    for i in range(0, len(accessions), chunk):
+        part = accessions[i:i + chunk]
+        digests = dict(seq_query.seq_digest_query(part))
+        for acc in part:
+            yield acc, input_key(digests.get(acc), table, acc)
+
+#*****************************************************************************
+
+def group_keys(pairs):
+    """Return accessions grouped by key.
+    Input           pairs               iterable of (accession, key); key None is never grouped
+
+    Output          groups              list of lists of accessions, in order of first accession;
+                                        an accession listed twice is kept once
+    """
+    groups = []
+    by_key = {}
+    seen = set()
+    for acc, key in pairs:
+        if acc in seen:
+            continue
+        seen.add(acc)
+        if key is None:
+            groups.append([acc])
+        elif key in by_key:
+            by_key[key].append(acc)
+        else:
+            by_key[key] = [acc]
+            groups.append(by_key[key])
+    return groups
+
+#*****************************************************************************
+
+def group_accessions(accessions, table, chunk=500):
+    """Return accessions grouped by identical analysis inputs (see group_keys)"""
+
+    return group_keys(input_keys(accessions, table, chunk))
+
+#*****************************************************************************
+
+def duplicate_groups(groups):
+    """Return only groups with more than one accession"""
+
+    return [group for group in groups if len(group) > 1]
+
+#*****************************************************************************
+
+def report(groups):
+    """Return summary of grouping: {'genes', 'unique', 'duplicates', 'groups': [[acc, ...], ...]}"""
+
+    found = duplicate_groups(groups)
+    genes = sum(len(group) for group in groups)
+    return {'genes': genes, 'unique': len(groups), 'duplicates': genes - len(groups), 'groups': found}
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Gene records with identical sequence and coding information')
+    parser.add_argument('accessions', nargs='*', help='genes to check (default all genes)')
+    parser.add_argument('--chunk', type=int, default=500, help='genes per bulk query')
+    parser.add_argument('--sqlite', help='use local SQLite stand-in database instead of MySQL')
+    args = parser.parse_args()
+
+    if args.sqlite:
+        from data_access import connection
+        connection.use_sqlite(args.sqlite)
+
+    accessions = args.accessions
+    if not accessions:
+        from data_access import list_query
+        accessions = [row[0] for row in list_query.genbank_query()]
+
+    import exon_table
+    table = exon_table.ExonTable.from_query(accessions)
+    print(json.dumps(report(group_accessions(accessions, table, args.chunk)), indent=1))
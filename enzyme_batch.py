@@ -0,0 +1,227 @@
+#!/usr/bin python3
+
+""" Restriction Enzyme Batch Job """
+
+"""
+Program:        enzyme_batch
+File:           enzyme_batch.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       Run restriction enzyme analysis for every gene in parallel and store the results table.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+The exons, codon start and strand of every gene are read once for the run into an
+exon_table.ExonTable, which is handed to each worker process with the database settings.
+Accessions are split into chunks which are handed to a pool of worker processes. Each worker
+opens its own database connection (connection.reset in the worker initializer), fetches the
+sequences for a whole chunk with one query (seq_query.gene_inputs) and classifies every cut
+by its position against the exons (seq_module.enzymeSitesFromSeq).
+
+The main process writes the results of each chunk to the enzyme_sites table, one row per gene
+and enzyme (see data_access/enzyme_query), which gene_server and the website read directly.
+Throughput is reported as the job runs; genes that fail (no sequence, no coding regions,
+invalid sequence) are listed at the end and can be saved as json with --failures.
+
+Genes with identical sequence and coding information (duplicates.group_accessions) are
+analysed once: only the first gene of each group is sent to the workers and its rows and
+failure are copied to the rest of the group before they are stored (--no-dedupe to turn off).
+
+Usage:
+======
+enzyme_batch        [ACC ...] [--from FILE] [--workers N] [--chunk N] [--site SITE] [--sqlite FILE]
+                    [--no-dedupe]
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+V1.1           19.10.26         Duplicate genes analysed once
+V1.2           19.10.26         Exons from one exon table per run, shared with the workers
+V1.3           19.10.26         Repeated accessions analysed and stored once
+"""
+#*****************************************************************************
+# Import libraries
+
+import argparse
+import functools
+import json
+import multiprocessing
+import sys
+
+import duplicates
+import exon_table
+import seq_module
+from progress import Progress
+from data_access import config_db
+from data_access import connection
+from data_access import seq_query
+from data_access import enzyme_query
+
+#*****************************************************************************
+
+## exon table of the run (set in each worker by init_worker)
+TABLE       = None
+
+#*****************************************************************************
+
+def init_worker(config, table=None):
+    """ Worker process initializer: use parent's database settings with a connection of its own
+        and the run's exon table"""
+
+    global TABLE
+    config_db.database_config.update(config)
+    connection.reset()
+    TABLE = table
+
+#*****************************************************************************
+
+def gene_rows(acc, seq, table, site=None):
+    """ Return enzyme_sites rows for one gene.
+    Input           acc                 accession number
+                    seq                 genomic sequence (None if not found)
+                    table               exon_table.ExonTable (gene without coding regions if absent)
+                    site                optional custom cleavage site
+
+    Output          rows                list of (accession, enzyme, status, cut count, sites json),
+                                        one per enzyme; enzymes that do not cut are 'Good' with count 0
+    """
+    code_info = table.coding_info(acc) if acc in table else None
+    seq = seq_module.checkInputs(seq, code_info)
+    codon_start, strand = code_info
+    results = seq_module.enzymeSitesFromSeq(seq, table.exons(acc), codon_start, strand, site)
+
+    names = list(seq_module.ENZYMES)
+    if site:
+        names.append(site.upper())
+    rows = []
+    for name in names:
+        status, (count, sites) = results.get(name, ('Good', (0, [])))
+        rows.append((acc, name, status, count, json.dumps(sites)))
+    return rows
+
+#*****************************************************************************
+
+def analyse_chunk(accessions, site=None):
+    """ Worker: analyse a chunk of genes with one sequence query (exons from the run's table).
+    Output          (accessions, rows, failures)    rows for enzyme_sites, {acc: error message}
+    """
+    inputs = seq_query.gene_inputs(accessions, coding=False)
+
+    rows = []
+    failures = {}
+    for acc in accessions:
+        try:
+            rows.extend(gene_rows(acc, inputs[acc][0], TABLE, site))
+        except Exception as e:
+            failures[acc] = type(e).__name__ + ': ' + str(e)
+    return accessions, rows, failures
+
+#*****************************************************************************
+
+def copy_results(groups, done, rows, failed):
+    """ Copy results of group representatives to the other genes of their groups.
+    Input           groups              {representative: [accessions]} (representative first)
+                    done, rows, failed  analyse_chunk results for representatives
+
+    Output          (done, rows, failed)    the same for every gene of the groups
+    """
+    all_done = []
+    for acc in done:
+        all_done.extend(groups.get(acc, [acc]))
+    all_rows = []
+    for row in rows:
+        for acc in groups.get(row[0], [row[0]]):
+            all_rows.append((acc, ) + tuple(row[1:]))
+    all_failed = {}
+    for rep, message in failed.items():
+        for acc in groups.get(rep, [rep]):
+            all_failed[acc] = message
+    return all_done, all_rows, all_failed
+
+#*****************************************************************************
+
+def run_batch(accessions, workers=4, chunk=200, site=None, progress=True, dedupe=True):
+    """ Analyse genes in worker processes and store results in enzyme_sites.
+    Input           accessions          list of accession numbers
+                    workers             number of worker processes
+                    chunk               genes per bulk query / work unit
+                    site                optional custom cleavage site
+                    progress            print throughput to stderr
+                    dedupe              analyse genes with identical inputs once
+
+    Output          failures            {acc: error message} for genes that could not be analysed
+    """
+    enzyme_query.create_enzyme_table()
+    ## an accession listed twice is analysed once (enzyme_sites holds one row per gene and enzyme)
+    accessions = list(dict.fromkeys(accessions))
+    tracker = Progress(len(accessions)) if progress else None
+    table = exon_table.ExonTable.from_query(accessions)
+    groups = {}
+    if dedupe:
+        groups = {group[0]: group for group in duplicates.group_accessions(accessions, table, chunk)
+                  if len(group) > 1}
+        found = sum(len(group) - 1 for group in groups.values())
+        if found and progress:
+            print('%d duplicate genes in %d groups, analysed once' % (found, len(groups)), file=sys.stderr)
+        copies = {acc for group in groups.values() for acc in group[1:]}
+        accessions = [acc for acc in accessions if acc not in copies]
+    chunks = [accessions[i:i + chunk] for i in range(0, len(accessions), chunk)]
+
+    failures = {}
+    config = dict(config_db.database_config)
+    with multiprocessing.Pool(workers, init_worker, (config, table)) as pool:
+        work = functools.partial(analyse_chunk, site=site)
+        for done, rows, failed in pool.imap_unordered(work, chunks):
+            if groups:
+                done, rows, failed = copy_results(groups, done, rows, failed)
+            enzyme_query.save_enzyme_results(done, rows)
+            failures.update(failed)
+            if tracker:
+                tracker.update(len(done), len(failed))
+    if tracker:
+        tracker.report(final=True)
+    return failures
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Restriction enzyme analysis for every gene')
+    parser.add_argument('accessions', nargs='*', help='genes to analyse (default all genes)')
+    parser.add_argument('--from', dest='from_file', help='file of accessions, one per line')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--chunk', type=int, default=200, help='genes per bulk query')
+    parser.add_argument('--site', help='also search this custom cleavage site')
+    parser.add_argument('--sqlite', help='use local SQLite stand-in database instead of MySQL')
+    parser.add_argument('--failures', help='write failed genes as json')
+    parser.add_argument('--no-dedupe', action='store_true', help='analyse genes with identical inputs separately')
+    args = parser.parse_args()
+
+    if args.site and not seq_module.validSite(args.site):
+        print('Cleavage site must include A, C, T or G only.')
+        exit(1)
+    if args.sqlite:
+        connection.use_sqlite(args.sqlite)
+
+    accessions = list(args.accessions)
+    if args.from_file:
+        with open(args.from_file) as f:
+            accessions += [line.strip() for line in f if line.strip()]
+    if not accessions:
+        from data_access import list_query
+        accessions = [row[0] for row in list_query.genbank_query()]
+
+    failures = run_batch(accessions, args.workers, args.chunk, args.site, dedupe=not args.no_dedupe)
+    for acc, message in sorted(failures.items()):
+        print(acc + ': ' + message, file=sys.stderr)
+    if args.failures:
+        with open(args.failures, 'w') as f:
+            json.dump(failures, f, indent=1)
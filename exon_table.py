@@ -0,0 +1,296 @@
+#!/usr/bin python3
+
+""" Exon Table Module """
+
+"""
+Program:        exon_table
+File:           exon_table.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       Load exon coordinates for every gene once and extract coding sequences from them.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+seq_module.getCoding queries one gene at a time and parses the positions text on every call.
+ExonTable reads all coding_regions rows in one query and parses each positions string once
+into flat arrays shared by all genes:
+    starts, ends        exon start and end (counting from 1, inclusive), in genomic order
+    offsets             exons of gene i are starts[offsets[i]:offsets[i + 1]]
+    codon_start         position of first codon (1, 2 or 3) for each gene
+    strand              1, or -1 for reverse strand genes ('complement(...)')
+coding_seq then cuts a gene's coding sequence from its genomic sequence without re-parsing.
+For reverse strand genes the exons are joined, reverse complemented and codon_start is
+counted from the start of the reverse complement (the 5' end of the gene). The cutting is
+done by coding_from_exons, which seq_module.codingSeq uses too, so single-gene and batch
+results agree on both strands.
+
+locate_sites places sequence positions (eg. restriction enzyme cuts) relative to the exons
+by binary search of the sorted exon starts: exon, intron, crossing an exon boundary or
+outside the exons, with the exon number and offset in the coding sequence.
+
+Usage:
+======
+exon_table      [ACC]
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+V1.1           19.10.26         Locate sites relative to exons
+V1.2           19.10.26         Coding sequence cut shared with seq_module; table for a gene list
+"""
+#*****************************************************************************
+# Import libraries
+
+import re
+import sys
+from array import array
+from bisect import bisect_right
+
+#*****************************************************************************
+
+exon_re     = re.compile(r'(\d+)\s*\.\.\s*[<>]?(\d+)|(\d+)')
+COMPLEMENT  = str.maketrans('ACGTNacgtn', 'TGCANtgcan')
+
+#*****************************************************************************
+
+def parse_positions(positions):
+    """Return strand and exon list from coding_regions positions string.
+    Input           positions           eg. 'join(120..245,1020..1177)' or 'complement(join(...))'
+
+    Output          strand              1, or -1 for reverse strand
+                    exons               list of (start, end), counting from 1; genomic order for
+                                        reverse strand genes
+    """
+    if not positions:
+        return 1, []
+    exons = []
+    for match in exon_re.finditer(positions):
+        if match.group(3) is not None:
+            start = end = int(match.group(3))       # single base
+        else:
+            start, end = int(match.group(1)), int(match.group(2))
+        exons.append((start, end))
+    if 'complement' in positions:
+        exons.sort()
+        return -1, exons
+    return 1, exons
+
+#*****************************************************************************
+
+def coding_from_exons(seq, exons, codon_start=1, strand=1):
+    """Return coding sequence cut from genomic sequence.
+    Input           seq                 genomic sequence
+                    exons               list of (start, end) exons, counting from 1, end inclusive,
+                                        in genomic order
+                    codon_start         position of first codon (1, 2 or 3), counted from the 5' end
+                                        of the gene
+                    strand              1, or -1 for reverse strand (exons joined, then reverse
+                                        complemented)
+
+    Output          coding_seq          coding sequence, in the case of seq
+    """
+    coding = ''.join([seq[start - 1:end] for start, end in exons])
+    if strand < 0:
+        coding = coding.translate(COMPLEMENT)[::-1]
+    return coding[(codon_start or 1) - 1:]
+
+#*****************************************************************************
+
+def locate_sites(sites, exons, codon_start=1, strand=1):
+    """Return position of each site relative to the exons of a gene.
+    Input           sites               list of (start, end) in genomic sequence, counting from 0,
+                                        end exclusive (as enz_cut)
+                    exons               list of (start, end) exons, counting from 1, end inclusive
+                    codon_start         position of first codon (1, 2 or 3)
+                    strand              1, or -1 for reverse strand
+
+    Output          located             list of (start, end, region, exon, cds offset)
+                                        region      'exon', 'boundary' (site crosses an exon edge),
+                                                    'intron' or 'outside' (before first/after last exon)
+                                        exon        exon number in gene direction, None if not in an exon
+                                        cds offset  position of site's first base (in gene direction) in
+                                                    coding sequence, counting from 0; None if not coding
+    """
+    exons = sorted(exons)
+    n = len(exons)
+    starts = [start - 1 for start, end in exons]
+
+    ## bases of coding transcript before each exon, in gene direction
+    before = [0] * n
+    total = 0
+    for i in (range(n) if strand > 0 else range(n - 1, -1, -1)):
+        before[i] = total
+        total += exons[i][1] - exons[i][0] + 1
+
+    located = []
+    for start, end in sites:
+        first, last = (start, end - 1) if strand > 0 else (end - 1, start)
+        i = bisect_right(starts, first) - 1
+        if i >= 0 and first < exons[i][1]:
+            region = 'exon' if starts[i] <= last < exons[i][1] else 'boundary'
+            exon = i + 1 if strand > 0 else n - i
+            if strand > 0:
+                offset = before[i] + first - starts[i] - (codon_start - 1)
+            else:
+                offset = before[i] + exons[i][1] - 1 - first - (codon_start - 1)
+            located.append((start, end, region, exon, offset if offset >= 0 else None))
+            continue
+
+        ## first base not in an exon: the rest of the site may still reach into one
+        ## (the next exon in gene direction)
+        j = i + 1 if strand > 0 else i
+        if 0 <= j < n and starts[j] < end and exons[j][1] > start:
+            located.append((start, end, 'boundary', j + 1 if strand > 0 else n - j, None))
+        elif n and starts[0] <= start and end <= exons[-1][1]:
+            located.append((start, end, 'intron', None, None))
+        else:
+            located.append((start, end, 'outside', None, None))
+    return located
+
+#*****************************************************************************
+
+class ExonTable:
+    """ Exon coordinates, codon start and strand for many genes in compact arrays"""
+
+    def __init__(self):
+        self.accessions     = []                # gene i
+        self.index          = {}                # acc: i
+        self.codon_start    = array('b')
+        self.strand         = array('b')
+        self.offsets        = array('l', [0])
+        self.starts         = array('l')
+        self.ends           = array('l')
+
+    # *************************************************************************
+
+    @classmethod
+    def from_rows(cls, rows):
+        """ Build table from (accession, codon start, positions) rows as returned by all_coding_query"""
+
+        table = cls()
+        for row in rows:
+            table.add(row[0], row[1], row[2])
+        return table
+
+    # *************************************************************************
+
+    @classmethod
+    def from_query(cls, accessions=None, chunk=500):
+        """ Build table for every gene in the coding_regions table (one query), or for a list of
+            accessions (one query per chunk of genes)"""
+
+        ## imported here so the table can be used without a database connection
+        from data_access import coding_query
+        if accessions is None:
+            return cls.from_rows(coding_query.all_coding_query())
+        accessions = list(accessions)
+        table = cls()
+        for i in range(0, len(accessions), chunk):
+            for row in coding_query.coding_bulk_query(accessions[i:i + chunk]):
+                table.add(row[0], row[1], row[2])
+        return table
+
+    # *************************************************************************
+
+    def add(self, acc, codon_start, positions):
+        """ Parse positions and append gene to table (a repeated accession replaces the earlier one)"""
+
+        strand, exons = parse_positions(positions)
+        self.index[acc] = len(self.accessions)
+        self.accessions.append(acc)
+        self.codon_start.append(codon_start or 1)
+        self.strand.append(strand)
+        for start, end in exons:
+            self.starts.append(start)
+            self.ends.append(end)
+        self.offsets.append(len(self.starts))
+
+    # *************************************************************************
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, acc):
+        return acc in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    # *************************************************************************
+
+    def bounds(self, acc):
+        """ Return (first, last + 1) positions of gene's exons in starts/ends (KeyError if not found)"""
+
+        i = self.index[acc]
+        return self.offsets[i], self.offsets[i + 1]
+
+    # *************************************************************************
+
+    def exons(self, acc):
+        """ Return list of (start, end) exons for gene"""
+
+        first, last = self.bounds(acc)
+        return list(zip(self.starts[first:last], self.ends[first:last]))
+
+    # *************************************************************************
+
+    def coding_info(self, acc):
+        """ Return (codon start, strand) for gene"""
+
+        i = self.index[acc]
+        return self.codon_start[i], self.strand[i]
+
+    # *************************************************************************
+
+    def coding_length(self, acc, seq_length=None):
+        """ Return length of gene's coding sequence (exons clipped to seq_length if given)"""
+
+        first, last = self.bounds(acc)
+        total = 0
+        for j in range(first, last):
+            end = self.ends[j] if seq_length is None else min(self.ends[j], seq_length)
+            total += max(end - self.starts[j] + 1, 0)
+        return max(total - (self.codon_start[self.index[acc]] - 1), 0)
+
+    # *************************************************************************
+
+    def locate_sites(self, acc, sites):
+        """ Return sites of gene placed relative to its exons (see locate_sites)"""
+
+        codon_start, strand = self.coding_info(acc)
+        return locate_sites(sites, self.exons(acc), codon_start, strand)
+
+    # *************************************************************************
+
+    def coding_seq(self, acc, seq):
+        """ Return coding sequence of gene cut from its genomic sequence.
+        Input           acc                 accession number
+                        seq                 genomic sequence
+
+        Output          coding_seq          uppercase coding sequence, reverse complemented for
+                                            reverse strand genes ('' if no exons, as codingSeq)
+        """
+        i = self.index[acc]
+        return coding_from_exons(seq, self.exons(acc), self.codon_start[i], self.strand[i]).upper()
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    table = ExonTable.from_query()
+    reverse = sum(1 for s in table.strand if s < 0)
+    print('%d genes, %d exons, %d reverse strand' % (len(table), len(table.starts), reverse))
+
+    if len(sys.argv) > 1:
+        import seq_module
+        acc = sys.argv[1]
+        print(table.exons(acc), table.coding_info(acc))
+        print(table.coding_seq(acc, seq_module.getSeq(acc)[1]))
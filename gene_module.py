@@ -22,7 +22,8 @@ _____________________________________________________________________________
 
 Description:
 ============
-This program includes functions for class of objects called genes
+This program includes functions for class of objects called genes.
+GeneCatalog holds slotted GeneRecord objects indexed by accession, gene id, product and location.
 
 Usage:
 ======
@@ -32,6 +33,7 @@ Revision History:
 =================
 
 18.03.18    Revised to incorporate methods      JJS
+19.10.26    Added GeneRecord and GeneCatalog
 
 """
 
@@ -87,6 +89,166 @@ class Gene:
     # **************************************************************************************
 
 
+# *****************************************************************************
+
+class GeneRecord:
+    """ Lightweight gene record using __slots__ (no per-instance __dict__ and no class registry)"""
+    __slots__ = ('acc', 'genid', 'product', 'location')
+
+    def __init__(self, acc=str(), genid=str(), product=str(), location=str()):
+        """ Create gene record and assign identifiers"""
+
+        self.acc = acc
+        self.genid = genid
+        self.product = product
+        self.location = location
+
+    # **************************************************************************************
+
+    def __str__(self):
+        """ Print gene record and identifiers"""
+
+        rep = ''
+        rep += 'acc: ' + self.acc + '\n' + 'genid: ' + self.genid + '\n' + 'product: ' \
+               + self.product + '\n' + 'location: ' + self.location
+        return rep
+
+    # **************************************************************************************
+
+    def __repr__(self):
+        return 'GeneRecord(%r, %r, %r, %r)' % (self.acc, self.genid, self.product, self.location)
+
+    # **************************************************************************************
+
+    def geneList(self):
+        """Create dictionary of gene identifiers"""
+
+        gene_dict = {self.acc: (self.genid, self.product, self.location)}
+        return gene_dict
+
+
+# *****************************************************************************
+
+class GeneCatalog:
+    """ Container of gene records indexed by accession, with secondary indexes by
+        gene id, product and location. Replaces building dictionaries from Gene._registry."""
+
+    def __init__(self, records=()):
+        """ Create catalog from iterable of GeneRecord objects"""
+
+        self._records   = {}         # acc: record
+        self._by_genid  = {}         # genid: {acc: record}
+        self._by_product = {}        # product: {acc: record}
+        self._by_location = {}       # location: {acc: record}
+        for record in records:
+            self.add(record)
+
+    # **************************************************************************************
+
+    @classmethod
+    def from_rows(cls, rows):
+        """ Build catalog from (accession, gene, product, location) rows as returned by genbank_query"""
+
+        return cls(GeneRecord(row[0], row[1], row[2], row[3]) for row in rows)
+
+    # **************************************************************************************
+
+    @classmethod
+    def from_query(cls):
+        """ Build catalog for every gene in the genbank table"""
+
+        ## imported here so the catalog can be used without a database connection
+        from data_access import list_query
+        return cls.from_rows(list_query.genbank_query())
+
+    # **************************************************************************************
+
+    def add(self, record):
+        """ Add record to catalog, replacing any record with the same accession"""
+
+        if record.acc in self._records:
+            self.remove(record.acc)
+        self._records[record.acc] = record
+        self._by_genid.setdefault(record.genid, {})[record.acc] = record
+        self._by_product.setdefault(record.product, {})[record.acc] = record
+        self._by_location.setdefault(record.location, {})[record.acc] = record
+
+    # **************************************************************************************
+
+    def remove(self, acc):
+        """ Remove record from catalog and indexes. Return removed record (None if not found)"""
+
+        record = self._records.pop(acc, None)
+        if record is None:
+            return None
+        for index, key in ((self._by_genid, record.genid),
+                           (self._by_product, record.product),
+                           (self._by_location, record.location)):
+            entries = index[key]
+            del entries[acc]
+            if not entries:
+                del index[key]
+        return record
+
+    # **************************************************************************************
+
+    def get(self, acc):
+        """ Return record for accession number (None if not found)"""
+
+        return self._records.get(acc)
+
+    # **************************************************************************************
+
+    def by_genid(self, genid):
+        """ Return list of records with gene id"""
+
+        return list(self._by_genid.get(genid, {}).values())
+
+    # **************************************************************************************
+
+    def by_product(self, product):
+        """ Return list of records with product"""
+
+        return list(self._by_product.get(product, {}).values())
+
+    # **************************************************************************************
+
+    def by_location(self, location):
+        """ Return list of records with chromosomal location"""
+
+        return list(self._by_location.get(location, {}).values())
+
+    # **************************************************************************************
+
+    def accessions(self):
+        """ Return list of accession numbers in insertion order"""
+
+        return list(self._records)
+
+    # **************************************************************************************
+
+    def geneList(self):
+        """Create dictionary of gene identifiers for every gene in catalog"""
+
+        gene_dict = {}
+        for acc, record in self._records.items():
+            gene_dict[acc] = (record.genid, record.product, record.location)
+        return gene_dict
+
+    # **************************************************************************************
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self._records.values())
+
+    def __contains__(self, acc):
+        return acc in self._records
+
+    def __getitem__(self, acc):
+        return self._records[acc]
+
 
 #if __name__== "__main__":
 
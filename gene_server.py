@@ -0,0 +1,559 @@
+#!/usr/bin python3
+
+""" Gene Web Service """
+
+"""
+Program:        gene_server
+File:           gene_server.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       Long-running HTTP service returning gene, sequence and analysis results as json.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+Instead of starting seq_module, codon_usage or getGenelist for every page, the website can
+ask this service. It keeps the gene catalog and recent results in memory, runs database and
+sequence work in a fixed pool of worker threads (one database connection per thread), limits
+how many requests of each kind run at once and gzips responses when the client accepts it.
+
+Endpoints (all GET, json):
+    /genes?page=&per_page=              gene list
+    /genes/ACC                          gene identifiers
+    /genes/ACC/sequence                 genomic sequence (?start=&end= window, or
+                                        ?page=&line_length=&lines= numbered rows)
+    /genes/ACC/annotation               sequence with exon boundaries marked (same paging)
+    /genes/ACC/coding                   coding sequence
+    /genes/ACC/translation              codons and amino acid sequence
+    /genes/ACC/enzymes?site=            restriction enzyme sites, Good/Bad
+                                        (&by_position=1: exon/intron and coding offset of each cut,
+                                        read from the enzyme_batch results table when present)
+    /genes/ACC/codon_usage              codon usage ratio and percent
+    /genes/ACC/similar?k=&metric=&approx=   genes with the most similar codon usage (cosine or
+                                        euclidean), from a usage matrix loaded from --codon-counts
+                                        or calculated; it and its approximate index are built in
+                                        a worker thread when the server starts and requests wait
+                                        for them without blocking
+    /search?q=&page=&per_page=          gene id / product search
+    /metrics?format=prometheus          call counts and timings (with --instrument)
+
+With --instrument every request is traced and queries repeated within one request (N+1
+patterns) are logged to stderr.
+
+Usage:
+======
+gene_server         [--host HOST] [--port PORT] [--sqlite FILE] [--workers N] [--instrument]
+                    [--codon-counts FILE ...]
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+V1.1           19.10.26         Sequence windows and pages
+V1.2           19.10.26         Instrumentation and /metrics
+V1.3           19.10.26         Enzyme cuts by position
+V1.4           19.10.26         Similar codon usage
+V1.5           19.10.26         Usage matrix built in a worker thread at start-up
+V1.6           19.10.26         Approximate similarity index built with the matrix
+"""
+#*****************************************************************************
+# Import libraries
+
+import argparse
+import asyncio
+import contextvars
+import functools
+import gzip
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs, unquote
+
+import gene_module
+import search_module
+import seq_module
+import codon_usage
+import instrument
+from data_access import connection
+from data_access import enzyme_query
+
+#*****************************************************************************
+
+## requests of each kind allowed to run at once (others wait their turn)
+DEFAULT_LIMITS = {
+    'genes': 8, 'gene': 8, 'search': 8,
+    'sequence': 4, 'annotation': 2, 'coding': 4, 'translation': 4,
+    'enzymes': 2, 'codon_usage': 2, 'similar': 4}
+
+## responses smaller than this are not worth compressing
+GZIP_MIN_SIZE = 512
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+#*****************************************************************************
+
+class HTTPError(Exception):
+    """ Error returned to client with status code"""
+
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+#*****************************************************************************
+
+class LRUCache:
+    """ Least recently used cache with a time limit on entries"""
+
+    def __init__(self, maxsize=256, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if time.monotonic() - item[0] > self.ttl:
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return item[1]
+
+    def put(self, key, value):
+        self._items[key] = (time.monotonic(), value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+#*****************************************************************************
+
+class Response:
+    """ Encoded json (or text) body with ETag and (lazily) gzipped copy"""
+
+    def __init__(self, data, content_type='application/json'):
+        if content_type == 'application/json':
+            self.body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        else:
+            self.body = data.encode('utf-8')
+        self.content_type = content_type
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+        self._gzipped = None
+
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, 6)
+        return self._gzipped
+
+#*****************************************************************************
+
+class GeneServer:
+    """ asyncio HTTP server for gene, sequence and analysis endpoints"""
+
+    def __init__(self, workers=4, cache_size=512, cache_ttl=300.0, limits=None):
+        """ Create server.
+        Input           workers             number of worker threads (and database connections)
+                        cache_size          number of responses kept in memory
+                        cache_ttl           seconds before cached responses and gene list are refreshed
+                        limits              {endpoint: concurrent requests}, see DEFAULT_LIMITS
+        """
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gene-db')
+        self.cache = LRUCache(cache_size, cache_ttl)
+        self.cache_ttl = cache_ttl
+        self.limits = dict(DEFAULT_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        self._semaphores = {}
+        self._catalog = None
+        self._index = None
+        self._loaded = 0.0
+        self._loading = None
+        self._matrix = None
+
+    # *************************************************************************
+
+    async def run(self, func, *args):
+        """ Run blocking function in worker thread pool (in a copy of the current context,
+            so calls are recorded in the request's trace)"""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, func, *args)
+        return await loop.run_in_executor(self.executor, call)
+
+    # *************************************************************************
+
+    async def catalog(self):
+        """ Return gene catalog and search index, rebuilding them when older than cache_ttl"""
+        if self._catalog is None or time.monotonic() - self._loaded > self.cache_ttl:
+            if self._loading is None:
+                self._loading = asyncio.ensure_future(self.run(self._load_catalog))
+            try:
+                await self._loading
+            finally:
+                self._loading = None
+        return self._catalog, self._index
+
+    def _load_catalog(self):
+        catalog = gene_module.GeneCatalog.from_query()
+        self._index = search_module.GeneSearchIndex(catalog)
+        self._catalog = catalog
+        self._loaded = time.monotonic()
+
+    # *************************************************************************
+
+    def load_matrix(self):
+        """ Start building codon usage matrix in the worker thread pool (once) and return its future"""
+        if self._matrix is None:
+            self._matrix = asyncio.ensure_future(self.run(usage_matrix))
+            self._matrix.add_done_callback(self._matrix_loaded)
+        return self._matrix
+
+    def _matrix_loaded(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            ## build again on the next request (eg. database was unavailable)
+            print('codon usage matrix not built: %r' % future.exception(), file=sys.stderr)
+            self._matrix = None
+
+    # *************************************************************************
+
+    def semaphore(self, endpoint):
+        sem = self._semaphores.get(endpoint)
+        if sem is None:
+            sem = self._semaphores[endpoint] = asyncio.Semaphore(self.limits.get(endpoint, 4))
+        return sem
+
+    # *************************************************************************
+
+    async def dispatch(self, path, params):
+        """ Return Response for request path and query parameters"""
+        parts = [unquote(p) for p in path.strip('/').split('/') if p]
+        if not parts:
+            raise HTTPError(404, 'no such endpoint')
+        if parts == ['metrics']:
+            if params.get('format', ['json'])[-1] == 'prometheus':
+                return Response(instrument.to_prometheus(), 'text/plain; version=0.0.4')
+            return Response(json.loads(instrument.to_json()))
+
+        if parts == ['genes']:
+            endpoint, acc = 'genes', None
+        elif parts == ['search']:
+            endpoint, acc = 'search', None
+        elif parts[0] == 'genes' and len(parts) == 2:
+            endpoint, acc = 'gene', parts[1]
+        elif parts[0] == 'genes' and len(parts) == 3 and parts[2] in GENE_VIEWS:
+            endpoint, acc = parts[2], parts[1]
+        else:
+            raise HTTPError(404, 'no such endpoint')
+
+        catalog, index = await self.catalog()
+        if acc is not None and acc not in catalog:
+            raise HTTPError(404, 'gene not found: ' + acc)
+
+        key = (endpoint, acc, tuple(sorted((k, v[-1]) for k, v in params.items())))
+        response = self.cache.get(key)
+        if response is not None:
+            return response
+
+        if endpoint == 'similar':
+            ## wait here rather than in a worker thread while the matrix is built
+            await asyncio.shield(self.load_matrix())
+
+        async with self.semaphore(endpoint):
+            if endpoint == 'genes':
+                data = gene_page(catalog, params)
+            elif endpoint == 'search':
+                data = search_page(index, params)
+            elif endpoint == 'gene':
+                data = gene_record(catalog.get(acc))
+            else:
+                data = await self.run(GENE_VIEWS[endpoint], acc, params)
+            response = Response(data)
+        self.cache.put(key, response)
+        return response
+
+    # *************************************************************************
+
+    async def handle(self, reader, writer):
+        """ Serve requests on one client connection (HTTP/1.1 keep-alive)"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self.send(writer, 400, error_body('malformed request'), {}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self.respond(writer, method, target, headers, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # *************************************************************************
+
+    async def respond(self, writer, method, target, headers, keep_alive):
+        """ Answer one request"""
+        if method not in ('GET', 'HEAD'):
+            await self.send(writer, 405, error_body('only GET is supported'), {}, keep_alive)
+            return
+        url = urlsplit(target)
+        try:
+            if instrument.enabled():
+                with instrument.trace(target) as t:
+                    response = await self.dispatch(url.path, parse_qs(url.query))
+                for problem in t.n_plus_one():
+                    print('N+1 %s: %s %s x%d %s' % (target, problem['query'], problem['kind'],
+                                                     problem['calls'], problem['args'] or ''), file=sys.stderr)
+            else:
+                response = await self.dispatch(url.path, parse_qs(url.query))
+        except HTTPError as e:
+            await self.send(writer, e.status, error_body(str(e)), {}, keep_alive)
+            return
+        except Exception as e:
+            await self.send(writer, 500, error_body(type(e).__name__ + ': ' + str(e)), {}, keep_alive)
+            return
+
+        extra = {'Content-Type': response.content_type, 'ETag': response.etag, 'Cache-Control': 'max-age=%d' % self.cache_ttl}
+        if headers.get('if-none-match') == response.etag:
+            await self.send(writer, 304, b'', extra, keep_alive)
+            return
+        body = response.body
+        if len(body) >= GZIP_MIN_SIZE and 'gzip' in headers.get('accept-encoding', ''):
+            body = response.gzipped()
+            extra['Content-Encoding'] = 'gzip'
+        if method == 'HEAD':
+            extra['Content-Length'] = str(len(body))
+            body = b''
+        await self.send(writer, 200, body, extra, keep_alive)
+
+    # *************************************************************************
+
+    async def send(self, writer, status, body, extra, keep_alive):
+        """ Write HTTP response"""
+        lines = ['HTTP/1.1 %d %s' % (status, STATUS_TEXT.get(status, '')),
+                 'Connection: ' + ('keep-alive' if keep_alive else 'close'),
+                 'Vary: Accept-Encoding']
+        if 'Content-Type' not in extra:
+            lines.append('Content-Type: application/json')
+        if 'Content-Length' not in extra:
+            lines.append('Content-Length: %d' % len(body))
+        for name, value in extra.items():
+            lines.append(name + ': ' + value)
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    # *************************************************************************
+
+    async def serve(self, host='127.0.0.1', port=8008):
+        """ Start listening and serve until cancelled"""
+        await self.catalog()
+        ## codon usage matrix for /similar is built in the background while serving
+        self.load_matrix()
+        server = await asyncio.start_server(self.handle, host, port)
+        print('serving on http://%s:%d' % (host, port), file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+#*****************************************************************************
+# Endpoint functions (run in worker threads, except list/search which use the warm catalog)
+
+def error_body(message):
+    return json.dumps({'error': message}).encode('utf-8')
+
+def int_param(params, name, default):
+    try:
+        return max(int(params.get(name, [default])[-1]), 1)
+    except ValueError:
+        raise HTTPError(400, name + ' must be a number')
+
+def gene_record(record):
+    return {'accession': record.acc, 'gene_id': record.genid,
+            'product': record.product, 'location': record.location}
+
+def gene_page(catalog, params):
+    page = int_param(params, 'page', 1)
+    per_page = int_param(params, 'per_page', len(catalog) or 1)
+    records = catalog.accessions()[(page - 1) * per_page:page * per_page]
+    return {'total': len(catalog), 'page': page, 'per_page': per_page,
+            'genes': [gene_record(catalog.get(acc)) for acc in records]}
+
+def search_page(index, params):
+    query = params.get('q', [''])[-1]
+    result = index.search(query, int_param(params, 'page', 1), int_param(params, 'per_page', 20))
+    result['results'] = [gene_record(record) for record in result['results']]
+    return result
+
+#*****************************************************************************
+
+def checked(func):
+    """ Turn exit() calls in seq_module (invalid sequence, gene not found) into a 404"""
+    def wrapper(acc, params):
+        try:
+            return func(acc, params)
+        except SystemExit:
+            raise HTTPError(404, 'no valid sequence for ' + acc)
+    return wrapper
+
+def window_params(params):
+    """ Return (start, end) from ?start=&end= or None if no window was requested"""
+    if 'start' not in params and 'end' not in params:
+        return None
+    start = int_param(params, 'start', 1)
+    end = int_param(params, 'end', start + 5999)
+    if end < start:
+        raise HTTPError(400, 'end must not be before start')
+    return start, end
+
+@checked
+def sequence_view(acc, params):
+    window = window_params(params)
+    if window is not None:
+        seq_info = seq_module.getSeqRange(acc, window[0], window[1])
+        return {'accession': acc, 'start': window[0], 'sequence': seq_info[1], 'length': seq_info[2]}
+    if 'page' in params:
+        seq_page = seq_module.numSequencePage(acc, int_param(params, 'page', 1),
+                                              int_param(params, 'line_length', 60), int_param(params, 'lines', 20))
+        seq_page['accession'] = acc
+        return seq_page
+    return {'accession': acc, 'sequence': seq_module.getSeq(acc)[1]}
+
+@checked
+def annotation_view(acc, params):
+    window = window_params(params)
+    if window is not None:
+        return {'accession': acc, 'start': window[0],
+                'annotated': seq_module.annotateSeqRange(acc, window[0], window[1])}
+    if 'page' in params:
+        page = int_param(params, 'page', 1)
+        return {'accession': acc, 'page': page,
+                'annotated': seq_module.annotateSeqPage(acc, page, int_param(params, 'line_length', 60),
+                                                        int_param(params, 'lines', 20))}
+    return {'accession': acc, 'annotated': seq_module.annotateSeq(acc)}
+
+@checked
+def coding_view(acc, params):
+    return {'accession': acc, 'coding': seq_module.codingSeq(acc)}
+
+@checked
+def translation_view(acc, params):
+    codons, protein = seq_module.translate(acc)
+    return {'accession': acc, 'codons': codons, 'protein': protein}
+
+@checked
+def enzymes_view(acc, params):
+    site = params.get('site', [None])[-1]
+    if site is not None and not seq_module.validSite(site):
+        raise HTTPError(400, 'site must include A, C, T or G only')
+    by_position = params.get('by_position', ['0'])[-1] not in ('0', '', 'false')
+    enzymes = {}
+    if by_position and site is None:
+        for name, status, count, sites in enzyme_query.enzyme_results_query(acc):
+            if count and name in seq_module.ENZYMES:
+                cuts = [{'start': cut[0], 'end': cut[1], 'region': cut[2], 'exon': cut[3], 'cds_offset': cut[4]}
+                        for cut in json.loads(sites)]
+                enzymes[name] = {'status': status, 'count': count, 'sites': cuts}
+        if enzymes:
+            return {'accession': acc, 'enzymes': enzymes}
+    for name, (status, (count, cuts)) in seq_module.getEnzyme(acc, site, by_position).items():
+        if by_position:
+            cuts = [{'start': cut[0], 'end': cut[1], 'region': cut[2], 'exon': cut[3], 'cds_offset': cut[4]}
+                    for cut in cuts]
+        enzymes[name] = {'status': status, 'count': count, 'sites': cuts}
+    return {'accession': acc, 'enzymes': enzymes}
+
+@checked
+def codon_usage_view(acc, params):
+    aa_codons, usage = codon_usage.getCodonusage(acc)
+    return {'accession': acc, 'amino_acids': aa_codons,
+            'usage': {codon: {'ratio': v[0], 'percent': v[1]} for codon, v in usage.items()}}
+
+## codon usage matrix for similar_view, loaded once (see usage_matrix, GeneServer.load_matrix)
+USAGE_MATRIX = None
+COUNT_FILES = None
+_matrix_lock = threading.Lock()
+
+def usage_matrix():
+    """ Return codon usage matrix with its approximate index, loading it from COUNT_FILES (or
+        calculating it) on first use"""
+    global USAGE_MATRIX
+    with _matrix_lock:
+        if USAGE_MATRIX is None:
+            import codon_groups
+            import codon_similarity
+            if COUNT_FILES:
+                counts = codon_groups.CodonCounts.from_shards(COUNT_FILES)
+            else:
+                counts = codon_groups.CodonCounts.from_query()
+            matrix = codon_similarity.UsageMatrix.from_counts(counts)
+            ## built here, once, rather than by the first approx=1 request
+            matrix.build_index()
+            USAGE_MATRIX = matrix
+    return USAGE_MATRIX
+
+def similar_view(acc, params):
+    metric = params.get('metric', ['cosine'])[-1]
+    if metric not in ('cosine', 'euclidean'):
+        raise HTTPError(400, 'metric must be cosine or euclidean')
+    approx = params.get('approx', ['0'])[-1] not in ('0', '', 'false')
+    matrix = usage_matrix()
+    if acc not in matrix:
+        raise HTTPError(404, 'no codon usage for ' + acc)
+    found = matrix.similar(acc, min(int_param(params, 'k', 10), 100), metric, approx)
+    return {'accession': acc, 'metric': metric,
+            'similar': [{'accession': other, 'score': round(score, 4)} for other, score in found]}
+
+GENE_VIEWS = {
+    'sequence': sequence_view, 'annotation': annotation_view, 'coding': coding_view,
+    'translation': translation_view, 'enzymes': enzymes_view, 'codon_usage': codon_usage_view,
+    'similar': similar_view}
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Gene web service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8008)
+    parser.add_argument('--sqlite', help='use local SQLite stand-in database instead of MySQL')
+    parser.add_argument('--workers', type=int, default=4, help='worker threads / database connections')
+    parser.add_argument('--instrument', action='store_true', help='record timings, serve /metrics, log N+1 queries')
+    parser.add_argument('--codon-counts', nargs='+', metavar='FILE',
+                        help='codon count shard files for /similar (default calculate at start-up)')
+    args = parser.parse_args()
+    COUNT_FILES = args.codon_counts
+
+    if args.instrument:
+        instrument.enable()
+
+    if args.sqlite:
+        connection.use_sqlite(args.sqlite)
+
+    try:
+        asyncio.run(GeneServer(workers=args.workers).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
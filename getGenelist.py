@@ -23,10 +23,16 @@ Description:
 ============
 This program returns a list of all gene identifiers associated with every gene located
 on Human Chromosome 8 for display on website.
+As well as xml, the list can be exported as newline delimited json, column-oriented pages
+with string dictionaries for product and location, or a compact binary index. Each has a reader
+that loads only the requested page or accession range.
+catalog_from_xml reads the xml back into a GeneCatalog without a database, keeping a
+pre-parsed binary copy next to the xml that is reused until the xml changes.
 
 
 Usage:
 ======
+getGenelist         [--format xml|ndjson|columnar|binary ...] [--out NAME] [--force]
 
 Revision History:
 =================
@@ -36,79 +42,535 @@ V1.1        18.03.18    Revised to incorporate methods          JJS
 V1.2        22.03.18    included dicttoxml, changed name        JJS
 V1.3        29.04.18    changed xml format                      JJS
 V1.4        07.05.18    import data access file                 JJS
+V1.5        19.10.26    use GeneCatalog instead of Gene._registry
+V1.6        19.10.26    streaming xml writer, main() function
+V1.7        19.10.26    ndjson, columnar and binary export formats
+V1.8        19.10.26    iterparse loader with cached binary copy
+V1.9        19.10.26    regenerate only when genbank table changes, ETag
 """
 
 #******************************************************************************
 # Import libraries
 
-import gene_module
+import os
 import sys
-from xml.dom import minidom
-from data_access import list_query
-#from data_access import config_db
+import json
+import mmap
+import struct
+import hashlib
+import argparse
+from array import array
+from bisect import bisect_right
+from xml.etree import ElementTree
+
+import gene_module
+
+#******************************************************************************
+
+BINARY_MAGIC = b'GLB1'
+EXTENSIONS   = {'xml': '.xml', 'ndjson': '.ndjson', 'columnar': '.col', 'binary': '.bin'}
+
+#******************************************************************************
+
+def xml_text(text):
+    """ Escape text for xml output (same escaping as minidom writexml).
+    Input           text            string (None is written as empty text)
+    Output          text            escaped string
+    """
+    if not text:
+        return ''
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
+
+#******************************************************************************
+
+def write_genelist(genbank, outputs):
+    """ Stream gene identifiers to one or more xml outputs with constant memory.
+        Output is the same as building a minidom document and calling writexml, but each
+        <gene_identifiers> element is written as soon as its row is read.
+    Input           genbank         iterable of (accession, gene, product, location) rows
+                    outputs         list of (file handle, indent string) pairs
+    Output          count           number of genes written
+    """
+    fields = ('accession', 'gene_id', 'product', 'location')
+
+    for handle, indent in outputs:
+        handle.write('<?xml version="1.0" ?>\n')
+        handle.write('<gene')
+
+    count = 0
+    for row in genbank:
+        if count == 0:
+            for handle, indent in outputs:
+                handle.write('>\n')
+        count += 1
+        values = [xml_text(value) for value in row[:4]]
+        for handle, indent in outputs:
+            block = [indent, '<gene_identifiers>\n']
+            for field, value in zip(fields, values):
+                block.extend((indent, indent, '<', field, '>', value, '</', field, '>\n'))
+            block.extend((indent, '</gene_identifiers>\n'))
+            handle.write(''.join(block))
+
+    for handle, indent in outputs:
+        if count == 0:
+            ## minidom writes an element without children as an empty tag
+            handle.write('/>\n')
+        else:
+            handle.write('</gene>\n')
+    return count
+
+#******************************************************************************
+
+def clean_row(row):
+    """ Return (accession, gene, product, location) tuple with None replaced by ''"""
+    return tuple(value or '' for value in row[:4])
+
+#******************************************************************************
+
+def write_ndjson(genbank, handle):
+    """ Write one json object per gene per line (newline delimited json).
+    Input           genbank         iterable of (accession, gene, product, location) rows
+                    handle          text file handle
+    Output          count           number of genes written
+    """
+    count = 0
+    for row in genbank:
+        acc, genid, product, location = clean_row(row)
+        handle.write(json.dumps({'accession': acc, 'gene_id': genid,
+                                 'product': product, 'location': location}) + '\n')
+        count += 1
+    return count
+
+#******************************************************************************
+
+def read_ndjson(path, page=None, per_page=100, first=None, last=None):
+    """ Read genes from ndjson file, stopping as soon as the requested part has been read.
+        Files are written in accession order, so an accession range stops at the first later row.
+    Input           path            ndjson file
+                    page            page number (from 1), or None for all rows
+                    per_page        rows per page
+                    first, last     optional accession range (inclusive)
+    Output          rows            list of (accession, gene, product, location)
+    """
+    skip = 0
+    limit = None
+    if page is not None:
+        skip = (page - 1) * per_page
+        limit = per_page
+
+    rows = []
+    with open(path) as f:
+        for line in f:
+            gene = json.loads(line)
+            acc = gene['accession']
+            if first is not None and acc < first:
+                continue
+            if last is not None and acc > last:
+                break
+            if skip:
+                skip -= 1
+                continue
+            rows.append((acc, gene['gene_id'], gene['product'], gene['location']))
+            if limit is not None and len(rows) >= limit:
+                break
+    return rows
+
+#******************************************************************************
+
+def write_columnar(genbank, path, page_size=100):
+    """ Write genes as column-oriented pages. Product and location are stored as codes into
+        string dictionaries held in the header line, which also gives the byte offset and first
+        accession of every page, so a reader can seek straight to the pages it needs.
+    Input           genbank         iterable of (accession, gene, product, location) rows
+                    path            output file
+                    page_size       genes per page
+    Output          count           number of genes written
+    """
+    dictionaries = {'product': {}, 'location': {}}
+    pages = []
+    page = None
+    count = 0
+    for row in genbank:
+        acc, genid, product, location = clean_row(row)
+        if page is None or len(page['accession']) >= page_size:
+            page = {'accession': [], 'gene_id': [], 'product': [], 'location': []}
+            pages.append(page)
+        page['accession'].append(acc)
+        page['gene_id'].append(genid)
+        for field, value in (('product', product), ('location', location)):
+            codes = dictionaries[field]
+            if value not in codes:
+                codes[value] = len(codes)
+            page[field].append(codes[value])
+        count += 1
+
+    lines = [json.dumps(page, separators=(',', ':')).encode('utf-8') + b'\n' for page in pages]
+    index = []
+    offset = 0
+    for page, line in zip(pages, lines):
+        index.append([page['accession'][0], offset])
+        offset += len(line)
+    header = {'format': 'genelist-columnar', 'version': 1, 'count': count,
+              'page_size': page_size, 'pages': index,
+              'product': list(dictionaries['product']),
+              'location': list(dictionaries['location'])}
+
+    with open(path, 'wb') as f:
+        f.write(json.dumps(header, separators=(',', ':')).encode('utf-8') + b'\n')
+        for line in lines:
+            f.write(line)
+    return count
 
 #******************************************************************************
-## Main Program ##
 
-genbank = list_query.genbank_query()
+def read_columnar(path, page=None, first=None, last=None):
+    """ Read genes from columnar file, loading only the pages needed.
+    Input           path            columnar file
+                    page            page number (from 1), or None
+                    first, last     optional accession range (inclusive)
+    Output          rows            list of (accession, gene, product, location)
+    """
+    with open(path, 'rb') as f:
+        header = json.loads(f.readline())
+        data_start = f.tell()
+        index = header['pages']
+        if page is not None:
+            wanted = range(page - 1, min(page, len(index)))
+        else:
+            ## pages whose first accession is after 'last' cannot hold any wanted rows
+            lo = 0
+            hi = len(index)
+            if first is not None:
+                lo = max(bisect_right([p[0] for p in index], first) - 1, 0)
+            if last is not None:
+                hi = bisect_right([p[0] for p in index], last)
+            wanted = range(lo, hi)
+
+        rows = []
+        for i in wanted:
+            f.seek(data_start + index[i][1])
+            columns = json.loads(f.readline())
+            for acc, genid, product, location in zip(columns['accession'], columns['gene_id'],
+                                                     columns['product'], columns['location']):
+                if first is not None and acc < first:
+                    continue
+                if last is not None and acc > last:
+                    break
+                rows.append((acc, genid, header['product'][product], header['location'][location]))
+    return rows
 
-for gene in genbank:
-    acc         = gene[0]
-    genid       = gene[1]
-    product     = gene[2]
-    location    = gene[3]
+#******************************************************************************
 
-## Uses initialisation function to create a gene object for each listing from database
-    gene_object = gene_module.Gene(acc, genid, product, location)
+def write_binary(genbank, path, meta=None):
+    """ Write compact binary gene index: fixed 16 byte records of string ids (accession, gene,
+        product, location) into a de-duplicated string table, so any record can be read by position.
+        Layout (little endian): b'GLB1', count, string count, meta length, meta json,
+        records (4 x uint32 each), string offsets ((string count + 1) x uint32), utf-8 string data.
+    Input           genbank         iterable of (accession, gene, product, location) rows
+                    path            output file
+                    meta            optional dictionary stored in header (eg. source file stamp)
+    Output          count           number of genes written
+    """
+    strings = {}
+    records = array('I')
+    for row in genbank:
+        for value in clean_row(row):
+            if value not in strings:
+                strings[value] = len(strings)
+            records.append(strings[value])
+
+    data = [value.encode('utf-8') for value in strings]
+    offsets = array('I', [0])
+    for value in data:
+        offsets.append(offsets[-1] + len(value))
+    if sys.byteorder != 'little':
+        records.byteswap()
+        offsets.byteswap()
+
+    meta_bytes = json.dumps(meta or {}).encode('utf-8')
+    count = len(records) // 4
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(BINARY_MAGIC + struct.pack('<III', count, len(data), len(meta_bytes)))
+        f.write(meta_bytes)
+        f.write(records.tobytes())
+        f.write(offsets.tobytes())
+        f.write(b''.join(data))
+    os.replace(tmp, path)
+    return count
 
+#******************************************************************************
 
-object_dict = {}         #individual object dictionary of identifiers
-chrom_dict  = {}         #chromosome dictionary of all gene objects
+class BinaryGenelist:
+    """ Random access reader for binary gene index written by write_binary"""
+
+    def __init__(self, path):
+        """ Open binary gene index (memory mapped, nothing is decoded until requested)"""
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:4] != BINARY_MAGIC:
+            raise ValueError(path + ' is not a binary gene index')
+        self.count, self._nstrings, meta_len = struct.unpack_from('<III', self._map, 4)
+        self.meta = json.loads(self._map[16:16 + meta_len])
+        self._records = 16 + meta_len
+        self._offsets = self._records + 16 * self.count
+        self._strings = self._offsets + 4 * (self._nstrings + 1)
+
+    # **************************************************************************
+
+    def _string(self, i):
+        start, end = struct.unpack_from('<II', self._map, self._offsets + 4 * i)
+        return self._map[self._strings + start:self._strings + end].decode('utf-8')
+
+    # **************************************************************************
+
+    def row(self, i):
+        """ Return (accession, gene, product, location) for record i"""
+        ids = struct.unpack_from('<IIII', self._map, self._records + 16 * i)
+        return tuple(self._string(x) for x in ids)
+
+    # **************************************************************************
+
+    def accession(self, i):
+        """ Return accession of record i (reads only that string)"""
+        return self._string(struct.unpack_from('<I', self._map, self._records + 16 * i)[0])
+
+    # **************************************************************************
+
+    def page(self, page, per_page=100):
+        """ Return rows for page number (from 1)"""
+        start = (page - 1) * per_page
+        return [self.row(i) for i in range(start, min(start + per_page, self.count))]
+
+    # **************************************************************************
+
+    def accession_range(self, first=None, last=None):
+        """ Return rows with first <= accession <= last, by binary search on accession order"""
+        lo = 0
+        if first is not None:
+            hi = self.count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.accession(mid) < first:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        rows = []
+        for i in range(lo, self.count):
+            row = self.row(i)
+            if last is not None and row[0] > last:
+                break
+            rows.append(row)
+        return rows
+
+    # **************************************************************************
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return (self.row(i) for i in range(self.count))
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
-## Create a dictionary of gene objects
-for object in gene_module.Gene._registry:
-    object_dict = gene_module.Gene.geneList(object)
-    for k,v in object_dict.items():
-        chrom_dict[k] = v
+#******************************************************************************
 
-## write output in xml to file
-doc = minidom.Document()
+def iter_xml(path):
+    """ Yield gene rows from gene list xml with bounded memory. Uses iterparse and clears each
+        <gene_identifiers> element (and its place in the root) once it has been read.
+    Input           path            xml file written by write_genelist
+    Output          row             (accession, gene, product, location)
+    """
+    fields = ('accession', 'gene_id', 'product', 'location')
+    root = None
+    for event, elem in ElementTree.iterparse(path, events=('start', 'end')):
+        if root is None:
+            root = elem
+        if event == 'end' and elem.tag == 'gene_identifiers':
+            values = {child.tag: child.text or '' for child in elem}
+            yield tuple(values.get(field, '') for field in fields)
+            elem.clear()
+            root.clear()
 
-gene = doc.createElement('gene')
-doc.appendChild(gene)
+#******************************************************************************
 
-for k,v in chrom_dict.items():
+def file_stamp(path, digest=True):
+    """ Return dictionary identifying version of file: modification time, size and sha1.
+    Input           path            file
+                    digest          include sha1 of contents (slower, reads whole file)
+    Output          stamp           {'mtime_ns': .., 'size': .., 'sha1': ..}
+    """
+    info = os.stat(path)
+    stamp = {'mtime_ns': info.st_mtime_ns, 'size': info.st_size}
+    if digest:
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 16), b''):
+                sha1.update(block)
+        stamp['sha1'] = sha1.hexdigest()
+    return stamp
 
-    gene_identifiers = doc.createElement('gene_identifiers')
-    gene.appendChild(gene_identifiers)
+#******************************************************************************
 
-    accession = doc.createElement('accession')
-    text = doc.createTextNode(k)
-    accession.appendChild(text)
-    gene_identifiers.appendChild(accession)
+def load_genelist(path='genelist_out.xml', cache=True):
+    """ Return gene rows from gene list xml, using a pre-parsed binary copy when it is current.
+        The copy (path + '.bin') stores the xml's mtime, size and sha1; it is reused while the
+        mtime and size match, or the contents hash the same (eg. file touched or copied).
+        Otherwise the xml is parsed again and the copy rewritten.
+    Input           path            gene list xml
+                    cache           use and maintain binary copy
+    Output          rows            list of (accession, gene, product, location)
+    """
+    if not cache:
+        return list(iter_xml(path))
+
+    cache_path = path + '.bin'
+    stamp = file_stamp(path, digest=False)
+    if os.path.exists(cache_path):
+        try:
+            with BinaryGenelist(cache_path) as cached:
+                source = cached.meta.get('source', {})
+                current = (source.get('mtime_ns') == stamp['mtime_ns'] and source.get('size') == stamp['size'])
+                if not current and source.get('size') == stamp['size']:
+                    current = source.get('sha1') == file_stamp(path)['sha1']
+                if current:
+                    return list(cached)
+        except (ValueError, struct.error, OSError):
+            ## unreadable copy: fall through and rebuild it
+            pass
+
+    stamp = file_stamp(path)
+    rows = list(iter_xml(path))
+    try:
+        write_binary(rows, cache_path, meta={'source': stamp})
+    except OSError:
+        ## read-only directory: still return parsed rows
+        pass
+    return rows
 
-    gene_id = doc.createElement('gene_id')
-    text = doc.createTextNode(v[0])
-    gene_id.appendChild(text)
-    gene_identifiers.appendChild(gene_id)
+#******************************************************************************
 
-    product = doc.createElement('product')
-    text = doc.createTextNode(v[1])
-    product.appendChild(text)
-    gene_identifiers.appendChild(product)
+def catalog_from_xml(path='genelist_out.xml', cache=True):
+    """ Build GeneCatalog from gene list xml, without a database connection.
+    Input           path            gene list xml
+                    cache           use and maintain binary copy (see load_genelist)
+    Output          catalog         GeneCatalog
+    """
+    return gene_module.GeneCatalog.from_rows(load_genelist(path, cache))
 
-    location = doc.createElement('location')
-    text = doc.createTextNode(v[2])
-    location.appendChild(text)
-    gene_identifiers.appendChild(location)
+#******************************************************************************
+
+def make_etag(count, checksum):
+    """ Return ETag token for genbank table fingerprint.
+    Input           count           number of rows in genbank table
+                    checksum        content checksum (see list_query.genbank_fingerprint)
+    Output          etag            quoted token, eg. '"13a-5f0e3c21"'
+    """
+    return '"%x-%x"' % (count, checksum)
+
+#******************************************************************************
+
+def stored_etag(path):
+    """ Return ETag saved alongside an export file (None if file or tag is missing).
+        Web layer can compare it with If-None-Match and answer 304 without reading the file.
+    Input           path            export file, eg. 'genelist_out.xml'
+    Output          etag            token string or None
+    """
+    if not os.path.exists(path) or not os.path.exists(path + '.etag'):
+        return None
+    with open(path + '.etag') as f:
+        return f.read().strip()
+
+#******************************************************************************
 
-doc.writexml(sys.stdout, addindent='    ', newl='\n')
+def not_modified(path, if_none_match):
+    """ Return True if client copy (If-None-Match header value) matches current export file"""
+    etag = stored_etag(path)
+    if etag is None or not if_none_match:
+        return False
+    return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+#******************************************************************************
+
+def write_atomic(path, text):
+    """ Write text to path by writing a temporary file and renaming it over the original"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+#******************************************************************************
+
+def copy_xml(path, handle, indent='    '):
+    """ Copy stored xml export to handle, changing file indent (3 spaces) to indent"""
+    with open(path) as f:
+        for line in f:
+            stripped = line.lstrip(' ')
+            handle.write(indent * ((len(line) - len(stripped)) // 3) + stripped)
+
+#******************************************************************************
+
+def main(formats=('xml',), out_prefix='genelist_out', force=False):
+    """ Write list of all gene identifiers in each requested format.
+        xml is written to stdout and to out_prefix.xml; other formats go to
+        out_prefix.ndjson, out_prefix.col and out_prefix.bin.
+        Files are only regenerated when the genbank table fingerprint differs from the ETag
+        stored next to them (out_prefix.xml.etag etc.), and are replaced atomically.
+    Output          etag            ETag of current table contents
+    """
+
+    ## imported here so this module can be imported without a database connection
+    from data_access import list_query
+
+    etag = make_etag(*list_query.genbank_fingerprint())
+
+    for fmt in formats:
+        if fmt not in EXTENSIONS:
+            raise ValueError('unknown format: ' + fmt)
+        path = out_prefix + EXTENSIONS[fmt]
+        if not force and stored_etag(path) == etag:
+            ## table unchanged: existing file is current
+            if fmt == 'xml':
+                copy_xml(path, sys.stdout)
+            continue
+
+        tmp = path + '.tmp'
+        if fmt == 'xml':
+            with open(tmp, 'w') as file_handle:
+                write_genelist(list_query.genbank_stream(), [(sys.stdout, '    '), (file_handle, '   ')])
+        elif fmt == 'ndjson':
+            with open(tmp, 'w') as file_handle:
+                write_ndjson(list_query.genbank_stream(), file_handle)
+        elif fmt == 'columnar':
+            write_columnar(list_query.genbank_stream(), tmp)
+        elif fmt == 'binary':
+            write_binary(list_query.genbank_stream(), tmp, meta={'etag': etag})
+        os.replace(tmp, path)
+        write_atomic(path + '.etag', etag + '\n')
+
+    return etag
+
+#******************************************************************************
+## Main Program ##
 
-file_handle = open('genelist_out.xml', 'w')
-doc.writexml(file_handle, addindent='   ',newl='\n')
-file_handle.close()
+if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(description='Write list of gene identifiers')
+    parser.add_argument('--format', action='append', choices=['xml', 'ndjson', 'columnar', 'binary'],
+                        help='output format (repeat for several, default xml)')
+    parser.add_argument('--out', default='genelist_out', help='output file name without extension')
+    parser.add_argument('--force', action='store_true', help='regenerate even if genbank table is unchanged')
+    args = parser.parse_args()
 
+    main(args.format or ['xml'], args.out, args.force)
 
 
 ##****************************************************************
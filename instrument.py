@@ -0,0 +1,356 @@
+#!/usr/bin python3
+
+""" Instrumentation Module """
+
+"""
+Program:        instrument
+File:           instrument.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       Opt-in call counts, latency histograms and bytes fetched for queries and analysis functions.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+enable() replaces every public function in the data_access query programs, seq_module,
+codon_usage and whole_genome_freq with a timing wrapper; disable() puts the originals back.
+Nothing is wrapped until enable() is called, so there is no cost when instrumentation is off.
+Calls between functions in the same module go through the module, so inner calls (eg. the
+getSeq calls made by getEnzyme) are counted too.
+
+For each function the number of calls, errors, total time and a latency histogram are kept;
+for data_access queries the number of rows and characters/bytes returned are also counted.
+Instrumentation never changes what a function returns or raises: a result whose size cannot
+be measured is recorded with no rows and no bytes.
+Statistics can be exported as json or Prometheus text format.
+
+trace() records every call made inside a with block (eg. one web request) and reports
+N+1 patterns: the same query repeated with identical arguments, or one query function
+called many times in a loop.
+
+Usage:
+======
+instrument      ACC
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+V1.1           19.10.26         Prometheus metric families as separate blocks
+V1.2           19.10.26         Query results keyed by accession measured by their values
+V1.3           19.10.26         Only query generators measured for rows and bytes
+V1.4           19.10.26         Size of a result of unexpected shape recorded as 0
+"""
+#*****************************************************************************
+# Import libraries
+
+import contextvars
+import functools
+import importlib
+import inspect
+import json
+import sys
+import threading
+import time
+from collections.abc import Mapping
+
+#*****************************************************************************
+
+## modules instrumented by enable(); queries are also counted for rows and bytes
+QUERY_MODULES   = ['data_access.seq_query', 'data_access.coding_query', 'data_access.list_query']
+MODULES         = QUERY_MODULES + ['seq_module', 'codon_usage', 'whole_genome_freq']
+
+## histogram bucket upper bounds (seconds)
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'))
+
+## calls of one query function within a trace before it is reported as N+1
+LOOP_THRESHOLD = 10
+
+lock        = threading.Lock()
+stats       = {}
+patched     = []
+current     = contextvars.ContextVar('instrument_trace', default=None)
+
+#*****************************************************************************
+
+class FunctionStats:
+    """ Counters for one function"""
+    __slots__ = ('calls', 'errors', 'seconds', 'buckets', 'rows', 'bytes')
+
+    def __init__(self):
+        self.calls      = 0
+        self.errors     = 0
+        self.seconds    = 0.0
+        self.buckets    = [0] * len(BUCKETS)
+        self.rows       = 0
+        self.bytes      = 0
+
+    def record(self, seconds, error, rows, size):
+        self.calls += 1
+        self.seconds += seconds
+        if error:
+            self.errors += 1
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.rows += rows
+        self.bytes += size
+
+#*****************************************************************************
+
+class Trace:
+    """ Calls made during one request"""
+
+    def __init__(self, name=''):
+        self.name = name
+        self.calls = []             # (function, args, seconds, bytes)
+        self.started = time.perf_counter()
+        self.seconds = None
+
+    # *************************************************************************
+
+    def queries(self):
+        """ Return calls to data_access query functions"""
+        return [call for call in self.calls if call[0].startswith('data_access.')]
+
+    # *************************************************************************
+
+    def n_plus_one(self, threshold=LOOP_THRESHOLD):
+        """ Return list of problems: queries repeated with the same arguments, and query
+            functions called at least threshold times (a query per item in a loop).
+        Output          problems            list of {'query', 'kind', 'calls', 'args'}
+        """
+        problems = []
+        by_args = {}
+        by_function = {}
+        for function, args, seconds, size in self.queries():
+            by_args[(function, args)] = by_args.get((function, args), 0) + 1
+            by_function[function] = by_function.get(function, 0) + 1
+        for (function, args), n in by_args.items():
+            if n > 1:
+                problems.append({'query': function, 'kind': 'repeated', 'calls': n, 'args': args})
+        for function, n in by_function.items():
+            if n >= threshold:
+                problems.append({'query': function, 'kind': 'loop', 'calls': n, 'args': None})
+        return problems
+
+    # *************************************************************************
+
+    def summary(self):
+        """ Return dictionary describing trace (for json output or logging)"""
+        return {'name': self.name, 'seconds': self.seconds, 'calls': len(self.calls),
+                'queries': len(self.queries()),
+                'bytes': sum(call[3] for call in self.queries()),
+                'n_plus_one': self.n_plus_one()}
+
+#*****************************************************************************
+
+class trace:
+    """ Context manager recording calls made inside with block, eg.
+            with instrument.trace('getEnzyme') as t:
+                seq_module.getEnzyme(acc)
+            print(t.n_plus_one())
+    """
+
+    def __init__(self, name=''):
+        self.trace = Trace(name)
+
+    def __enter__(self):
+        self._token = current.set(self.trace)
+        return self.trace
+
+    def __exit__(self, *exc):
+        self.trace.seconds = time.perf_counter() - self.trace.started
+        current.reset(self._token)
+
+#*****************************************************************************
+
+def value_size(value):
+    """ Return characters/bytes in one field of a row (fields holding rows are counted through)"""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(value_size(item) for item in value)
+    if value is None:
+        return 0
+    return 8
+
+def result_size(result):
+    """ Return (rows, characters/bytes) in query result (a row, a list of rows, or a mapping
+        of key: row such as seq_query.gene_inputs); (0, 0) for a result of any other shape"""
+    if result is None:
+        return 0, 0
+    if isinstance(result, (str, bytes)):
+        return 1, len(result)
+    try:
+        if isinstance(result, Mapping):
+            rows = list(result.values())
+        else:
+            rows = [result] if result and not isinstance(result[0], (tuple, list)) else result
+        size = 0
+        for row in rows:
+            size += value_size(row)
+        return len(rows), size
+    except Exception:
+        ## measuring must not fail the instrumented call
+        return 0, 0
+
+#*****************************************************************************
+
+def wrap(name, func, is_query):
+    """ Return timing wrapper for func, recorded under name"""
+
+    def finish(start, error, rows, size, args):
+        seconds = time.perf_counter() - start
+        with lock:
+            entry = stats.get(name)
+            if entry is None:
+                entry = stats[name] = FunctionStats()
+            entry.record(seconds, error, rows, size)
+        active = current.get()
+        if active is not None:
+            active.calls.append((name, args, seconds, size))
+
+    if inspect.isgeneratorfunction(func):
+        ## streaming queries: count rows and bytes as they are consumed (other generators,
+        ## eg. whole_genome_freq.coding_buffers, yield objects that are not rows: timed only)
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            rows = size = 0
+            error = False
+            try:
+                for row in func(*args, **kwargs):
+                    if is_query:
+                        rows += 1
+                        size += result_size(row)[1]
+                    yield row
+            except BaseException:
+                error = True
+                raise
+            finally:
+                finish(start, error, rows, size, repr(args)[:200])
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        error = True
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            rows, size = result_size(result) if is_query and not error else (0, 0)
+            finish(start, error, rows, size, repr(args)[:200])
+    return wrapper
+
+#*****************************************************************************
+
+def enable(modules=None):
+    """ Wrap every public function in instrumented modules (no effect if already enabled).
+    Input           modules             list of module names (default MODULES)
+    """
+    if patched:
+        return
+    for module_name in modules or MODULES:
+        module = importlib.import_module(module_name)
+        short = module_name.split('.')[-1]
+        prefix = module_name if module_name in QUERY_MODULES else short
+        for attr, func in list(vars(module).items()):
+            if attr.startswith('_') or attr == 'help' or not inspect.isfunction(func):
+                continue
+            if func.__module__ != module.__name__:
+                continue
+            setattr(module, attr, wrap(prefix + '.' + attr, func, module_name in QUERY_MODULES))
+            patched.append((module, attr, func))
+
+#*****************************************************************************
+
+def disable():
+    """ Restore original functions"""
+    while patched:
+        module, attr, func = patched.pop()
+        setattr(module, attr, func)
+
+#*****************************************************************************
+
+def enabled():
+    return bool(patched)
+
+#*****************************************************************************
+
+def reset():
+    """ Clear collected statistics"""
+    with lock:
+        stats.clear()
+
+#*****************************************************************************
+
+def to_json(indent=None):
+    """ Return statistics as json text"""
+    with lock:
+        data = {}
+        for name, entry in sorted(stats.items()):
+            data[name] = {'calls': entry.calls, 'errors': entry.errors,
+                          'seconds': round(entry.seconds, 6),
+                          'mean_seconds': round(entry.seconds / entry.calls, 6) if entry.calls else 0,
+                          'histogram': dict(zip([str(b) for b in BUCKETS], entry.buckets)),
+                          'rows': entry.rows, 'bytes': entry.bytes}
+    return json.dumps(data, indent=indent)
+
+#*****************************************************************************
+
+def to_prometheus():
+    """ Return statistics in Prometheus text exposition format"""
+    lines = ['# HELP ch8_function_seconds Time spent in function.',
+             '# TYPE ch8_function_seconds histogram']
+    with lock:
+        items = sorted(stats.items())
+        for name, entry in items:
+            total = 0
+            for bound, n in zip(BUCKETS, entry.buckets):
+                total += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('ch8_function_seconds_bucket{function="%s",le="%s"} %d' % (name, le, total))
+            lines.append('ch8_function_seconds_sum{function="%s"} %.6f' % (name, entry.seconds))
+            lines.append('ch8_function_seconds_count{function="%s"} %d' % (name, entry.calls))
+        lines.append('# HELP ch8_function_errors_total Calls ending in an exception.')
+        lines.append('# TYPE ch8_function_errors_total counter')
+        for name, entry in items:
+            lines.append('ch8_function_errors_total{function="%s"} %d' % (name, entry.errors))
+        ## each metric family is one block: HELP, TYPE, then all of its samples
+        queries = [(name, entry) for name, entry in items if name.startswith('data_access.')]
+        lines.append('# HELP ch8_query_rows_total Rows returned by database queries.')
+        lines.append('# TYPE ch8_query_rows_total counter')
+        for name, entry in queries:
+            lines.append('ch8_query_rows_total{query="%s"} %d' % (name, entry.rows))
+        lines.append('# HELP ch8_query_bytes_total Characters/bytes returned by database queries.')
+        lines.append('# TYPE ch8_query_bytes_total counter')
+        for name, entry in queries:
+            lines.append('ch8_query_bytes_total{query="%s"} %d' % (name, entry.bytes))
+    return '\n'.join(lines) + '\n'
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    import seq_module
+
+    gene = 'AB000381.1'
+    if len(sys.argv) > 1:
+        gene = sys.argv[1]
+
+    enable()
+    with trace('getEnzyme ' + gene) as t:
+        seq_module.getEnzyme(gene)
+    print(json.dumps(t.summary(), indent=1))
+    print(to_prometheus())
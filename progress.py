@@ -0,0 +1,111 @@
+#!/usr/bin python3
+
+""" Progress reporting module """
+
+"""
+Program:        progress
+File:           progress.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       Progress and throughput readout for long-running batch jobs.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+Small helper used by the whole-chromosome programs to report how many genes have been
+processed, the current throughput (genes/s) and an estimated time to completion.
+Output is written to stderr so it does not mix with results printed to stdout.
+If the total is not known (eg. accessions read from stdin) only the count and rate are shown.
+
+Usage:
+======
+progress
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+V1.1           19.10.26         Unknown total
+"""
+#*****************************************************************************
+# Import libraries
+
+import sys
+import time
+
+#*****************************************************************************
+
+class Progress:
+    """ Track number of genes processed and print throughput/ETA at regular intervals"""
+
+    def __init__(self, total, done=0, interval=5.0, stream=None, label='genes'):
+        """ Create progress tracker.
+        Input           total           total number of items in run (None if not known)
+                        done            items already completed (eg. restored from checkpoint)
+                        interval        minimum seconds between printed reports
+                        stream          output stream (default sys.stderr)
+                        label           name of items being counted
+        """
+        self.total      = total
+        self.done       = done
+        self.start_done = done
+        self.interval   = interval
+        self.stream     = stream
+        self.label      = label
+        self.failed     = 0
+        self.started    = time.monotonic()
+        self.last       = self.started
+
+    # *************************************************************************
+
+    def rate(self):
+        """ Return items processed per second in this run (excluding restored items)"""
+        elapsed = time.monotonic() - self.started
+        if elapsed <= 0:
+            return 0.0
+        return (self.done - self.start_done) / elapsed
+
+    # *************************************************************************
+
+    def eta(self):
+        """ Return estimated seconds remaining, or None if rate is not yet known"""
+        rate = self.rate()
+        if rate == 0 or self.total is None:
+            return None
+        return (self.total - self.done) / rate
+
+    # *************************************************************************
+
+    def update(self, n=1, failed=0):
+        """ Record n more items processed and print report if interval has passed"""
+        self.done   += n
+        self.failed += failed
+        now = time.monotonic()
+        if now - self.last >= self.interval:
+            self.last = now
+            self.report()
+
+    # *************************************************************************
+
+    def report(self, final=False):
+        """ Print one line progress report"""
+        stream = self.stream or sys.stderr
+        eta = self.eta()
+        if final or eta is None:
+            eta_text = ''
+        else:
+            eta_text = '  ETA ' + time.strftime('%H:%M:%S', time.gmtime(eta))
+        fail_text = ''
+        if self.failed:
+            fail_text = '  ' + str(self.failed) + ' failed'
+        if self.total is None:
+            count_text = '%d' % self.done
+        else:
+            count_text = '%d/%d' % (self.done, self.total)
+        print('%s %s  %.1f %s/s%s%s' % (count_text, self.label, self.rate(),
+                                       self.label, eta_text, fail_text), file=stream)
+        stream.flush()
@@ -0,0 +1,275 @@
+#!/usr/bin python3
+
+""" Gene Search Module """
+
+"""
+Program:        search_module
+File:           search_module.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       In-memory prefix and full-text search over gene ids and products.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+Builds an inverted index with a prefix trie over gene ids and tokenised products, once from
+the genbank table, and keeps it up to date as gene records are added or removed.
+Queries such as 'GPA*' or 'ribosomal prot' return ranked, paginated gene records:
+exact gene id > gene id prefix > whole product word > product word prefix. Every word of
+the query must match the gene id or a product word.
+
+Usage:
+======
+search_module       QUERY [PAGE]
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+"""
+#*****************************************************************************
+# Import libraries
+
+import re
+import sys
+
+#*****************************************************************************
+
+token_re = re.compile(r'[a-z0-9]+')
+
+## score for each kind of match
+GENID_EXACT     = 8
+GENID_PREFIX    = 4
+PRODUCT_EXACT   = 2
+PRODUCT_PREFIX  = 1
+
+#*****************************************************************************
+
+def tokenise(text):
+    """Return list of lowercase words in text (gene id, product or query).
+    Input           text                string
+
+    Output          tokens              list of words
+    """
+    if not text:
+        return []
+    return token_re.findall(text.lower())
+
+#*****************************************************************************
+
+class TrieNode:
+    """ Node of prefix trie. 'below' counts term occurrences per accession in this subtree,
+        'exact' counts terms ending at this node."""
+    __slots__ = ('children', 'below', 'exact')
+
+    def __init__(self):
+        self.children   = {}
+        self.below      = {}
+        self.exact      = {}
+
+#*****************************************************************************
+
+class Trie:
+    """ Prefix trie mapping terms to accession numbers"""
+
+    def __init__(self):
+        self.root = TrieNode()
+
+    # *************************************************************************
+
+    def insert(self, term, acc):
+        """ Add one occurrence of term for accession"""
+        node = self.root
+        node.below[acc] = node.below.get(acc, 0) + 1
+        for ch in term:
+            child = node.children.get(ch)
+            if child is None:
+                child = node.children[ch] = TrieNode()
+            node = child
+            node.below[acc] = node.below.get(acc, 0) + 1
+        node.exact[acc] = node.exact.get(acc, 0) + 1
+
+    # *************************************************************************
+
+    def delete(self, term, acc):
+        """ Remove one occurrence of term for accession, pruning empty nodes"""
+        path = [self.root]
+        for ch in term:
+            node = path[-1].children.get(ch)
+            if node is None:
+                return
+            path.append(node)
+        if acc not in path[-1].exact:
+            return
+        _decrement(path[-1].exact, acc)
+        for node in path:
+            _decrement(node.below, acc)
+        ## prune nodes no longer used by any term
+        for i in range(len(term), 0, -1):
+            if path[i].below:
+                break
+            del path[i - 1].children[term[i - 1]]
+
+    # *************************************************************************
+
+    def find(self, prefix):
+        """ Return node for prefix (None if no term starts with it)"""
+        node = self.root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+#*****************************************************************************
+
+def _decrement(counts, acc):
+    """ Decrease count for accession, removing key when it reaches zero"""
+    n = counts[acc] - 1
+    if n:
+        counts[acc] = n
+    else:
+        del counts[acc]
+
+#*****************************************************************************
+
+class GeneSearchIndex:
+    """ Inverted index with prefix tries over gene id and product words"""
+
+    def __init__(self, records=()):
+        """ Create index from iterable of gene records (eg. GeneCatalog)"""
+        self.records        = {}
+        self.genid_trie     = Trie()
+        self.product_trie   = Trie()
+        for record in records:
+            self.add(record)
+
+    # *************************************************************************
+
+    @classmethod
+    def from_query(cls):
+        """ Build index for every gene in the genbank table"""
+        import gene_module
+        return cls(gene_module.GeneCatalog.from_query())
+
+    # *************************************************************************
+
+    def add(self, record):
+        """ Add or replace gene record in index"""
+        if record.acc in self.records:
+            self.remove(record.acc)
+        self.records[record.acc] = record
+        genid = (record.genid or '').lower()
+        if genid:
+            self.genid_trie.insert(genid, record.acc)
+        for token in tokenise(record.product):
+            self.product_trie.insert(token, record.acc)
+
+    # *************************************************************************
+
+    def remove(self, acc):
+        """ Remove gene record from index. Return removed record (None if not found)"""
+        record = self.records.pop(acc, None)
+        if record is None:
+            return None
+        genid = (record.genid or '').lower()
+        if genid:
+            self.genid_trie.delete(genid, acc)
+        for token in tokenise(record.product):
+            self.product_trie.delete(token, acc)
+        return record
+
+    # *************************************************************************
+
+    def scores(self, query):
+        """ Return dictionary of accession: score for every gene matching query.
+        Input           query               search text; trailing '*' is allowed but every word
+                                            is matched as a prefix anyway
+
+        Output          scores              {acc: score}
+        """
+        query = query.strip().lower().rstrip('*')
+        scores = {}
+
+        ## whole query against gene id
+        node = self.genid_trie.find(query) if query else None
+        if node is not None:
+            for acc in node.below:
+                scores[acc] = GENID_PREFIX
+            for acc in node.exact:
+                scores[acc] = GENID_EXACT
+
+        ## every word must match a product word (or the gene id)
+        tokens = tokenise(query)
+        product_scores = None
+        for token in tokens:
+            token_scores = {}
+            node = self.product_trie.find(token)
+            if node is not None:
+                for acc in node.below:
+                    token_scores[acc] = PRODUCT_PREFIX
+                for acc in node.exact:
+                    token_scores[acc] = PRODUCT_EXACT
+            genid_node = self.genid_trie.find(token)
+            if genid_node is not None:
+                for acc in genid_node.below:
+                    token_scores[acc] = token_scores.get(acc, 0) + GENID_PREFIX
+            if product_scores is None:
+                product_scores = token_scores
+            else:
+                product_scores = {acc: product_scores[acc] + s for acc, s in token_scores.items()
+                                  if acc in product_scores}
+            if not product_scores:
+                break
+
+        if product_scores:
+            for acc, s in product_scores.items():
+                scores[acc] = scores.get(acc, 0) + s
+        return scores
+
+    # *************************************************************************
+
+    def search(self, query, page=1, per_page=20):
+        """ Return ranked page of gene records matching query.
+        Input           query               search text, eg. 'GPA*' or 'ribosomal protein'
+                        page                page number (from 1)
+                        per_page            records per page
+
+        Output          result              {'total': n, 'page': page, 'per_page': per_page,
+                                             'results': [gene records]}
+        """
+        scores = self.scores(query)
+        ranked = sorted(scores, key=lambda acc: (-scores[acc], acc))
+        first = (max(page, 1) - 1) * per_page
+        return {'total':    len(ranked),
+                'page':     page,
+                'per_page': per_page,
+                'results':  [self.records[acc] for acc in ranked[first:first + per_page]]}
+
+    # *************************************************************************
+
+    def __len__(self):
+        return len(self.records)
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    query = 'ribosomal protein'
+    page = 1
+    if len(sys.argv) > 1:
+        query = sys.argv[1]
+    if len(sys.argv) > 2:
+        page = int(sys.argv[2])
+
+    index = GeneSearchIndex.from_query()
+    result = index.search(query, page)
+    print(result['total'], 'genes found')
+    for gene in result['results']:
+        print(gene.acc, gene.genid, gene.product)
@@ -28,6 +28,13 @@ Coding sequence
 Peptide translation
 Restriction enzyme analysis
 
+The work is done by functions taking sequence strings (exonList, codingFromSeq, annotateFromSeq,
+translateSeq, enzymesFromSeq), which need no database; the accession functions fetch the
+sequence and coding information and call them.
+getEnzyme(acc, by_position=True) places every cut by its coordinates against the exons instead
+of searching the coding sequence separately.
+enz_cut_approx also finds sites within k mismatches or edits (star activity, near matches).
+
 Usage:
 ======
 seq_module      
@@ -42,6 +49,12 @@ V1.3            26.04.18    Simplified parameters               JJS
 V1.4            01.05.18    Debugging/unkn bp, exon boundaries  JJS
 V1.5            07.05.18    Linking to data access scripts      JJS
                             Changing coding info scripts        JJS
+V1.6            19.10.26    Sequence windows and paging
+V1.7            19.10.26    Functions on caller-supplied sequence strings
+V1.8            19.10.26    Cut sites classified by exon coordinates
+V1.9            19.10.26    Approximate cleavage sites
+V1.10           19.10.26    Input checks shared by batch jobs
+V1.11           19.10.26    Reverse strand genes: coding sequence reverse complemented
 """
 #*****************************************************************************
 # Import libraries
@@ -49,11 +62,21 @@ V1.5            07.05.18    Linking to data access scripts      JJS
 
 import re
 import sys
+import exon_table
+import approx_match
 from data_access import seq_query
 from data_access import coding_query
 
 #****************************************************************************
 
+## restriction enzymes searched by enz_cut: recognition sites
+ENZYMES = {
+    'EcoRI': 'GAATTC', 'BamHI': 'GGATCC',
+    'BsuMI': 'CTCGAG', 'HindIII': 'AAGCTT',
+    'EcoRV': 'GATATC', 'Sma1': 'CCCGGG'}
+
+#****************************************************************************
+
 def help():
     """Print usage message and exit"""
     print("""
@@ -100,6 +123,17 @@ def getSeq(acc):
     except TypeError:
         seq = 'nnn'
 
+    checkSeq(seq)
+
+    return gen_seq
+
+#**********************************************************************************
+
+def checkSeq(seq):
+    """Exit with message if sequence contains anything but valid nucleotide symbols.
+    Input           seq                 Genomic dna sequence (lowercase)
+    """
+
     ## check to see if sequence is valid (made up of valid nucleotide symbols (a,c,t,g,n)
     nucleotides = {'a': True, 'c': True, 't': True, 'g': True, 'n': True}
     for letter in seq:
@@ -109,7 +143,45 @@ def getSeq(acc):
             print('Sequence not valid')
             exit(0)
 
-    return gen_seq
+#**********************************************************************************
+
+def checkInputs(seq, code_info):
+    """Return genomic sequence ready for analysis, or raise if a gene cannot be analysed.
+    Used by batch jobs, which record the error and carry on (checkSeq exits instead).
+    Input           seq                 Genomic dna sequence as stored (None if not found)
+                    code_info           Coding information of gene (None if not found)
+
+    Output          seq                 Unbroken uppercase sequence
+    """
+    if seq is None:
+        raise LookupError('sequence not found')
+    if code_info is None:
+        raise LookupError('coding regions not found')
+    seq = seq.replace(' ', '')
+    if set(seq) - set('acgtn'):
+        raise ValueError('sequence not valid')
+    return seq.upper()
+
+#**********************************************************************************
+
+def getSeqRange(acc, start, end):
+    """Query database for part of genomic sequence; only the requested window is transferred.
+    Input           acc                 Accession ID
+                    start               first base (counting from 1, as exon positions)
+                    end                 last base (inclusive)
+
+    Output          seq_window          (acc, sequence window, full sequence length)
+    """
+    start = max(start, 1)
+    length = max(end - start + 1, 0)
+    seq_info = seq_query.seq_range_query(acc, start, length)
+    if seq_info is None:
+        print('Gene not found.')
+        exit(0)
+
+    checkSeq(seq_info[1])
+
+    return seq_info
 
 #**********************************************************************************
 
@@ -131,6 +203,18 @@ def getCoding(acc):
         code_start  = 1
         positions   = ''
 
+    coding_dict = {gene: (code_start, exonList(positions))}
+
+    return coding_dict
+
+#****************************************************************************
+
+def exonList(positions):
+    """Return exon boundaries from coding_regions positions string.
+    Input           positions           eg. 'join(120..245,1020..1177)'
+    Output          exon_list           list of (start, end) pairs
+    """
+
     ## use regex to extract exon boundaries
     p = re.compile(r'\d+')
     exon_list = p.findall(positions)
@@ -141,9 +225,7 @@ def getCoding(acc):
         exon_pair  = (int(exon_list[i]), int(exon_list[i+1]))
         new_list.append(exon_pair)
 
-    coding_dict = {gene: (code_start, new_list)}
-
-    return coding_dict
+    return new_list
 
 #****************************************************************************
 
@@ -196,6 +278,18 @@ def annotateSeq(acc):
         print('Gene not found.')
         exit(0)
 
+    return annotateFromSeq(seq, exon_list)
+
+#**********************************************************************************
+
+def annotateFromSeq(seq, exon_list):
+    """Return sequence string with exon boundaries marked out with symbols.
+    Input               seq                 Genomic sequence (uppercase)
+                        exon_list           list of (start, end) exon pairs
+
+    Output              exon_seq            Annotated sequence with inserted *exon/exon* boundaries (string)
+    """
+
     ## create new sequence string and identify index for exon start and end
     exon_seq        = ''
     base_count      = 0
@@ -217,6 +311,80 @@ def annotateSeq(acc):
 
 #**********************************************************************************
 
+def numSequencePage(acc, page=1, line_length=60, lines=20):
+    """Return one page of genomic sequence as numbered rows (as printed for gene pages).
+    Only the bases on the requested page are fetched from the database.
+    Input               acc                 Accession ID
+                        page                Page number (from 1)
+                        line_length         Bases per row
+                        lines               Rows per page
+
+    Output              seq_page            {'rows': [(first base number, row)], 'page': page,
+                                             'pages': number of pages, 'length': sequence length}
+    """
+    page_bases = line_length * lines
+    start = (max(page, 1) - 1) * page_bases + 1
+    seq_info = getSeqRange(acc, start, start + page_bases - 1)
+    seq = seq_info[1].upper()
+
+    rows = []
+    for i in range(0, len(seq), line_length):
+        rows.append((start + i, seq[i:i + line_length]))
+
+    return {'rows': rows, 'page': page, 'pages': -(-seq_info[2] // page_bases), 'length': seq_info[2]}
+
+#**********************************************************************************
+
+def annotateSeqRange(acc, start, end):
+    """Return part of sequence with exon boundaries marked, as annotateSeq does for whole sequence.
+    Input               acc                 Accession ID
+                        start               first base (counting from 1)
+                        end                 last base (inclusive)
+
+    Output              exon_seq            Annotated sequence window with inserted *exon/exon* boundaries
+    """
+    seq_info = getSeqRange(acc, start, end)
+    seq = seq_info[1].upper()
+    start = max(start, 1)
+
+    coding = getCoding(acc)
+    try:
+        exon_list = coding[seq_info[0]][1]
+    except KeyError:
+        print('Gene not found.')
+        exit(0)
+
+    ## markers follow base number: '*exon' after base before exon start, 'exon*' after exon end
+    markers = {}
+    for pair in exon_list:
+        markers.setdefault(pair[0] - 1, []).append('*exon')
+        markers.setdefault(pair[1], []).append('exon*')
+
+    exon_seq = []
+    last = start - 1
+    for base in sorted(markers):
+        if start <= base < start + len(seq):
+            exon_seq.append(seq[last - start + 1:base - start + 1])
+            exon_seq.extend(markers[base])
+            last = base
+    exon_seq.append(seq[last - start + 1:])
+    return ''.join(exon_seq)
+
+#**********************************************************************************
+
+def annotateSeqPage(acc, page=1, line_length=60, lines=20):
+    """Return one page of annotated sequence (page covers line_length * lines bases).
+    Input               acc                 Accession ID
+                        page                Page number (from 1)
+
+    Output              exon_seq            Annotated sequence for bases on page
+    """
+    page_bases = line_length * lines
+    start = (max(page, 1) - 1) * page_bases + 1
+    return annotateSeqRange(acc, start, start + page_bases - 1)
+
+#**********************************************************************************
+
 def codingSeq(acc):
     """Return coding sequence (stuck together exons). If no exon_list, will return genomic sequence string.
     Input           acc                 Accession ID
@@ -238,33 +406,33 @@ def codingSeq(acc):
     seq = seq.replace(' ', '')
     seq = seq.upper()
 
-    ## use getCoding(acc) function to get code start and exon boundaries from pymysql script
-    coding      = getCoding(acc)
-    try:
-        coding[seq_gene]
-        codon_start = coding[seq_gene][0]
-        exon_list   = coding[seq_gene][1]
-    except TypeError:
+    ## get code start, strand and exon boundaries (reverse strand genes are reverse complemented)
+    code_info   = coding_query.coding_query(acc)
+    if code_info is None:
         print('Gene not found.')
         exit(0)
+    strand, exon_list = exon_table.parse_positions(code_info[2])
+
+    return codingFromSeq(seq, code_info[1] or 1, exon_list, strand)
+
+#**********************************************************************************
+
+def codingFromSeq(seq, codon_start, exon_list, strand=1):
+    """Return coding sequence assembled from genomic sequence string.
+    Input           seq                 Genomic sequence (uppercase)
+                    codon_start         position of first codon in gene (1, 2 or 3)
+                    exon_list           list of (start, end) exon pairs
+                    strand              1, or -1 for reverse strand gene ('complement(...)'): exons
+                                        are joined and reverse complemented (exon_table.parse_positions
+                                        gives strand and exons)
+
+    Output          coding_seq          Coding sequence
+    """
 
     ## assemble coding sequence by using exon boundaries as index start/end
+    ## (same cut as exon_table.ExonTable.coding_seq and coding_batch)
     if exon_list       != None:
-        coding_seq      = ''
-        first_exon      = True
-        # have to subtract one from codon_start as index correction
-        codon_start     = codon_start - 1
-        ## first exon needs to use codon start to initiate translation
-        for x in exon_list:
-            if first_exon   == True:
-                start       = (x[0]) - 1          # must subtract 1 for index correction
-                start       = start + codon_start
-                end         = x[1]
-                first_exon  = False
-            else:
-                start   = (x[0]) - 1
-                end     = x[1]
-            coding_seq += seq[start:end]
+        coding_seq = exon_table.coding_from_exons(seq, exon_list, codon_start, strand)
     else:
         coding_seq = seq
 
@@ -281,7 +449,17 @@ def translate(acc):
     """
 
     ## must run codingSeq function to obtain coding sequence for translation
-    seq = codingSeq(acc)
+    return translateSeq(codingSeq(acc))
+
+#**********************************************************************************
+
+def translateSeq(seq):
+    """Return protein translation of coding sequence string.
+    Input                       seq                     coding sequence (uppercase)
+
+    Output [0]                  codon_list              ordered list of codons
+    Output [1]                  aa_seq                  string of amino acid sequence
+    """
 
     aa_seq = ''
     codon_table = {
@@ -336,10 +514,7 @@ def enz_cut(acc, seq=None, enzyme=None):
 
     """
 
-    enz_dict = {
-        'EcoRI': 'GAATTC', 'BamHI': 'GGATCC',
-        'BsuMI': 'CTCGAG', 'HindIII': 'AAGCTT',
-        'EcoRV': 'GATATC', 'Sma1': 'CCCGGG'}
+    enz_dict = ENZYMES
 
     ## no sequence parameter: check default, genomic sequence of gene for restriction enzyme sites
     ## sequence parameter will be utilised when checking coding sequence in 'getEnzymes' program
@@ -395,31 +570,99 @@ def enz_cut(acc, seq=None, enzyme=None):
 
 #**********************************************************************************
 
-def getEnzyme(acc, enzyme=None):
+def validSite(enzyme):
+    """ Return True if custom cleavage site is made of A, C, T and G only (either case)"""
+
+    base_list = ['A', 'C', 'T', 'G']
+    if not enzyme:
+        return False
+    for x in enzyme.upper():
+        if x not in base_list:
+            return False
+    return True
+
+#**********************************************************************************
+
+def enz_cut_approx(acc, seq=None, enzyme=None, k=1, distance='hamming'):
+    """ Indicate cleavage sites within k mismatches (distance='hamming') or k insertions,
+        deletions or substitutions (distance='edit') of each restriction enzyme site, in one
+        pass of the sequence per enzyme (see approx_match).
+
+    Input           acc                 accession number for gene
+                    seq                 gene sequence string (optional, set as 'None' if not using)
+                    enzyme              custom cleavage site (optional)
+                    k                   differences allowed
+                    distance            'hamming' or 'edit'
+
+    Output          cut_dict            {enzyme: (no. of sites, [(start, end, differences)])}
+    """
+
+    sites = dict(ENZYMES)
+    if enzyme != None:
+        enzyme = enzyme.upper()
+        if not validSite(enzyme):
+            print('Cleavage site must include A, C, T or G only.')
+            return {}
+        sites[enzyme] = enzyme
+
+    if seq == None:
+        seq = getSeq(acc)[1]
+    seq = seq.replace(' ', '')
+
+    cut_dict = {}
+    for name, site in sites.items():
+        cut_list = approx_match.find_sites(seq, site, k, distance)
+        if cut_list:
+            cut_dict[name] = (len(cut_list), cut_list)
+
+    return cut_dict
+
+#**********************************************************************************
+
+def getEnzyme(acc, enzyme=None, by_position=False):
     """ Function for returning restriction enzyme cleavage sites and indicating 'Bad' or 'Good'.
      Input                      acc                         Gene accession number
                                 enzyme                      Optional input for custom cleavage site
+                                by_position                 classify each cut by its coordinates
+                                                            (see getEnzymeSites)
      Output                     enzyme_list                 List of all enzymes cutting sequence, Bad/Good,
                                                             and cleavage start/end coordinates
      """
 
-    ## use seq_module to obtain sequence information
-    code_seq    = codingSeq(acc)
+    if by_position:
+        return getEnzymeSites(acc, enzyme)
+
+    ## fetch genomic sequence and coding information once; coding sequence is cut from it
+    seq_info    = getSeq(acc)
+    seq         = seq_info[1].replace(' ', '').upper()
+    code_info   = coding_query.coding_query(acc)
+    if code_info is None:
+        print('Gene not found.')
+        exit(0)
+    strand, exon_list = exon_table.parse_positions(code_info[2])
+    code_seq    = codingFromSeq(seq, code_info[1] or 1, exon_list, strand)
+
+    return enzymesFromSeq(seq, code_seq, enzyme)
+
+#**********************************************************************************
+
+def enzymesFromSeq(seq, code_seq, enzyme=None):
+    """ Return restriction enzyme cleavage sites in genomic sequence string, 'Bad' if the enzyme
+        also cuts the coding sequence, otherwise 'Good'.
+     Input                      seq                         Genomic sequence
+                                code_seq                    Coding sequence
+                                enzyme                      Optional input for custom cleavage site
+     Output                     results_dict                {enzyme: (Bad/Good, (count, cleavage start/end coordinates))}
+     """
 
-    base_list = ['A', 'C', 'T', 'G']
     ## call function to show cleavage positions
     if enzyme != None:
         enzyme = enzyme.upper()
-        for x in enzyme:
-            if x in base_list:
-                coding_cut      = enz_cut(acc, code_seq, enzyme)
-                seq_cut         = enz_cut(acc, None, enzyme)
-            else:
-                print('Cleavage site must include A, C, T or G only.')
-                break
-    else:
-        coding_cut      = enz_cut(acc, code_seq)
-        seq_cut         = enz_cut(acc)
+        if not validSite(enzyme):
+            print('Cleavage site must include A, C, T or G only.')
+            return {}
+    coding_cut      = enz_cut(None, code_seq, enzyme)
+    seq_cut         = enz_cut(None, seq, enzyme)
 
     ## determine whether enzyme cuts in coding region
     enzymes    = []
@@ -441,6 +684,58 @@ def getEnzyme(acc, enzyme=None):
 
 #**********************************************************************************
 
+def getEnzymeSites(acc, enzyme=None):
+    """ Return restriction enzyme cleavage sites with the exon or intron each cut falls in.
+     Input                      acc                         Gene accession number
+                                enzyme                      Optional input for custom cleavage site
+     Output                     results_dict                {enzyme: (Bad/Good, (count, sites))}, see enzymeSitesFromSeq
+     """
+
+    seq_info    = getSeq(acc)
+    code_info   = coding_query.coding_query(acc)
+    if code_info is None:
+        print('Gene not found.')
+        exit(0)
+    strand, exons = exon_table.parse_positions(code_info[2])
+
+    return enzymeSitesFromSeq(seq_info[1], exons, code_info[1] or 1, strand, enzyme)
+
+#**********************************************************************************
+
+def enzymeSitesFromSeq(seq, exons, codon_start=1, strand=1, enzyme=None):
+    """ Return cleavage sites in genomic sequence string, each placed against the exons by binary
+        search of its position. An enzyme is 'Bad' if any cut lies in or across an exon.
+     Input                      seq                         Genomic sequence
+                                exons                       list of (start, end) exons (counting from 1)
+                                codon_start                 position of first codon
+                                strand                      1, or -1 for reverse strand gene
+                                enzyme                      Optional input for custom cleavage site
+     Output                     results_dict                {enzyme: (Bad/Good, (count, sites))}
+                                                            sites: list of (start, end, region, exon, cds offset),
+                                                            region 'exon', 'boundary', 'intron' or 'outside'
+     """
+
+    if enzyme != None:
+        enzyme = enzyme.upper()
+        if not validSite(enzyme):
+            print('Cleavage site must include A, C, T or G only.')
+            return {}
+
+    ## genomic sequence is searched once; coding sequence is not searched
+    seq_cut = enz_cut(None, seq, enzyme)
+
+    results_dict = {}
+    for k, (count, cut_list) in seq_cut.items():
+        sites = exon_table.locate_sites(cut_list, exons, codon_start, strand)
+        if any(site[2] in ('exon', 'boundary') for site in sites):
+            results_dict[k] = ('Bad', (count, sites))
+        else:
+            results_dict[k] = ('Good', (count, sites))
+
+    return results_dict
+
+#**********************************************************************************
+
 
 ###### main ####
 
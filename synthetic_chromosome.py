@@ -0,0 +1,165 @@
+#!/usr/bin python3
+
+""" Synthetic Chromosome Generator """
+
+"""
+Program:        synthetic_chromosome
+File:           synthetic_chromosome.py
+
+Version:        1.0
+Date:           19.10.26
+Function:       Create synthetic genbank, sequence and coding_regions tables in a SQLite stand-in database.
+
+Course:         MSc Bioinformatics, Birkbeck University of London
+                Biocomputing 2 Coursework
+
+______________________________________________________________________________
+
+Description:
+============
+Generates a chromosome-sized test dataset with the same tables and formats as the
+chromosome8 database, so programs and benchmarks can run without the MySQL server:
+    genbank             accession, gene, product, location ('8q24.3', '8p22-p21.3', ...)
+    sequence            lowercase genomic sequence (a, c, g, t and occasional n)
+    coding_regions      codon start and exon positions ('join(120..245,1020..1177)'),
+                        about 10% on the reverse strand ('complement(join(...))')
+Genes have 1-12 exons of 40-300 bp separated by introns of 80-2000 bp. Gene ids and products
+are drawn from small pools, so many records share them as in the real data, and a fraction
+of records repeat an earlier record's sequence and exons exactly.
+The same seed always gives the same database.
+
+Usage:
+======
+synthetic_chromosome        GENES [FILE] [--seed N]
+
+Revision History:
+=================
+V1.0           19.10.26         Original
+"""
+#*****************************************************************************
+# Import libraries
+
+import argparse
+import os
+import random
+
+from data_access import connection
+
+#*****************************************************************************
+
+GENE_IDS = ['GPAA1', 'p53R2', 'NBS1', 'CALB1', 'MTG8', 'DECR', 'NAT1', 'ASH2L', 'RPL8', 'RPL30',
+            'NAT2', 'DEFA1', 'DEFA3', 'VDAC3', 'SRD5A1', 'TERF1', 'KCNV1', 'HNF4G', 'MYC', 'LPL',
+            'FGFR1', 'ANGPT1', 'EXT1', 'TG', 'PTK2', 'ASAH1', 'CHRNA6', 'PXMP3', 'GGH', 'MYBL1']
+
+PRODUCT_WORDS = [['ribosomal protein', 'N-acetyltransferase', 'defensin, alpha', 'potassium channel',
+                  'hepatocyte nuclear factor', 'telomeric repeat binding factor', 'ribonucleotide reductase',
+                  'voltage-dependent anion channel', 'putative transcription factor',
+                  'seven transmembrane helix receptor', 'N-acylsphingosine amidohydrolase',
+                  'glycosylphosphatidylinositol anchor attachment', 'steroid 5-alpha-reductase'],
+                 ['', ' 1', ' 2', ' 3', ' L8', ' S20', ' type I', ' subunit', ' isoform a', ' like']]
+
+BANDS = ['p23.3', 'p23.2', 'p23.1', 'p22', 'p21.3', 'p21.2', 'p21.1', 'p12', 'p11.23', 'p11.22',
+         'p11.21', 'p11.1', 'q11.1', 'q11.21', 'q11.22', 'q11.23', 'q12.1', 'q12.2', 'q12.3', 'q13.1',
+         'q13.2', 'q13.3', 'q21.11', 'q21.13', 'q21.2', 'q21.3', 'q22.1', 'q22.2', 'q22.3', 'q23.1',
+         'q23.2', 'q23.3', 'q24.11', 'q24.12', 'q24.13', 'q24.21', 'q24.22', 'q24.23', 'q24.3']
+
+## sizes used by the benchmark suite
+SIZES = (1000, 10000, 100000)
+
+#*****************************************************************************
+
+def randomBases(rng, size=1 << 20):
+    """Return block of random lowercase bases (about 41% GC, rare n) to cut sequences from"""
+    bases = rng.choices('acgtn', weights=(29.5, 20.5, 20.5, 29.5, 0.02), k=size)
+    return ''.join(bases)
+
+#*****************************************************************************
+
+def exonStructure(rng):
+    """Return (sequence length, list of (start, end) exons, counting from 1) for one gene"""
+    exons = []
+    pos = rng.randint(20, 400)                      # 5' flank
+    for i in range(min(int(rng.expovariate(1 / 4.0)) + 1, 12)):
+        if i:
+            pos += rng.randint(80, 2000)            # intron
+        length = rng.randint(40, 300)
+        exons.append((pos + 1, pos + length))
+        pos += length
+    return pos + rng.randint(20, 400), exons        # 3' flank
+
+#*****************************************************************************
+
+def location(rng):
+    """Return random cytogenetic band string, sometimes a band range"""
+    i = rng.randrange(len(BANDS))
+    if rng.random() < 0.15 and i + 1 < len(BANDS):
+        j = rng.randrange(i + 1, min(i + 4, len(BANDS)))
+        if BANDS[i][0] == BANDS[j][0]:
+            return '8' + BANDS[i] + '-' + BANDS[j]
+    return '8' + BANDS[i]
+
+#*****************************************************************************
+
+def generate(path, genes, seed=8, dup_fraction=0.05, batch=1000):
+    """Create SQLite stand-in database with synthetic chromosome.
+    Input           path                database file (replaced if it exists)
+                    genes               number of genes
+                    seed                random seed
+                    dup_fraction        fraction of records repeating an earlier record's sequence and exons
+                    batch               rows inserted per statement
+
+    Output          path                database file
+    """
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    cnx = connection.create_sqlite(path)
+    pool = randomBases(rng)
+
+    made = []
+    genbank, sequence, coding = [], [], []
+    for i in range(genes):
+        acc = 'SYN%07d.1' % i
+        if made and rng.random() < dup_fraction:
+            seq, codon_start, positions = rng.choice(made)
+        else:
+            length, exons = exonStructure(rng)
+            offset = rng.randrange(len(pool) - length)
+            seq = pool[offset:offset + length]
+            codon_start = rng.choice((1, 1, 1, 2, 3))
+            positions = ','.join('%d..%d' % exon for exon in exons)
+            if len(exons) > 1:
+                positions = 'join(' + positions + ')'
+            if rng.random() < 0.1:
+                positions = 'complement(' + positions + ')'
+            if len(made) < 1000:
+                made.append((seq, codon_start, positions))
+        product = rng.choice(PRODUCT_WORDS[0]) + rng.choice(PRODUCT_WORDS[1])
+        genbank.append((acc, rng.choice(GENE_IDS), product, location(rng)))
+        sequence.append((acc, seq))
+        coding.append((acc, codon_start, positions))
+
+        if len(genbank) >= batch or i == genes - 1:
+            with cnx.cursor() as cursor:
+                cursor.executemany("INSERT INTO genbank VALUES (%s, %s, %s, %s);", genbank)
+                cursor.executemany("INSERT INTO sequence VALUES (%s, %s);", sequence)
+                cursor.executemany("INSERT INTO coding_regions VALUES (%s, %s, %s);", coding)
+            cnx.commit()
+            genbank, sequence, coding = [], [], []
+
+    cnx.close()
+    return path
+
+
+#*****************************************************************************
+## main
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Create synthetic chromosome database')
+    parser.add_argument('genes', type=int, help='number of genes, eg. 1000, 10000 or 100000')
+    parser.add_argument('file', nargs='?', help='SQLite database file (default synthetic_GENES.db)')
+    parser.add_argument('--seed', type=int, default=8)
+    args = parser.parse_args()
+
+    print(generate(args.file or 'synthetic_%d.db' % args.genes, args.genes, args.seed))
@@ -26,7 +26,9 @@ This program will calculate codon usage frequency, percentage, and ratio of codo
 
 Usage:
 ======
-whole_genome_freq
+whole_genome_freq       [--checkpoint FILE] [--every N]
+whole_genome_freq       --shard-index I --shard-count N --out FILE
+whole_genome_freq       --merge FILE [FILE ...]
 
 Revision History:
 =================
@@ -36,17 +38,37 @@ V1.0           18.04.18         Original            By: JJS
 V1.1           1.05.18          changed output          JJS
 V1.2           2.05.18          reworked as function    JJS
 V1.3           4.05.18          added bias function     JJS
+V1.4           19.10.26         checkpoint/resume and progress readout
+V1.5           19.10.26         shard mode and merge of partial results
+V1.6           19.10.26         genes with identical inputs analysed once
+V1.7           19.10.26         checkpoint tied to the gene list it was made for
+V1.8           19.10.26         genes read a chunk at a time using one exon table per run
+V1.9           19.10.26         codons counted from one coding buffer per chunk
 """
 #*****************************************************************************
 # Import libraries
 
+import json
+import os
+import gzip
+import hashlib
+import argparse
+
+import duplicates
+import exon_table
+from coding_batch import CodingBuffer
 import gene_module
 import seq_module
 import codon_usage
 from data_access import list_query
+from data_access import seq_query
+from progress import Progress
 
 from xml.dom import minidom
 
+## fixed codon order used for per-gene count lists in shard files
+CODONS = tuple(codon_usage.codonFreq(''))
+
 #****************************************************************************
 def help():
     """Print a usage message and exit."""
@@ -67,50 +89,186 @@ def help():
 
 #****************************************************************************
 
-def total_usage():
-    """Return genome usage information for entire database of genes.
-    Input               self
-    Output              (SynCodons, usage_dict)         Dictionary of synonymous codons for each amino acid
-                                                        Dictionary of codon: ratio, percent usage statistics
+def chromosome_accessions():
+    """Return accession numbers of every gene in database, in database order.
+    Output              accessions                      List of accession numbers
+    """
+    ## catalog is built fresh for each call, so repeated runs do not accumulate gene objects
+    catalog = gene_module.GeneCatalog.from_rows(list_query.genbank_query())
+    return catalog.accessions()
+
+#****************************************************************************
 
+def run_digest(accessions, dedupe):
+    """Return digest identifying a run: its gene list (in order) and settings.
+    Input               accessions                      List of accession numbers
+                        dedupe                          Duplicate genes analysed once
+    Output              digest                          Hex digest
     """
-    genbank = list_query.genbank_query()
-    for gene in genbank:
-        acc = gene[0]
-        genid = gene[1]
-        product = gene[2]
-        location = gene[3]
-
-        ## Uses initialisation function to create a gene object for each listing from database
-        gene_object = gene_module.Gene(acc, genid, product, location)
-
-    object_dict = {}  # individual object dictionary of identifiers
-    chrom_dict = {}  # chromosome dictionary of all gene objects
-    total_freq = {}
-    ## Create a dictionary of gene objects
-    for object in gene_module.Gene._registry:
-        object_dict = gene_module.Gene.geneList(object)
-
-        ## use coding seq function to determine coding sequence for each gene
-        for k, v in object_dict.items():
-            chrom_dict[k] = v
-
-    for k in chrom_dict:
-        coding_dna = seq_module.codingSeq(k)
-
-        ##  call function to determine codon frequency for each gene
-        codon_table = codon_usage.codonFreq(coding_dna)
-
-        ##  add each to total codon frequency dictionary
-        for key in codon_table:
-            if key in total_freq:
-                total_freq[key] += codon_table[key]
-            else:
-                total_freq[key] = codon_table[key]
+    digest = hashlib.sha1(('dedupe=%d\n' % bool(dedupe)).encode('utf-8'))
+    for acc in accessions:
+        digest.update(acc.encode('utf-8') + b'\n')
+    return digest.hexdigest()
 
-    print(total_freq)
+#****************************************************************************
+
+def load_checkpoint(checkpoint, run=None):
+    """Return accessions already processed and partial codon totals saved in checkpoint file.
+    Input               checkpoint                      Path to checkpoint file
+                        run                             Digest of current run (run_digest); a checkpoint
+                                                        saved for a different gene list or settings
+                                                        raises ValueError instead of mixing totals
+    Output              (done, total_freq)              Set of finished accession numbers
+                                                        Dictionary of partial codon frequency totals
+    """
+    if checkpoint is None or not os.path.exists(checkpoint):
+        return set(), {}
+    with open(checkpoint) as f:
+        saved = json.load(f)
+    if run is not None and saved.get('run') != run:
+        raise ValueError(checkpoint + ' was saved for a different gene list or settings; '
+                         'remove it to start again')
+    return set(saved['done']), saved['total_freq']
+
+#****************************************************************************
+
+def save_checkpoint(checkpoint, done, total_freq, run=None):
+    """Write finished accessions and partial codon totals to checkpoint file.
+    File is written to a temporary name and then renamed, so an interrupted write never
+    replaces a good checkpoint with a truncated one.
+    Input               checkpoint                      Path to checkpoint file
+                        done                            Set of finished accession numbers
+                        total_freq                      Dictionary of partial codon frequency totals
+                        run                             Digest of current run (run_digest)
+    """
+    tmp = checkpoint + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'run': run, 'done': sorted(done), 'total_freq': total_freq}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, checkpoint)
+
+#****************************************************************************
+
+def coding_buffers(accessions, table=None, dedupe=True, chunk=200):
+    """Yield coding sequences of genes a chunk at a time, each chunk in one coding buffer.
+    Exons, codon start and strand of every gene come from one exon table for the whole run,
+    so coding sequences are cut without a coding query or re-parsing per gene (reverse strand
+    genes are reverse complemented, as seq_module.codingSeq).
+    Input               accessions                      List of accession numbers
+                        table                           ExonTable of the genes (loaded if not given)
+                        dedupe                          Analyse genes with identical sequence and
+                                                        coding information once (duplicates module)
+                        chunk                           Genes per sequence query
+    Output              (groups, buffer)                Lists of accessions sharing one result (first is
+                                                        the gene analysed); coding_batch.CodingBuffer
+                                                        holding the first gene of each group that has a
+                                                        valid sequence and coding regions
+    """
+    if table is None:
+        table = exon_table.ExonTable.from_query(accessions)
+    if dedupe:
+        groups = duplicates.group_accessions(accessions, table)
+    else:
+        groups = [[acc] for acc in accessions]
+
+    for i in range(0, len(groups), chunk):
+        part = groups[i:i + chunk]
+        inputs = seq_query.gene_inputs([group[0] for group in part], coding=False)
+        sequences = []
+        for group in part:
+            acc = group[0]
+            try:
+                sequences.append((acc, seq_module.checkInputs(inputs[acc][0],
+                                  table.coding_info(acc) if acc in table else None)))
+            except (LookupError, ValueError):
+                continue
+        yield part, CodingBuffer.assemble(table, sequences)
+
+#****************************************************************************
+
+def gene_counts(accessions, table=None, dedupe=True, chunk=200):
+    """Yield codon frequency of genes, counted from one coding buffer per chunk (see coding_buffers).
+    Output              (group, codon_table)            Accessions sharing one result, codon: frequency
+                                                        dictionary (None if gene has no valid sequence
+                                                        or coding regions)
+    """
+    for groups, buffer in coding_buffers(accessions, table, dedupe, chunk):
+        for group in groups:
+            yield group, buffer.codon_counts(group[0]) if group[0] in buffer else None
+
+#****************************************************************************
+
+def genome_freq(accessions, checkpoint=None, every=100, progress=True, dedupe=True):
+    """Return total codon frequency for list of genes, optionally saving checkpoints.
+    If checkpoint file exists, genes listed in it are skipped and its partial totals are
+    used as the starting point, so a resumed run gives the same totals as an uninterrupted one.
+    The checkpoint records a digest of the gene list and settings; resuming a different run
+    from it raises ValueError.
+    Input               accessions                      List of accession numbers
+                        checkpoint                      Path to checkpoint file (optional)
+                        every                           Number of genes between checkpoints (checked
+                                                        after each chunk of genes)
+                        progress                        Print genes/s and ETA to stderr
+                        dedupe                          Analyse genes with identical sequence and
+                                                        coding information once (duplicates module)
+    Output              total_freq                      Dictionary of codon: total frequency; genes with
+                                                        no valid sequence or coding regions add nothing
+    """
+    run = run_digest(accessions, dedupe)
+    done, total_freq = load_checkpoint(checkpoint, run)
+    remaining = [acc for acc in accessions if acc not in done]
+
+    tracker = Progress(len(accessions), done=len(accessions) - len(remaining))
+    since_save = 0
+    try:
+        ##  codon frequency of each chunk of genes (once for each group of identical genes)
+        for groups, buffer in coding_buffers(remaining, dedupe=dedupe):
+            chunk_freq = buffer.total_counts()
+            for group in groups:
+                if len(group) > 1 and group[0] in buffer:
+                    codon_table = buffer.codon_counts(group[0])
+                    for key in codon_table:
+                        chunk_freq[key] += codon_table[key] * (len(group) - 1)
+
+            ##  add chunk to total codon frequency dictionary
+            for key in chunk_freq:
+                if key in total_freq:
+                    total_freq[key] += chunk_freq[key]
+                else:
+                    total_freq[key] = chunk_freq[key]
+            genes = sum(len(group) for group in groups)
+            done.update(acc for group in groups for acc in group)
+
+            since_save += genes
+            if checkpoint is not None and since_save >= every:
+                save_checkpoint(checkpoint, done, total_freq, run)
+                since_save = 0
+            if progress:
+                tracker.update(genes, sum(len(group) for group in groups if group[0] not in buffer))
+    except BaseException:
+        ## save completed genes before giving up (eg. dropped database connection)
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, done, total_freq, run)
+        raise
+
+    if progress:
+        tracker.report(final=True)
+    ## run is complete, next run should start again from the beginning
+    if checkpoint is not None and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    return total_freq
+
+#****************************************************************************
+
+def usage_stats(total_freq):
+    """Return codon usage ratio and percent for a codon frequency table.
+    Input               total_freq                      Dictionary of codon: frequency
+    Output              (SynCodons, usage_dict)         Dictionary of synonymous codons for each amino acid
+                                                        Dictionary of codon: ratio, percent usage statistics
+    """
     ## calculate codon usage ratio for whole genome (returns dictionary, 'whole_genome_ratio')
-    gene = 'total'
     whole_genome_ratio = codon_usage.usageRatio(total_freq)
 
     SynCodons = {
@@ -158,9 +316,131 @@ def total_usage():
 
 #****************************************************************************
 
-def codon_compare(acc):
+def total_usage(checkpoint=None, every=100):
+    """Return genome usage information for entire database of genes.
+    Input               checkpoint                      Path to checkpoint file (optional); an interrupted
+                                                        run resumes from the last saved checkpoint
+                        every                           Number of genes between checkpoints
+    Output              (SynCodons, usage_dict)         Dictionary of synonymous codons for each amino acid
+                                                        Dictionary of codon: ratio, percent usage statistics
+
+    """
+    total_freq = genome_freq(chromosome_accessions(), checkpoint, every)
+
+    print(total_freq)
+    return usage_stats(total_freq)
+
+#****************************************************************************
+
+def shard_of(acc, count):
+    """Return shard number for accession. Uses md5 of the accession (not Python's hash(), which
+    changes between processes) so every machine assigns a gene to the same shard.
+    Input               acc                             Accession number
+                        count                           Total number of shards
+    Output              shard                           Shard index, 0 <= shard < count
+    """
+    digest = hashlib.md5(acc.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count
+
+#****************************************************************************
+
+def shard_accessions(accessions, index, count):
+    """Return accessions belonging to one shard.
+    Input               accessions                      List of accession numbers
+                        index                           Shard index (0 to count - 1)
+                        count                           Total number of shards
+    Output              shard_list                      Accessions assigned to this shard
+    """
+    if count < 1 or not 0 <= index < count:
+        raise ValueError('shard index must be between 0 and ' + str(count - 1))
+    return [acc for acc in accessions if shard_of(acc, count) == index]
+
+#****************************************************************************
+
+def shard_run(index, count, out, progress=True):
+    """Calculate codon frequencies for one shard of chromosome and write partial result file.
+    The file (gzipped json) holds codon counts for each gene in a fixed codon order plus the
+    shard totals, so any set of shard files can be combined by merge_shards.
+    Input               index                           Shard index (0 to count - 1)
+                        count                           Total number of shards
+                        out                             Path of partial result file
+                        progress                        Print genes/s and ETA to stderr
+    Output              totals                          Dictionary of codon: frequency for this shard
+    """
+    accessions = shard_accessions(chromosome_accessions(), index, count)
+
+    genes   = {}
+    totals  = [0] * len(CODONS)
+    tracker = Progress(len(accessions))
+    ## genes with identical inputs share the counts of the first gene of their group;
+    ## genes that cannot be analysed are stored with no codons
+    for group, codon_table in gene_counts(accessions):
+        counts = [codon_table[codon] if codon_table else 0 for codon in CODONS]
+        for acc in group:
+            genes[acc] = counts
+        for i in range(len(counts)):
+            totals[i] += counts[i] * len(group)
+        if progress:
+            tracker.update(len(group))
+    if progress:
+        tracker.report(final=True)
+
+    partial = {'format': 'codon-shard', 'version': 1, 'shard': [index, count],
+               'codons': list(CODONS), 'genes': genes, 'totals': totals}
+    tmp = out + '.tmp'
+    with gzip.open(tmp, 'wt') as f:
+        json.dump(partial, f, separators=(',', ':'))
+    os.replace(tmp, out)
+
+    return dict(zip(CODONS, totals))
+
+#****************************************************************************
+
+def read_shard(path):
+    """Return per-gene codon counts from partial result file.
+    Input               path                            Path of partial result file
+    Output              genes                           Dictionary of accession: list of codon counts (CODONS order)
+    """
+    with gzip.open(path, 'rt') as f:
+        partial = json.load(f)
+    if partial.get('format') != 'codon-shard':
+        raise ValueError(path + ' is not a codon shard file')
+    ## reorder counts if file was written with a different codon order
+    order = [partial['codons'].index(codon) for codon in CODONS]
+    genes = {}
+    for acc, counts in partial['genes'].items():
+        genes[acc] = [counts[i] for i in order]
+    return genes
+
+#****************************************************************************
+
+def merge_shards(paths):
+    """Combine partial result files into whole chromosome codon usage.
+    Genes are keyed by accession, so overlapping or repeated shard files are only counted once.
+    Input               paths                           List of partial result files
+    Output              (SynCodons, usage_dict)         Same result as total_usage
+    """
+    genes = {}
+    for path in paths:
+        genes.update(read_shard(path))
+
+    totals = [0] * len(CODONS)
+    for counts in genes.values():
+        for i in range(len(counts)):
+            totals[i] += counts[i]
+    total_freq = dict(zip(CODONS, totals))
+
+    print(total_freq)
+    return usage_stats(total_freq)
+
+#****************************************************************************
+
+def codon_compare(acc, wgf_stats=None):
     """ Return rough comparison of codon usage ratios between gene and whole chromosome
     Input                       acc                 Accession number of gene of interest
+                                wgf_stats           Whole chromosome codon: (ratio, percent) dictionary
+                                                    (usage_dict of total_usage or merge_shards);
+                                                    calculated with total_usage if not given
 
     Output                      bias_list           List of codons in specified gene that have ratios that differ by
                                                     more than 50% from codon usage ratio chromosome-wide
@@ -170,8 +450,8 @@ def codon_compare(acc):
     results = codon_usage.getCodonusage(acc)
     gene_stats = results[1]
 
-    codons_dictionary = total_usage()
-    wgf_stats = codons_dictionary[1]
+    if wgf_stats is None:
+        wgf_stats = total_usage()[1]
 
     bias_list = []
     for k in gene_stats:
@@ -189,13 +469,32 @@ def codon_compare(acc):
 
 if __name__ =="__main__":
 
-    codons_dictionary = total_usage()
+    parser = argparse.ArgumentParser(description='Codon usage for entire chromosome')
+    parser.add_argument('--checkpoint', help='checkpoint file, resumed from if present')
+    parser.add_argument('--every', type=int, default=100, help='genes between checkpoints')
+    parser.add_argument('--shard-index', type=int, help='run only this shard (0 to count - 1)')
+    parser.add_argument('--shard-count', type=int, help='total number of shards')
+    parser.add_argument('--out', help='partial result file written by shard run')
+    parser.add_argument('--merge', nargs='+', metavar='FILE', help='combine partial result files')
+    args = parser.parse_args()
+
+    ## shard mode: write partial result file and stop
+    if args.shard_count is not None:
+        if args.shard_index is None or args.out is None:
+            parser.error('--shard-count needs --shard-index and --out')
+        shard_run(args.shard_index, args.shard_count, args.out)
+        exit(0)
+
+    if args.merge:
+        codons_dictionary = merge_shards(args.merge)
+    else:
+        codons_dictionary = total_usage(args.checkpoint, args.every)
 
     print(codons_dictionary[0])
     print(codons_dictionary[1])
 
     gene = 'AB000381.1'
-    results = codon_compare(gene)
+    results = codon_compare(gene, codons_dictionary[1])
 
     for x in results:
         print(x, 'Possible codon bias')